@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+# Regression check between two bench/run.py reports:
+#   python bench/compare.py baseline.json candidate.json --latency 0.15 --throughput 0.10
+# Exits 1 when any scenario (or op, with --ops) got slower than the thresholds.
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(base: Dict[str, Any], cand: Dict[str, Any], latency: float, throughput: float,
+            min_ms: float, ops: bool) -> List[str]:
+    failures: List[str] = []
+    for name, b in base["scenarios"].items():
+        c = cand["scenarios"].get(name)
+        if c is None:
+            print(f"{name}: missing from candidate, skipped")
+            continue
+        rows = [(name, b["overall"], c["overall"])]
+        if ops:
+            rows += [(f"{name}/{op}", bo, c["ops"][op]) for op, bo in b["ops"].items() if op in c["ops"]]
+        for label, bs, cs in rows:
+            for metric in METRICS:
+                old, new = bs[metric], cs[metric]
+                change = (new - old) / old if old else 0.0
+                # Ignore sub-millisecond jitter on very fast endpoints
+                bad = change > latency and new - old > min_ms
+                print(f"{label:32} {metric:7} {old:>10.2f} -> {new:>10.2f}  {change:+7.1%}{'  REGRESSION' if bad else ''}")
+                if bad:
+                    failures.append(f"{label} {metric} {old:.2f}ms -> {new:.2f}ms ({change:+.1%})")
+            old, new = bs["throughput_rps"], cs["throughput_rps"]
+            change = (new - old) / old if old else 0.0
+            bad = change < -throughput
+            print(f"{label:32} {'rps':7} {old:>10.1f} -> {new:>10.1f}  {change:+7.1%}{'  REGRESSION' if bad else ''}")
+            if bad:
+                failures.append(f"{label} throughput {old:.1f} -> {new:.1f} req/s ({change:+.1%})")
+            if cs["errors"] > bs["errors"]:
+                failures.append(f"{label} errors {bs['errors']} -> {cs['errors']}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--latency", type=float, default=0.15, help="allowed relative latency increase")
+    parser.add_argument("--throughput", type=float, default=0.10, help="allowed relative throughput drop")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore latency increases smaller than this")
+    parser.add_argument("--ops", action="store_true", help="also check each operation, not just scenario totals")
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        base = json.load(f)
+    with open(args.candidate) as f:
+        cand = json.load(f)
+    if base["meta"].get("mode") != cand["meta"].get("mode") or base["meta"].get("objects") != cand["meta"].get("objects"):
+        print("warning: reports differ in mode or dataset size", file=sys.stderr)
+    failures = compare(base, cand, args.latency, args.throughput, args.min_ms, args.ops)
+    if failures:
+        print("\nregressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Scenario runner: drives the API with a weighted mix of requests from
+# `--concurrency` async clients, either in-process through the ASGI app or
+# against a real uvicorn server, and writes a JSON report:
+#   python bench/run.py --db /tmp/apios-bench.db --scenario read-heavy,meta-filter \
+#       --mode asgi --duration 20 --out bench/results/run.json
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx  # noqa: E402
+
+from seed import BENCH_PASSWORD, BENCH_USER, WORDS  # noqa: E402
+
+
+class Context:
+    def __init__(self, db: str, token: str, seed_value: int):
+        conn = sqlite3.connect(db)
+        self.max_id = conn.execute("SELECT COALESCE(MAX(id), 1) FROM linguistic_objects").fetchone()[0]
+        self.projects = [r[0] for r in conn.execute(
+            "SELECT p.id FROM projects p JOIN users u ON u.id=p.owner_id WHERE u.username=?", (BENCH_USER,))]
+        conn.close()
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.seed = seed_value
+        self.counter = 0
+
+    def next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+Op = Callable[[httpx.AsyncClient, Context, random.Random, Dict[str, Any]], Any]
+
+
+async def get_object(client, ctx, rng, state):
+    return await client.get(f"/objects/{rng.randint(1, ctx.max_id)}")
+
+
+async def list_objects(client, ctx, rng, state):
+    return await client.get("/objects", params={"limit": 50, "offset": rng.randint(0, 1000)})
+
+
+async def deep_offset(client, ctx, rng, state):
+    return await client.get("/objects", params={"limit": 50, "offset": rng.randint(ctx.max_id // 2, max(ctx.max_id // 2, ctx.max_id - 50))})
+
+
+async def deep_cursor(client, ctx, rng, state):
+    # Each client walks the whole table page by page, then starts over
+    params: Dict[str, Any] = {"limit": 100}
+    if state.get("cursor"):
+        params["cursor"] = state["cursor"]
+    r = await client.get("/objects", params=params)
+    state["cursor"] = r.json().get("next_cursor") if r.status_code == 200 else None
+    return r
+
+
+_FILTERS = ({"meta_key": "reviewed"}, {"meta.lang": "de"}, {"meta.status": "in(draft,review)"},
+            {"meta.topic": "topic-42"}, {"meta.lang": "en", "meta.status": "final"})
+
+
+async def meta_filter(client, ctx, rng, state):
+    return await client.get("/objects", params={"limit": 50, **rng.choice(_FILTERS)})
+
+
+async def search(client, ctx, rng, state):
+    return await client.get("/search", params={"q": f"{rng.choice(WORDS)} {rng.choice(WORDS)}", "limit": 20})
+
+
+async def create_object(client, ctx, rng, state):
+    body = {"name": f"bench {ctx.next()}", "content": " ".join(rng.choice(WORDS) for _ in range(40)),
+            "project_id": rng.choice(ctx.projects) if ctx.projects else None, "metadata": {"lang": rng.choice(("en", "de"))}}
+    return await client.post("/objects", json=body, headers=ctx.headers)
+
+
+async def create_metadata(client, ctx, rng, state):
+    body = {"object_id": rng.randint(1, ctx.max_id), "key": f"bench-{ctx.seed}-{ctx.next()}", "value": "x"}
+    return await client.post("/metadata", json=body, headers=ctx.headers)
+
+
+async def login(client, ctx, rng, state):
+    return await client.post("/users/login", json={"username": BENCH_USER, "password": BENCH_PASSWORD})
+
+
+SCENARIOS: Dict[str, List[Tuple[Op, int]]] = {
+    "read-heavy": [(get_object, 60), (list_objects, 20), (meta_filter, 10), (search, 10)],
+    "write-heavy": [(create_object, 60), (create_metadata, 30), (get_object, 10)],
+    "deep-pagination": [(deep_cursor, 50), (deep_offset, 50)],
+    "meta-filter": [(meta_filter, 100)],
+    "auth-writes": [(create_object, 90), (login, 10)],
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    lat = sorted(latencies)
+    ms = lambda v: round(v * 1000.0, 3)  # noqa: E731
+    return {"requests": len(lat), "errors": errors, "throughput_rps": round(len(lat) / seconds, 2) if seconds else 0.0,
+            "mean_ms": ms(sum(lat) / len(lat)) if lat else 0.0,
+            "p50_ms": ms(percentile(lat, 50)), "p95_ms": ms(percentile(lat, 95)), "p99_ms": ms(percentile(lat, 99)),
+            "max_ms": ms(lat[-1]) if lat else 0.0}
+
+
+_SAMPLE = re.compile(r'^(apios_db_[a-z_]+?)(_sum|_count)?(?:\{(.*)\})? (\S+)$')
+
+
+async def db_snapshot(client: httpx.AsyncClient) -> Dict[Tuple[str, str], float]:
+    # Statement/fetch/acquire totals from the Prometheus exposition
+    r = await client.get("/metrics", params={"format": "prometheus"})
+    out: Dict[Tuple[str, str], float] = {}
+    for line in r.text.splitlines():
+        m = _SAMPLE.match(line)
+        if not m or (m.group(2) is None and not m.group(1).endswith("_total")):
+            continue
+        out[(m.group(1) + (m.group(2) or ""), m.group(3) or "")] = float(m.group(4))
+    return out
+
+
+def db_breakdown(before: Dict, after: Dict, requests: int) -> Dict[str, Any]:
+    delta = {k: v - before.get(k, 0.0) for k, v in after.items() if v - before.get(k, 0.0) > 0}
+
+    def total(name: str) -> float:
+        return sum(v for (n, _), v in delta.items() if n == name)
+
+    statements = []
+    for (name, labels), secs in delta.items():
+        if name == "apios_db_statement_seconds_sum":
+            calls = delta.get(("apios_db_statement_seconds_count", labels), 0.0)
+            statements.append({"statement": labels, "seconds": round(secs, 6), "calls": int(calls),
+                               "fetch_seconds": round(delta.get(("apios_db_fetch_seconds_total", labels), 0.0), 6)})
+    statements.sort(key=lambda s: s["seconds"] + s["fetch_seconds"], reverse=True)
+    stmt, fetch, acquire = (total("apios_db_statement_seconds_sum"), total("apios_db_fetch_seconds_total"),
+                            total("apios_db_acquire_seconds_sum"))
+    per_req = lambda v: round(v * 1000.0 / requests, 4) if requests else 0.0  # noqa: E731
+    return {"statement_seconds": round(stmt, 6), "fetch_seconds": round(fetch, 6), "acquire_seconds": round(acquire, 6),
+            "db_ms_per_request": per_req(stmt + fetch), "acquire_ms_per_request": per_req(acquire),
+            "top_statements": statements[:10]}
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, name: str, concurrency: int,
+                       duration: float, warmup: float, db_metrics: bool = True) -> Dict[str, Any]:
+    ops = SCENARIOS[name]
+    funcs = [op for op, _ in ops]
+    weights = [w for _, w in ops]
+    results: Dict[str, Tuple[List[float], List[int]]] = {op.__name__: ([], [0]) for op in funcs}
+
+    async def worker(i: int, until: float, record: bool) -> None:
+        rng = random.Random(ctx.seed * 1000 + i)
+        state: Dict[str, Any] = {}
+        while time.monotonic() < until:
+            op = rng.choices(funcs, weights)[0]
+            start = time.perf_counter()
+            try:
+                r = await op(client, ctx, rng, state)
+                failed = r.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            elapsed = time.perf_counter() - start
+            if record:
+                lat, errs = results[op.__name__]
+                lat.append(elapsed)
+                errs[0] += failed
+
+    if warmup > 0:
+        until = time.monotonic() + warmup
+        await asyncio.gather(*(worker(i, until, False) for i in range(concurrency)))
+    before = await db_snapshot(client) if db_metrics else {}
+    start = time.monotonic()
+    await asyncio.gather(*(worker(i, start + duration, True) for i in range(concurrency)))
+    seconds = time.monotonic() - start
+    after = await db_snapshot(client) if db_metrics else {}
+    all_lat = [v for lat, _ in results.values() for v in lat]
+    all_err = sum(errs[0] for _, errs in results.values())
+    return {"overall": summarize(all_lat, all_err, seconds),
+            "ops": {k: summarize(lat, errs[0], seconds) for k, (lat, errs) in results.items() if lat},
+            "db": db_breakdown(before, after, len(all_lat)) if db_metrics else None}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_ready(client: httpx.AsyncClient, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn exited with {proc.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("uvicorn did not become healthy")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    db = os.path.abspath(args.db)
+    os.environ["APISQLITE_DB_PATH"] = db
+    os.environ.setdefault("JWT_SECRET", "bench-secret")
+    proc: Optional[subprocess.Popen] = None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.mode == "asgi":
+        from api import main as api_main
+        api_main._startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api_main.app), base_url="http://bench", timeout=60)
+    else:
+        port = _free_port()
+        cmd = [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"]
+        proc = subprocess.Popen(cmd, cwd=str(SRC), env=dict(os.environ))
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits)
+    try:
+        if proc is not None:
+            await _wait_ready(client, proc)
+        r = await client.post("/users/login", json={"username": BENCH_USER, "password": BENCH_PASSWORD})
+        if r.status_code != 200:
+            raise SystemExit(f"bench login failed ({r.status_code}); seed the database with bench/seed.py first")
+        ctx = Context(db, r.json()["access_token"], args.seed)
+        report: Dict[str, Any] = {"meta": {
+            "mode": args.mode, "concurrency": args.concurrency, "duration": args.duration,
+            "workers": args.workers if args.mode == "uvicorn" else 1, "db": db, "objects": ctx.max_id,
+            "seed": args.seed, "python": platform.python_version(), "git": _git_rev(),
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")},
+            "scenarios": {}}
+        # Each uvicorn worker keeps its own metrics and /metrics is answered by
+        # whichever worker takes the request, so a breakdown would be partial
+        db_metrics = proc is None or args.workers <= 1
+        if not db_metrics:
+            report["meta"]["note"] = "db breakdown skipped: /metrics reports one worker of several"
+        for name in args.scenario.split(","):
+            result = await run_scenario(client, ctx, name, args.concurrency, args.duration, args.warmup, db_metrics)
+            report["scenarios"][name] = result
+            o = result["overall"]
+            db_col = f"  db {result['db']['db_ms_per_request']:.3f}ms/req" if result["db"] else ""
+            print(f"{name:16} {o['throughput_rps']:>9.1f} req/s  p50 {o['p50_ms']:>8.2f}ms  p95 {o['p95_ms']:>8.2f}ms  "
+                  f"p99 {o['p99_ms']:>8.2f}ms  errors {o['errors']}{db_col}")
+        return report
+    finally:
+        await client.aclose()
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run API benchmark scenarios")
+    parser.add_argument("--db", required=True, help="database seeded by bench/seed.py")
+    parser.add_argument("--scenario", default="read-heavy",
+                        help="comma-separated: " + ", ".join(SCENARIOS))
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unrecorded seconds before each scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+    unknown = [s for s in args.scenario.split(",") if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    report = asyncio.run(run(args))
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(report, indent=2) + "\n")
+        print(f"report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# Seeded synthetic dataset for benchmarks:
+#   python bench/seed.py --db /tmp/apios-bench.db --objects 100k --seed 1
+# Same seed and scale always produce the same rows.
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+
+WORDS = ("alpha beta gamma delta river stone light shadow market signal garden engine letter "
+         "window harbor forest winter summer copper silver paper thread memory voice").split()
+LANGS = ("en", "en", "en", "de", "fr", "es", "ja")
+STATUSES = ("draft", "review", "final", "archived")
+PREDICATES = ("related_to", "part_of", "derived_from", "cites")
+CHUNK = 10000
+
+
+def parse_scale(raw: str) -> int:
+    raw = raw.strip().lower()
+    mult = {"k": 1000, "m": 1000000}.get(raw[-1:], 1)
+    return int(float(raw[:-1] if mult > 1 else raw) * mult)
+
+
+def _text(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def seed(path: str, objects: int, seed_value: int = 1, meta_per_object: int = 3,
+         relations_per_object: float = 2.0, content_words: int = 40) -> dict:
+    rng = random.Random(seed_value)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Seeding only: durability is irrelevant until the final commit
+    conn.execute("PRAGMA synchronous=OFF")
+    from db.migrations import migrate
+    # Tables and indexes only; the full-text index and change log are created
+    # (and backfilled) by the remaining migrations when the API starts
+    migrate(conn, target="017")
+    if conn.execute("SELECT COUNT(*) FROM linguistic_objects").fetchone()[0]:
+        raise SystemExit(f"{path} already has objects; seed into a fresh file")
+
+    from api.security import hash_password
+    # One bcrypt hash shared by every generated user keeps seeding fast
+    pw_hash = hash_password(BENCH_PASSWORD)
+    n_users = max(1, objects // 1000)
+    n_projects = max(1, objects // 100)
+    conn.executemany("INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                     [(BENCH_USER if i == 0 else f"user{i}", f"user{i}@bench.local", pw_hash) for i in range(n_users)])
+    # The bench user owns every tenth project so auth'd writes have targets
+    conn.executemany("INSERT INTO projects (name, owner_id) VALUES (?, ?)",
+                     [(f"project-{i}", 1 if i % 10 == 0 else rng.randint(1, n_users)) for i in range(n_projects)])
+    conn.commit()
+
+    done = 0
+    while done < objects:
+        n = min(CHUNK, objects - done)
+        first = done + 1
+        conn.executemany("INSERT INTO linguistic_objects (id, noun, content, project_id) VALUES (?, ?, ?, ?)",
+                         [(first + i, _text(rng, 2), _text(rng, content_words), rng.randint(1, n_projects))
+                          for i in range(n)])
+        meta = []
+        for oid in range(first, first + n):
+            # low (lang), medium (status) and high (topic) cardinality keys,
+            # then filler keys, plus a sparse flag for selective filters
+            fields = [("lang", rng.choice(LANGS)), ("status", rng.choice(STATUSES)),
+                      ("topic", f"topic-{rng.randint(1, 5000)}")][:meta_per_object]
+            fields += [(f"extra{j}", _text(rng, 1)) for j in range(3, meta_per_object)]
+            if rng.random() < 0.05:
+                fields.append(("reviewed", "yes"))
+            meta.extend((k, v, oid) for k, v in fields)
+        conn.executemany("INSERT INTO metadata (key, value, object_id) VALUES (?, ?, ?)", meta)
+        rels = []
+        for oid in range(first, first + n):
+            for _ in range(int(relations_per_object) + (rng.random() < relations_per_object % 1)):
+                # Mostly local edges with some long-range ones, like real corpora
+                target = oid + rng.randint(-50, 50) if rng.random() < 0.8 else rng.randint(1, objects)
+                target = min(max(1, target), objects)
+                if target != oid:
+                    rels.append((oid, rng.choice(PREDICATES), target))
+        conn.executemany("INSERT INTO relations (subject_id, predicate, object_id) VALUES (?, ?, ?)", rels)
+        conn.commit()
+        done += n
+    conn.execute("ANALYZE")
+    conn.commit()
+    counts = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("users", "projects", "linguistic_objects", "metadata", "relations")}
+    conn.close()
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a seeded benchmark database")
+    parser.add_argument("--db", required=True, help="target SQLite file (must not contain objects yet)")
+    parser.add_argument("--objects", default="10k", help="object count, e.g. 10k, 1m, 10m")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--meta-per-object", type=int, default=3)
+    parser.add_argument("--relations-per-object", type=float, default=2.0)
+    parser.add_argument("--content-words", type=int, default=40)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    counts = seed(os.path.abspath(args.db), parse_scale(args.objects), args.seed, args.meta_per_object,
+                  args.relations_per_object, args.content_words)
+    print(f"seeded {args.db} in {time.perf_counter() - start:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
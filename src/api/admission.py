@@ -0,0 +1,218 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from api import authcache
+from api.metrics import registry
+
+# Admission control in front of the routes. Each request is classed as auth,
+# write or read; a class admits at most `limit` requests at once and queues
+# up to APIOS_ADMIT_QUEUE more. A queued request that can't start within
+# APIOS_ADMIT_WAIT_MS is shed with 503, so overload shows up as fast
+# rejections rather than every request slowing down in the threadpool.
+ADMIT_READ = int(os.getenv("APIOS_ADMIT_READ", "32"))
+ADMIT_WRITE = int(os.getenv("APIOS_ADMIT_WRITE", "16"))
+ADMIT_AUTH = int(os.getenv("APIOS_ADMIT_AUTH", "16"))
+ADMIT_QUEUE = int(os.getenv("APIOS_ADMIT_QUEUE", "256"))
+ADMIT_WAIT_MS = float(os.getenv("APIOS_ADMIT_WAIT_MS", "1000"))
+# Per-user token buckets keyed by the JWT `sub`: RATE_LIMIT requests per
+# second sustained, RATE_BURST at once. 0 disables rate limiting.
+RATE_LIMIT = float(os.getenv("APIOS_RATE_LIMIT", "0"))
+RATE_BURST = float(os.getenv("APIOS_RATE_BURST", "20"))
+RATE_USERS = int(os.getenv("APIOS_RATE_USERS", "10000"))
+
+# Probes, metrics and the change feed (async, held open by design) bypass admission
+EXEMPT = {"/health", "/ready", "/metrics", "/changes", "/changes/stream", "/docs", "/openapi.json"}
+AUTH_PATHS = {"/users/register", "/users/login", "/users/refresh"}
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class Shed(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Limiter:
+    # Concurrency limit with a bounded FIFO of waiters. Only touched from the
+    # event loop; a released slot is handed straight to the oldest waiter.
+
+    def __init__(self, name: str, limit: int, queue: int = ADMIT_QUEUE, wait_ms: float = ADMIT_WAIT_MS):
+        self.name = name
+        self.limit = limit
+        self.queue = max(0, queue)
+        self.wait = wait_ms / 1000.0
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.queued_total = 0
+        self.shed = {"queue_full": 0, "deadline": 0}
+
+    async def acquire(self) -> None:
+        if self.limit <= 0 or (self.in_flight < self.limit and not self._waiters):
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        # Timed-out and cancelled waiters stay queued until release() reaches
+        # them; drop them so they don't count against the queue
+        self._waiters = deque(f for f in self._waiters if not f.done())
+        if len(self._waiters) >= self.queue:
+            self._shed("queue_full")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self.queued_total += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.wait)
+        except asyncio.TimeoutError:
+            if not fut.done():
+                fut.cancel()
+                self._shed("deadline")
+        except asyncio.CancelledError:
+            # Client went away; give back a slot that was already handed over
+            if fut.done() and not fut.cancelled():
+                self.release()
+            else:
+                fut.cancel()
+            raise
+        finally:
+            registry.observe("apios_admission_wait_seconds", (("class", self.name),), time.perf_counter() - start)
+        self.admitted += 1
+
+    def release(self) -> None:
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                # in_flight stays the same: the slot moves to the waiter
+                fut.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _shed(self, reason: str) -> None:
+        self.shed[reason] += 1
+        registry.inc("apios_admission_shed_total", (("class", self.name), ("reason", reason)))
+        raise Shed(reason)
+
+    def depth(self) -> int:
+        return sum(1 for f in self._waiters if not f.done())
+
+
+class TokenBuckets:
+    # One bucket per user, LRU-bounded; a missing bucket starts full
+    def __init__(self, rate: float = RATE_LIMIT, burst: float = RATE_BURST, maxsize: int = RATE_USERS):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.maxsize = max(1, maxsize)
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.limited = 0
+
+    def take(self, key: str) -> float:
+        # 0 when admitted, else seconds until a token is available
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - at) * self.rate)
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / self.rate
+                self.limited += 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class Admission:
+    def __init__(self):
+        self.limiters = {
+            "read": Limiter("read", ADMIT_READ),
+            "write": Limiter("write", ADMIT_WRITE),
+            "auth": Limiter("auth", ADMIT_AUTH),
+        }
+        self.buckets = TokenBuckets()
+
+    @staticmethod
+    def classify(method: str, path: str) -> Optional[str]:
+        if path in EXEMPT:
+            return None
+        if path in AUTH_PATHS:
+            return "auth"
+        return "read" if method in READ_METHODS else "write"
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for name, lim in self.limiters.items():
+            out[f"{name}_limit"] = lim.limit
+            out[f"{name}_in_flight"] = lim.in_flight
+            out[f"{name}_queued"] = lim.depth()
+            out[f"{name}_admitted"] = lim.admitted
+            out[f"{name}_shed"] = sum(lim.shed.values())
+        out["rate_limited"] = self.buckets.limited
+        out["rate_users"] = self.buckets.size()
+        return out
+
+
+admission = Admission()
+
+
+def _user(scope) -> Optional[str]:
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token and os.getenv("JWT_SECRET"):
+                # Unverifiable tokens are left to the route's 401
+                return authcache.verify_token(token.strip())
+    return None
+
+
+async def _reject(send, status: int, code: str, message: str, retry_after: float) -> None:
+    body = json.dumps({"detail": {"error": {"code": code, "message": message}}}).encode()
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    # Pure ASGI, so a slot is held until the last byte of a streamed response
+    def __init__(self, app, control: Optional[Admission] = None):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        control = self.control or admission
+        cls = control.classify(scope.get("method", ""), scope.get("path", "")) if scope["type"] == "http" else None
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+        sub = _user(scope)
+        if sub is not None:
+            wait = control.buckets.take(sub)
+            if wait > 0:
+                registry.inc("apios_admission_shed_total", (("class", cls), ("reason", "rate_limited")))
+                await _reject(send, 429, "rate_limited", "Too many requests", wait)
+                return
+        limiter = control.limiters[cls]
+        try:
+            await limiter.acquire()
+        except Shed as e:
+            await _reject(send, 503, "overloaded", f"Server busy ({cls}: {e.reason})", limiter.wait or 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from api.security import decode_claims
+from db.connection import get_connection
+
+AUTH_CACHE_SIZE = int(os.getenv("APIOS_AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("APIOS_AUTH_CACHE_TTL", "60"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    # Size-bounded LRU whose entries also carry their own expiry time
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE):
+        self.maxsize = max(1, maxsize)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return _MISSING
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_where(self, pred) -> None:
+        # pred(key, value) -> bool
+        with self._lock:
+            for key in [k for k, (_, v) in self._data.items() if pred(k, v)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# token -> sub, valid until the token's own exp
+tokens = TTLCache()
+# username -> user id (found users only, so registration needs no invalidation)
+users = TTLCache()
+# (user_id, project_id) -> "owner" | projects_users.role | None
+roles = TTLCache()
+
+# auth_epoch (db/migrations.py) counts changes to users, projects and
+# memberships from any connection, including SQL run outside the API. A
+# moved epoch drops the user and role entries before they are consulted, so
+# a revoked membership applies to the next request.
+_epoch: Dict[str, Any] = {"n": None}
+_epoch_lock = threading.Lock()
+
+
+def _sync_epoch() -> None:
+    try:
+        with get_connection() as conn:
+            row = conn.execute("SELECT n FROM auth_epoch WHERE id=1").fetchone()
+    except sqlite3.OperationalError:
+        return  # not migrated yet
+    n = row[0] if row else None
+    with _epoch_lock:
+        if n != _epoch["n"]:
+            users.clear()
+            roles.clear()
+            _epoch["n"] = n
+
+
+def verify_token(token: str) -> Optional[str]:
+    sub = tokens.get(token)
+    if sub is not _MISSING:
+        return sub
+    claims = decode_claims(token)
+    if not claims or not claims.get("sub"):
+        return None
+    exp = claims.get("exp")
+    tokens.set(token, claims["sub"], float(exp) if exp is not None else time.time() + AUTH_CACHE_TTL)
+    return claims["sub"]
+
+
+def user_id(username: str) -> Optional[int]:
+    _sync_epoch()
+    uid = users.get(username)
+    if uid is not _MISSING:
+        return uid
+    with get_connection() as conn:
+        row = conn.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()
+    if not row:
+        return None
+    users.set(username, row[0], time.time() + AUTH_CACHE_TTL)
+    return row[0]
+
+
+def project_role(uid: int, project_id: int) -> Optional[str]:
+    _sync_epoch()
+    key = (uid, project_id)
+    role = roles.get(key)
+    if role is not _MISSING:
+        return role
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT CASE WHEN p.owner_id=? THEN 'owner' ELSE pu.role END FROM projects p "
+            "LEFT JOIN projects_users pu ON pu.project_id=p.id AND pu.user_id=? WHERE p.id=?",
+            (uid, uid, project_id)
+        ).fetchone()
+    role = row[0] if row else None
+    roles.set(key, role, time.time() + AUTH_CACHE_TTL)
+    return role
+
+
+# Invalidation hooks for code paths that change users or memberships
+def invalidate_user(username: str, uid: Optional[int] = None) -> None:
+    users.pop(username)
+    tokens.discard_where(lambda _, sub: sub == username)
+    if uid is not None:
+        invalidate_membership(uid=uid)
+
+
+def invalidate_membership(uid: Optional[int] = None, project_id: Optional[int] = None) -> None:
+    roles.discard_where(lambda k, _: (uid is None or k[0] == uid) and (project_id is None or k[1] == project_id))
+
+
+def clear() -> None:
+    for cache in (tokens, users, roles):
+        cache.clear()
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {"tokens": tokens.stats(), "users": users.stats(), "roles": roles.stats()}
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from db.changes import bounds, compact, read_changes
+from db.connection import get_connection, shard_ids
+from db.writer import run_write, writer
+
+CHANGES_MAX_LIMIT = 1000
+CHANGES_MAX_WAIT = float(os.getenv("APIOS_CHANGES_MAX_WAIT", "60"))
+# Waiters are woken by this process's writer; commits from other processes
+# (several uvicorn workers, CLI tools) are picked up on this recheck interval.
+# Lower it only when other processes write; each recheck is a query per waiter.
+CHANGES_RECHECK = float(os.getenv("APIOS_CHANGES_RECHECK", "30"))
+CHANGES_HEARTBEAT = 15.0
+CHANGES_COMPACT_INTERVAL = float(os.getenv("APIOS_CHANGES_COMPACT_INTERVAL", "300"))
+
+
+class Compacted(Exception):
+    pass
+
+
+class Notifier:
+    # Parked consumers wait on an asyncio.Event (no polling); the writer
+    # thread bumps `version` and wakes them through their event loop.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self.version = 0
+        self.notifications = 0
+
+    def notify(self) -> None:
+        with self._lock:
+            self.version += 1
+            self.notifications += 1
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+    async def wait(self, timeout: float, seen: int) -> bool:
+        # `seen` is the version read before the caller's last DB read, so a
+        # commit landing in between is not missed
+        event = asyncio.Event()
+        entry = (asyncio.get_running_loop(), event)
+        with self._lock:
+            if self.version != seen:
+                return True
+            self._waiters.add(entry)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"waiters": len(self._waiters), "notifications": self.notifications}
+
+
+notifier = Notifier()
+writer.add_listener(notifier.notify)
+_compacted = {"runs": 0, "removed": 0}
+log = logging.getLogger("apios")
+
+
+def fetch(since: int, limit: int, shard: Optional[int] = None) -> Dict[str, Any]:
+    # Sharded: each shard keeps its own log and sequence
+    with get_connection(shard=shard) as conn:
+        b = bounds(conn)
+        if b["oldest"] is not None and since < b["oldest"] - 1:
+            raise Compacted(f"entries after {since} were compacted; oldest retained seq is {b['oldest']}")
+        items = read_changes(conn, since, limit)
+    return {"changes": items, "next": items[-1]["seq"] if items else since, "latest": b["latest"]}
+
+
+async def poll(since: int, limit: int, wait: float, shard: Optional[int] = None) -> Dict[str, Any]:
+    deadline = time.monotonic() + max(0.0, min(wait, CHANGES_MAX_WAIT))
+    while True:
+        seen = notifier.version
+        page = await run_in_threadpool(fetch, since, limit, shard)
+        remaining = deadline - time.monotonic()
+        if page["changes"] or remaining <= 0:
+            return page
+        await notifier.wait(min(remaining, CHANGES_RECHECK), seen)
+
+
+def _event(name: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+async def stream(request: Any, since: int, shard: Optional[int] = None) -> AsyncIterator[str]:
+    last_sent = time.monotonic()
+    while not await request.is_disconnected():
+        seen = notifier.version
+        try:
+            page = await run_in_threadpool(fetch, since, CHANGES_MAX_LIMIT, shard)
+        except Compacted as e:
+            yield _event("reset", {"code": "changes_compacted", "message": str(e)})
+            return
+        for change in page["changes"]:
+            yield _event("change", change, change["seq"])
+            since = change["seq"]
+            last_sent = time.monotonic()
+        if len(page["changes"]) == CHANGES_MAX_LIMIT:
+            continue
+        recheck_at = time.monotonic() + CHANGES_RECHECK
+        while True:
+            timeout = min(recheck_at, last_sent + CHANGES_HEARTBEAT) - time.monotonic()
+            if await notifier.wait(max(0.0, timeout), seen) or time.monotonic() >= recheck_at:
+                break
+            # Comment line: keeps proxies from closing an idle stream
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+
+
+def compact_now() -> int:
+    removed = sum(run_write(compact, shard) for shard in shard_ids())
+    _compacted["runs"] += 1
+    _compacted["removed"] += removed
+    return removed
+
+
+async def compaction_loop() -> None:
+    while True:
+        await asyncio.sleep(CHANGES_COMPACT_INTERVAL)
+        try:
+            await run_in_threadpool(compact_now)
+        except Exception as e:
+            log.warning("change log compaction failed: %s", e)
+
+
+def stats() -> Dict[str, Any]:
+    out = notifier.stats()
+    out["compaction_runs"] = _compacted["runs"]
+    out["compacted"] = _compacted["removed"]
+    return out
@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+# Projection: response field -> linguistic_objects column
+FIELDS = {"id": "id", "name": "noun", "content": "content", "project_id": "project_id"}
+INCLUDES = ("metadata", "relations", "relations_out", "relations_in")
+MAX_IDS = 1000
+_IN_BATCH = 500
+
+
+def parse_list(raw: Optional[str], allowed: Sequence[str], what: str) -> List[str]:
+    if not raw:
+        return []
+    items = [x.strip() for x in raw.split(",") if x.strip()]
+    bad = [x for x in items if x not in allowed]
+    if bad:
+        raise ValueError(f"Unknown {what}: {', '.join(bad)}")
+    return items
+
+
+def parse_ids(raw: str) -> List[int]:
+    try:
+        ids = sorted({int(x) for x in raw.split(",") if x.strip()})
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+    if len(ids) > MAX_IDS:
+        raise ValueError(f"At most {MAX_IDS} ids per request")
+    return ids
+
+
+def columns(fields: List[str], alias: str = "lo") -> str:
+    # id is always selected (cursoring and expansion key on it); content is
+    # only read when asked for
+    wanted = ["id"] + [f for f in fields if f != "id"] if fields else list(FIELDS)
+    cols = [f"{alias}.{FIELDS[f]}" for f in wanted]
+    if "content" in wanted:
+        # Offloaded content stays in the blob store; the size marks it
+        cols.append(f"{alias}.content_size")
+    return ", ".join(cols)
+
+
+def project(obj: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    if not fields:
+        return obj
+    keep = set(fields) | {"id"}
+    if "content" in keep:
+        keep |= {"content_size", "content_url"}
+    return {k: v for k, v in obj.items() if k in keep}
+
+
+def _by_ids(conn, sql: str, ids: List[int]):
+    for start in range(0, len(ids), _IN_BATCH):
+        chunk = ids[start:start + _IN_BATCH]
+        yield from conn.execute(sql.format(marks=",".join("?" * len(chunk))), chunk)
+
+
+def expand(conn, objs: List[Dict[str, Any]], include: List[str]) -> None:
+    # One IN (...) query per expansion for the whole page, not one per object
+    if not objs or not include:
+        return
+    ids = [o["id"] for o in objs]
+    by_id = {o["id"]: o for o in objs}
+    if "metadata" in include:
+        for o in objs:
+            o["metadata"] = []
+        for r in _by_ids(conn, "SELECT object_id, key, value FROM metadata WHERE object_id IN ({marks}) ORDER BY object_id, key", ids):
+            by_id[r[0]]["metadata"].append({"key": r[1], "value": r[2]})
+    want_out = "relations" in include or "relations_out" in include
+    want_in = "relations" in include or "relations_in" in include
+    if want_out or want_in:
+        for o in objs:
+            o["relations"] = {}
+            if want_out:
+                o["relations"]["out"] = []
+            if want_in:
+                o["relations"]["in"] = []
+    if want_out:
+        for r in _by_ids(conn, "SELECT subject_id, predicate, object_id FROM relations WHERE subject_id IN ({marks}) ORDER BY subject_id, id", ids):
+            by_id[r[0]]["relations"]["out"].append({"predicate": r[1], "to_id": r[2]})
+    if want_in:
+        for r in _by_ids(conn, "SELECT object_id, predicate, subject_id FROM relations WHERE object_id IN ({marks}) ORDER BY object_id, id", ids):
+            by_id[r[0]]["relations"]["in"].append({"predicate": r[1], "from_id": r[2]})
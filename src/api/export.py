@@ -0,0 +1,118 @@
+import codecs
+import heapq
+import itertools
+import json
+import os
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from db import blobs
+from db.connection import get_connection
+
+EXPORT_WINDOW = int(os.getenv("APIOS_EXPORT_WINDOW", "500"))
+
+
+def _window(conn, after: int, upper: int, project_id: Optional[int], size: int) -> List[Dict[str, Any]]:
+    # One ordered pass per window: objects, then metadata and outgoing relations
+    # of exactly the window's objects, merge-joined on id without per-object queries.
+    sql = "SELECT {} FROM linguistic_objects WHERE id>? AND id<=?"
+    params: List[Any] = [after, upper]
+    if project_id is not None:
+        sql += " AND project_id=?"
+        params.append(project_id)
+    sql += " ORDER BY id LIMIT ?"
+    params.append(size)
+    # Offloaded content is left in the blob store (_ref) and streamed by _lines
+    objs = [
+        {"id": r[0], "name": r[1], "content": r[2], "project_id": r[3], "metadata": [], "relations": [], "_ref": r[4]}
+        for r in conn.execute(sql.format("id, noun, content, project_id, content_ref"), params)
+    ]
+    if not objs:
+        return objs
+    # The window's id list as a subquery: a sparse project's window can span a
+    # wide id range, most of it other projects' rows
+    ids = sql.format("id")
+    _merge(objs, conn.execute(
+        f"SELECT object_id, key, value FROM metadata WHERE object_id IN ({ids}) ORDER BY object_id, key", params),
+        "metadata", lambda r: {"key": r[1], "value": r[2]})
+    _merge(objs, conn.execute(
+        f"SELECT subject_id, predicate, object_id FROM relations WHERE subject_id IN ({ids}) ORDER BY subject_id, id", params),
+        "relations", lambda r: {"predicate": r[1], "to_id": r[2]})
+    return objs
+
+
+def _merge(objs: List[Dict[str, Any]], rows, field: str, shape) -> None:
+    # Both sides are ordered by object id
+    i = 0
+    for r in rows:
+        while i < len(objs) and objs[i]["id"] < r[0]:
+            i += 1
+        if i == len(objs):
+            break
+        if objs[i]["id"] == r[0]:
+            objs[i][field].append(shape(r))
+
+
+def _objects(project_id: Optional[int], since_id: int, window: int, shard: Optional[int]) -> Iterator[Dict[str, Any]]:
+    # Export is bounded by the max id at start so it terminates under ingest;
+    # each window uses a fresh pooled connection so no read transaction (and
+    # WAL checkpoint blocker) is held for the duration of a large export.
+    with get_connection(shard=shard) as conn:
+        upper = conn.execute("SELECT COALESCE(MAX(id), 0) FROM linguistic_objects").fetchone()[0]
+    after = since_id
+    while after < upper:
+        with get_connection(shard=shard) as conn:
+            objs = _window(conn, after, upper, project_id, window)
+        if not objs:
+            return
+        yield from objs
+        after = objs[-1]["id"]
+
+
+def _lines(o: Dict[str, Any]) -> Iterator[bytes]:
+    # One NDJSON line; an offloaded document is decoded and escaped chunk by
+    # chunk into the "content" string, so it is never held in memory whole
+    ref = o.pop("_ref")
+    if ref is None:
+        yield json.dumps(o, separators=(",", ":")).encode() + b"\n"
+        return
+    head = json.dumps({"id": o["id"], "name": o["name"]}, separators=(",", ":"))[:-1]
+    tail = json.dumps({k: o[k] for k in ("project_id", "metadata", "relations")}, separators=(",", ":"))[1:]
+    yield (head + ',"content":"').encode()
+    dec = codecs.getincrementaldecoder("utf-8")()
+    for data in blobs.iter_bytes(ref):
+        text = dec.decode(data)
+        if text:
+            yield json.dumps(text)[1:-1].encode()
+    yield ('",' + tail + "\n").encode()
+
+
+def iter_objects(project_id: Optional[int] = None, since_id: int = 0, window: int = EXPORT_WINDOW,
+                 shards: Sequence[Optional[int]] = (None,)) -> Iterator[bytes]:
+    # Shards are merged by id (one window per shard in memory), so the stream
+    # is in ascending id order and the last id received is a valid since_id.
+    objs = heapq.merge(*(_objects(project_id, since_id, window, k) for k in shards), key=lambda o: o["id"])
+    while True:
+        batch = list(itertools.islice(objs, window))
+        if not batch:
+            return
+        out: List[bytes] = []
+        for o in batch:
+            if o["_ref"] is None:
+                out.extend(_lines(o))
+                continue
+            if out:
+                yield b"".join(out)
+                out = []
+            yield from _lines(o)
+        if out:
+            yield b"".join(out)
+
+
+def gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # Sync-flush per window so a client that disconnects still holds every
+    # complete line it received and can resume with since_id.
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield comp.compress(chunk) + comp.flush(zlib.Z_SYNC_FLUSH)
+    yield comp.flush()
@@ -0,0 +1,157 @@
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+GRAPH_MAX_DEPTH = int(os.getenv("APIOS_GRAPH_MAX_DEPTH", "6"))
+GRAPH_MAX_NODES = int(os.getenv("APIOS_GRAPH_MAX_NODES", "10000"))
+GRAPH_MAX_EDGES = int(os.getenv("APIOS_GRAPH_MAX_EDGES", "50000"))
+GRAPH_BUDGET_MS = float(os.getenv("APIOS_GRAPH_BUDGET_MS", "250"))
+DIRECTIONS = ("out", "in", "both")
+
+# Frontier ids are expanded with IN (...) batches over the relations
+# subject/object indexes: one query per batch per level, not per node.
+_IN_BATCH = 500
+_REVERSE = {"out": "in", "in": "out", "both": "both"}
+
+Edge = Tuple[int, str, int]
+
+
+class Limits:
+    def __init__(self, max_nodes: int = GRAPH_MAX_NODES, max_edges: int = GRAPH_MAX_EDGES, budget_ms: float = GRAPH_BUDGET_MS):
+        self.max_nodes = max_nodes
+        self.max_edges = max_edges
+        self.deadline = time.monotonic() + budget_ms / 1000.0
+        self.reason: Optional[str] = None
+
+    def expired(self) -> bool:
+        if self.reason is None and time.monotonic() > self.deadline:
+            self.reason = "time_budget"
+        return self.reason is not None
+
+
+def _expand(conn, ids: List[int], direction: str, predicate: Optional[str]) -> Iterator[Tuple[int, Edge, int]]:
+    # Yields (frontier node, (subject, predicate, object), neighbour)
+    sides = [("subject_id", 0, 2), ("object_id", 2, 0)]
+    if direction == "out":
+        sides = sides[:1]
+    elif direction == "in":
+        sides = sides[1:]
+    for start in range(0, len(ids), _IN_BATCH):
+        chunk = ids[start:start + _IN_BATCH]
+        marks = ",".join("?" * len(chunk))
+        for col, here, there in sides:
+            sql = f"SELECT subject_id, predicate, object_id FROM relations WHERE {col} IN ({marks})"
+            params: List[Any] = list(chunk)
+            if predicate is not None:
+                sql += " AND predicate=?"
+                params.append(predicate)
+            for r in conn.execute(sql, params):
+                yield r[here], (r[0], r[1], r[2]), r[there]
+
+
+def _edge_dict(e: Edge) -> Dict[str, Any]:
+    return {"from_id": e[0], "predicate": e[1], "to_id": e[2]}
+
+
+def neighbors(conn, root: int, direction: str = "out", predicate: Optional[str] = None, depth: int = 1,
+              limits: Optional[Limits] = None) -> Dict[str, Any]:
+    limits = limits or Limits()
+    depth = max(1, min(depth, GRAPH_MAX_DEPTH))
+    seen: Dict[int, int] = {root: 0}  # visited set doubles as cycle detection
+    edges: Dict[Edge, None] = {}
+    frontier = [root]
+    for level in range(1, depth + 1):
+        nxt: List[int] = []
+        for _, edge, other in _expand(conn, frontier, direction, predicate):
+            # Only edges between returned nodes: one to a node over the node
+            # limit is dropped with it
+            new = other not in seen
+            if new and len(seen) >= limits.max_nodes:
+                limits.reason = "node_limit"
+                continue
+            if edge not in edges:
+                if len(edges) >= limits.max_edges:
+                    limits.reason = "edge_limit"
+                    break
+                edges[edge] = None
+            if new:
+                seen[other] = level
+                nxt.append(other)
+            if limits.expired():
+                break
+        if limits.reason or not nxt:
+            break
+        frontier = nxt
+    nodes = sorted(({"id": n, "depth": d} for n, d in seen.items() if n != root), key=lambda x: (x["depth"], x["id"]))
+    return {"root": root, "nodes": nodes, "edges": [_edge_dict(e) for e in edges],
+            "truncated": limits.reason is not None, "reason": limits.reason}
+
+
+def shortest_path(conn, src: int, dst: int, direction: str = "out", predicate: Optional[str] = None,
+                  max_depth: int = GRAPH_MAX_DEPTH, limits: Optional[Limits] = None) -> Dict[str, Any]:
+    # Bidirectional BFS: always grow the smaller frontier by one full level
+    limits = limits or Limits()
+    max_depth = max(1, min(max_depth, GRAPH_MAX_DEPTH))
+    result: Dict[str, Any] = {"from_id": src, "to_id": dst, "path": None, "edges": [], "length": None}
+    if src == dst:
+        result.update(path=[src], length=0)
+        return _finish(result, limits)
+    # node -> (depth, parent, edge) for each side
+    fwd: Dict[int, Tuple[int, Optional[int], Optional[Edge]]] = {src: (0, None, None)}
+    bwd: Dict[int, Tuple[int, Optional[int], Optional[Edge]]] = {dst: (0, None, None)}
+    f_front, b_front = [src], [dst]
+    f_depth = b_depth = 0
+    while f_front and b_front and f_depth + b_depth < max_depth and not limits.expired():
+        forward = len(f_front) <= len(b_front)
+        side, other_side = (fwd, bwd) if forward else (bwd, fwd)
+        front = f_front if forward else b_front
+        level = (f_depth if forward else b_depth) + 1
+        nxt: List[int] = []
+        meet: Optional[int] = None
+        for here, edge, other in _expand(conn, front, direction if forward else _REVERSE[direction], predicate):
+            if other in side:
+                continue
+            if len(fwd) + len(bwd) >= limits.max_nodes:
+                limits.reason = "node_limit"
+                break
+            side[other] = (level, here, edge)
+            nxt.append(other)
+            if other in other_side and (meet is None or other_side[other][0] < other_side[meet][0]):
+                meet = other
+            if limits.expired():
+                break
+        if meet is not None:
+            path, edges = _stitch(fwd, bwd, meet)
+            result.update(path=path, edges=[_edge_dict(e) for e in edges], length=len(edges))
+            return _finish(result, None)
+        if limits.reason:
+            break
+        if forward:
+            f_front, f_depth = nxt, level
+        else:
+            b_front, b_depth = nxt, level
+    return _finish(result, limits)
+
+
+def _stitch(fwd, bwd, meet: int) -> Tuple[List[int], List[Edge]]:
+    path, edges = [meet], []
+    node = meet
+    while fwd[node][1] is not None:
+        _, parent, edge = fwd[node]
+        path.insert(0, parent)
+        edges.insert(0, edge)
+        node = parent
+    node = meet
+    while bwd[node][1] is not None:
+        _, parent, edge = bwd[node]
+        path.append(parent)
+        edges.append(edge)
+        node = parent
+    return path, edges
+
+
+def _finish(result: Dict[str, Any], limits: Optional[Limits]) -> Dict[str, Any]:
+    reason = limits.reason if limits is not None else None
+    result["truncated"] = reason is not None
+    result["reason"] = reason
+    return result
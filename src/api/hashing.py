@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from api.metrics import registry
+from api.security import hash_password, verify_password
+
+# bcrypt runs in a dedicated, size-limited process pool so it neither holds
+# Starlette threadpool slots nor contends for the GIL. APIOS_HASH_WORKERS=0
+# falls back to the threadpool.
+HASH_WORKERS = int(os.getenv("APIOS_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("APIOS_HASH_MAX_PENDING", str(max(1, HASH_WORKERS) * 16)))
+
+
+class Overloaded(Exception):
+    pass
+
+
+def _timed(op: str, password: str, hashed: Optional[str]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = hash_password(password) if op == "hash" else verify_password(password, hashed or "")
+    return result, time.perf_counter() - start
+
+
+class HashPool:
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Only touched from the event loop thread
+        self._pending = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def run(self, op: str, password: str, hashed: Optional[str] = None) -> Any:
+        if self._pending >= self.max_pending:
+            # Fail fast instead of queueing behind a login storm
+            self._rejected += 1
+            registry.inc("apios_password_rejected_total", (("op", op),))
+            raise Overloaded(op)
+        self._pending += 1
+        start = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                result, seconds = await run_in_threadpool(_timed, op, password, hashed)
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    result, seconds = await loop.run_in_executor(self._get_executor(), _timed, op, password, hashed)
+                except BrokenProcessPool:
+                    self._executor = None
+                    raise
+        finally:
+            self._pending -= 1
+        registry.observe("apios_password_hash_seconds", (("op", op),), seconds)
+        registry.observe("apios_password_queue_seconds", (("op", op),), max(0.0, time.perf_counter() - start - seconds))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "pending": self._pending, "max_pending": self.max_pending, "rejected": self._rejected}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hasher = HashPool()
+
+
+async def hash_password_async(password: str) -> str:
+    return await hasher.run("hash", password)
+
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await hasher.run("verify", password, hashed)
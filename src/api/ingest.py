@@ -0,0 +1,76 @@
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db.blobs import Stored, index_text
+
+BATCH_CHUNK = int(os.getenv("APIOS_BATCH_CHUNK", "1000"))
+BATCH_MAX_CHUNK = 10000
+
+
+def resolve_projects(conn, project_ids: Iterable[int], uid: Optional[int]) -> Dict[int, Optional[str]]:
+    # One pass per distinct project: None means usable, otherwise an error code.
+    # When uid is given the caller must own the project (owner_id or role 'owner').
+    pids = sorted(set(project_ids))
+    if not pids:
+        return {}
+    marks = ",".join("?" * len(pids))
+    owners = {r[0]: r[1] for r in conn.execute(f"SELECT id, owner_id FROM projects WHERE id IN ({marks})", pids)}
+    roles: Dict[int, str] = {}
+    if uid is not None:
+        roles = {r[0]: r[1] for r in conn.execute(
+            f"SELECT project_id, role FROM projects_users WHERE user_id=? AND project_id IN ({marks})", [uid] + pids)}
+    out: Dict[int, Optional[str]] = {}
+    for pid in pids:
+        if pid not in owners:
+            out[pid] = "invalid_project"
+        elif uid is not None and owners[pid] != uid and roles.get(pid) != "owner":
+            out[pid] = "forbidden"
+        else:
+            out[pid] = None
+    return out
+
+
+def insert_objects(conn, items: Sequence[Tuple[str, Optional[str], Stored, Optional[int], Optional[Dict[str, str]]]]) -> List[int]:
+    # items: (noun, content, blobs.offload(content), project_id, metadata). Must run on the writer
+    # connection inside one transaction: holding the write lock, SQLite hands
+    # out consecutive AUTOINCREMENT ids, so ids are derived from the last rowid.
+    if not items:
+        return []
+    conn.executemany(
+        "INSERT INTO linguistic_objects (noun, content, content_ref, content_size, project_id) VALUES (?, ?, ?, ?, ?)",
+        [(noun, *stored, pid) for noun, _, stored, pid, _ in items]
+    )
+    last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    ids = list(range(last - len(items) + 1, last + 1))
+    index_text(conn, [(oid, noun, text) for oid, (noun, text, stored, _, _) in zip(ids, items) if stored[1] is not None])
+    meta = [(k, v, oid) for oid, (_, _, _, _, md) in zip(ids, items) if md for k, v in md.items()]
+    if meta:
+        conn.executemany("INSERT OR IGNORE INTO metadata (key, value, object_id) VALUES (?, ?, ?)", meta)
+    return ids
+
+
+def insert_objects_each(conn, items: Sequence[Tuple[str, Optional[str], Stored, Optional[int], Optional[Dict[str, str]]]]) -> List[Any]:
+    # Fallback after insert_objects failed for a chunk: one SAVEPOINT per row,
+    # so a bad row rolls back alone. Returns an id or the sqlite3.Error per item.
+    out: List[Any] = []
+    for item in items:
+        conn.execute("SAVEPOINT item")
+        try:
+            out.append(insert_objects(conn, [item])[0])
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK TO item")
+            out.append(e)
+        conn.execute("RELEASE item")
+    return out
+
+
+def insert_relations(conn, rels: Sequence[Tuple[int, str, int]]) -> int:
+    if not rels:
+        return 0
+    cur = conn.executemany("INSERT OR IGNORE INTO relations (subject_id, predicate, object_id) VALUES (?, ?, ?)", rels)
+    return cur.rowcount
+
+
+def error(code: str, message: str) -> Dict[str, Any]:
+    return {"error": {"code": code, "message": message}}
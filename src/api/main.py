@@ -1,14 +1,75 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi import Request
+from fastapi import FastAPI, HTTPException, Depends, Response
+from fastapi import Request, Query
 from typing import List, Dict, Any, Optional
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from api.security import hash_password, verify_password, create_access_token, decode_token
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from api.security import create_access_token, decode_token
+from api.hashing import Overloaded, hasher, hash_password_async, verify_password_async
+from api.export import iter_objects, gzip_stream
+from api import admission, authcache, changes, expand, graph, metaquery, metrics, objcache
+from api.search import SEARCH_MAX_LIMIT, search as _search, decode_cursor as _decode_search_cursor, \
+    encode_cursor as _encode_search_cursor
+from api.ingest import BATCH_CHUNK, BATCH_MAX_CHUNK, resolve_projects, insert_objects, insert_objects_each, insert_relations, error as _error
+import asyncio
+import base64
+import datetime
+import email.utils
+import json
+import logging
 import os
+import sqlite3
 import time
+from contextlib import asynccontextmanager
 
-from db.connection import get_connection
+from db import blobs
+from db.connection import get_connection, pool_stats, shard_for_object, shard_for_project, shard_ids, sharded
+from db.backup import BackupError, backups, list_backups
+from db.maintenance import maintenance, optimize
+from db.migrations import migrate
+from db.shards import set_id_base
+from db.writer import run_write, stop_all as stop_writers, writer_stats
 
-app = FastAPI(title="ApiOS API", version="0.4.2")
+log = logging.getLogger("apios")
+
+# Readiness is decided once by the startup migration run; /ready only reads it
+_readiness: Dict[str, Any] = {"status": "not_ready", "migrations_ok": False}
+
+def _startup() -> None:
+    try:
+        with get_connection(write=True) as conn:
+            ran = migrate(conn)
+            if ran:
+                log.info("applied migrations: %s", ", ".join(ran))
+            optimize(conn)
+            version = conn.execute("SELECT MAX(version) FROM migrations").fetchone()[0]
+        for shard in shard_ids():
+            if shard is None:
+                continue
+            with get_connection(write=True, shard=shard) as conn:
+                migrate(conn)
+                set_id_base(conn, shard)
+        _readiness.update(status="ready", migrations_ok=True, version=version)
+    except sqlite3.Error as e:
+        log.error("startup migrations failed: %s", e)
+        _readiness.update(status="not_ready", migrations_ok=False, error=str(e))
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    await run_in_threadpool(_startup)
+    for shard in shard_ids():
+        metaquery.stats.start_refresh(shard)
+    maintenance.start()
+    backups.start_schedule()
+    compaction = asyncio.create_task(changes.compaction_loop())
+    yield
+    compaction.cancel()
+    maintenance.stop(timeout=5)
+    backups.stop(timeout=5)
+    stop_writers(timeout=5)
+    hasher.shutdown()
+
+app = FastAPI(title="ApiOS API", version="0.4.2", lifespan=_lifespan)
 
 # Health and readiness
 @app.get("/health")
@@ -17,23 +78,46 @@ def health():
 
 @app.get("/ready")
 def ready():
-    try:
-        with get_connection() as conn:
-            # Migrations table existence is sufficient for now
-            conn.execute("CREATE TABLE IF NOT EXISTS migrations (version TEXT PRIMARY KEY);")
-        return {"status": "ready", "migrations_ok": True}
-    except Exception:
-        return {"status": "not_ready", "migrations_ok": False}
+    return JSONResponse(_readiness, status_code=200 if _readiness["migrations_ok"] else 503)
 
-# Simple in-process metrics
-_metrics = {"requests": 0, "errors": 0}
+# Admission control (api/admission.py) sits inside the metrics middleware so
+# shed requests are counted too.
+app.add_middleware(admission.AdmissionMiddleware)
+
+# Metrics: per-route/method/status counters and latency histograms come from
+# the ASGI middleware, DB timings from the pooled connection wrapper.
+app.add_middleware(metrics.MetricsMiddleware)
+
+_BUSY_ERRORS = ("database is locked", "database table is locked", "connection pool exhausted")
+
+@app.exception_handler(sqlite3.OperationalError)
+async def _db_busy(request: Request, exc: sqlite3.OperationalError):
+    # Lock or pool waits that outlast APISQLITE_BUSY_TIMEOUT_MS /
+    # APISQLITE_POOL_TIMEOUT are load, not bugs: tell the client to retry
+    if not any(msg in str(exc) for msg in _BUSY_ERRORS):
+        raise exc
+    metrics.registry.inc("apios_db_busy_total")
+    return JSONResponse({"detail": {"error": {"code": "db_busy", "message": "Database busy, retry shortly"}}},
+                        status_code=503, headers={"Retry-After": "1"})
 
 @app.get("/metrics")
-def metrics():
-    return _metrics
+def get_metrics(request: Request, format: Optional[str] = None):
+    # Prometheus text when asked for (format=prometheus or a text/plain /
+    # openmetrics Accept header, as scrapers send); JSON otherwise.
+    accept = request.headers.get("accept", "")
+    gauges = {"pool": pool_stats(), "writer": writer_stats(), "hash": hasher.stats()}
+    gauges["objcache"] = objcache.cache.stats()
+    gauges["changes"] = changes.stats()
+    gauges["maintenance"] = maintenance.stats()
+    gauges["backup"] = backups.stats()
+    gauges["admission"] = admission.admission.stats()
+    gauges.update({f"authcache_{k}": v for k, v in authcache.stats().items()})
+    if format == "prometheus" or (format is None and ("text/plain" in accept or "openmetrics" in accept)):
+        return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+    return {**metrics.totals(), **gauges, "slow_queries": list(metrics.registry.slow)}
 
 # Models
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from pydantic import field_validator
 
 class ObjectCreate(BaseModel):
@@ -52,6 +136,12 @@ class RelationCreate(BaseModel):
     predicate: str
     object_id: int
 
+class BatchRelation(BaseModel):
+    # Indices refer to positions of items within the same batch request
+    subject_index: int
+    predicate: str
+    object_index: int
+
 class UserRegister(BaseModel):
     username: str
     password: str
@@ -76,20 +166,27 @@ def require_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(b
         return None
     if not credentials or not credentials.credentials:
         raise HTTPException(status_code=401, detail={"error": {"code": "not_authenticated", "message": "Not authenticated"}})
-    sub = decode_token(credentials.credentials)
+    # Verified tokens and user ids are cached (api/authcache.py)
+    sub = authcache.verify_token(credentials.credentials)
     if not sub:
         raise HTTPException(status_code=401, detail={"error": {"code": "invalid_token", "message": "Invalid token"}})
-    with get_connection() as conn:
-        cur = conn.execute("SELECT id FROM users WHERE username=?", (sub,))
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(status_code=401, detail={"error": {"code": "user_not_found", "message": "User not found"}})
+    if authcache.user_id(sub) is None:
+        raise HTTPException(status_code=401, detail={"error": {"code": "user_not_found", "message": "User not found"}})
     return sub
 
+def require_admin(user: Optional[str] = Depends(require_user)) -> Optional[str]:
+    # Admins are listed by username in APIOS_ADMIN_USERS (comma-separated)
+    if not os.getenv("JWT_SECRET"):
+        return None
+    admins = {u.strip() for u in os.getenv("APIOS_ADMIN_USERS", "").split(",") if u.strip()}
+    if user not in admins:
+        raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "Admin only"}})
+    return user
+
 # Helper to standardize rows to response shape
 
 def _object_row_to_dict(row: Dict[str, Any]) -> Dict[str, Any]:
-    return {
+    obj = {
         "id": row["id"],
         "name": row.get("noun") or row.get("name") or None,
         "content": row.get("content"),
@@ -97,99 +194,425 @@ def _object_row_to_dict(row: Dict[str, Any]) -> Dict[str, Any]:
         "created_at": row.get("created_at") if isinstance(row, dict) else None,
         "updated_at": row.get("updated_at") if isinstance(row, dict) else None,
     }
+    if row.get("content_size") is not None:
+        # Offloaded to the blob store (db/blobs.py): listings point at it
+        # instead of carrying the document
+        obj["content_size"] = row["content_size"]
+        obj["content_url"] = f"/objects/{row['id']}/content"
+    return obj
+
+# Keyset pagination: cursors are opaque tokens wrapping the last id of a page
+MAX_PAGE_SIZE = 1000
+PROJECT_PAGE_SIZE = 100
+
+def _encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: Optional[str], after_id: Optional[int]) -> Optional[int]:
+    if cursor is None:
+        return after_id
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, _, value = raw.partition(":")
+        if prefix != "id":
+            raise ValueError(raw)
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail={"error": {"code": "invalid_cursor", "message": "Invalid cursor"}})
+
+def _next_cursor(rows: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    # Callers fetch limit+1 rows; an extra row means there is another page
+    if len(rows) > limit:
+        del rows[limit:]
+        return _encode_cursor(rows[-1]["id"])
+    return None
 
 # Read endpoints
 @app.get("/objects")
-def list_objects(request: Request, limit: int = 50, offset: int = 0, project_id: Optional[int] = None, meta_key: Optional[str] = None):
-    _metrics["requests"] += 1
-    where = ["1=1"]
-    params: List[Any] = []
-    if project_id is not None:
-        where.append("project_id=?")
-        params.append(project_id)
-    base_sql = f"SELECT id, noun, content FROM linguistic_objects WHERE {' AND '.join(where)} ORDER BY id LIMIT ? OFFSET ?"
-    with get_connection() as conn:
-        if meta_key:
-            # Filter objects that have a metadata key
-            sql = f"SELECT lo.id, lo.noun, lo.content FROM linguistic_objects lo JOIN metadata m ON m.object_id=lo.id WHERE {' AND '.join(where).replace('project_id','lo.project_id')} AND m.key=? GROUP BY lo.id ORDER BY lo.id LIMIT ? OFFSET ?"
-            cur = conn.execute(sql, params + [meta_key, limit, offset])
-        else:
-            cur = conn.execute(base_sql, params + [limit, offset])
-        rows = [ _object_row_to_dict(dict(r)) for r in cur.fetchall() ]
+def list_objects(request: Request, limit: int = 50, offset: int = 0, project_id: Optional[int] = None, meta_key: Optional[str] = None,
+                 after_id: Optional[int] = None, cursor: Optional[str] = None, explain: bool = False,
+                 ids: Optional[str] = None, include: Optional[str] = None, fields: Optional[str] = None):
+    # Metadata filters: meta.<key>=<value> | in(a,b) | prefix(p) | exists(); see api/metaquery.py
+    # Batch read: ids=1,2,3 fetches those of them matching the other filters;
+    # include=metadata,relations expands each page with one query per
+    # expansion; fields=id,name limits the columns read.
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = _decode_cursor(cursor, after_id)
+    if after is not None:
+        # Seek past the previous page instead of scanning and discarding OFFSET rows
+        offset = 0
     qp = request.query_params
-    wrap = ("wrap" in qp) or ("limit" in qp) or ("offset" in qp) or ("meta_key" in qp) or ("project_id" in qp)
+    try:
+        preds = metaquery.parse_filters(qp.multi_items(), meta_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": {"code": "invalid_filter", "message": str(e)}})
+    try:
+        wanted = expand.parse_list(fields, list(expand.FIELDS), "field")
+        includes = expand.parse_list(include, expand.INCLUDES, "include")
+        id_list = expand.parse_ids(ids) if ids is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": {"code": "invalid_request", "message": str(e)}})
+    cols = expand.columns(wanted)
+    plan = None
+    # Sharded: a project maps to one shard; an unscoped listing reads every
+    # shard and merges by id (see _shard_groups)
+    targets = shard_ids() if project_id is None else [shard_for_project(project_id)]
+    fanout = len(targets) > 1
+    pages: List[Any] = []
+    if id_list is not None:
+        # project_id and meta filters narrow the batch; ids they exclude are
+        # reported as missing
+        for shard, group in _shard_groups(id_list).items():
+            sql, params = metaquery.build_ids_query(preds, project_id, group, cols)
+            with get_connection(shard=shard) as conn:
+                pages.append((shard, conn.execute(sql, params).fetchall()))
+    else:
+        for shard in targets:
+            with get_connection(shard=shard) as conn:
+                # Fanned out, each shard returns its first offset+limit+1 rows
+                # and the merge applies the offset
+                sql, params = metaquery.build_query(conn, preds, project_id, after, limit + 1 + (offset if fanout else 0),
+                                                    0 if fanout else offset, cols, shard)
+                if explain and plan is None:
+                    plan = metaquery.explain(conn, sql, params)
+                pages.append((shard, conn.execute(sql, params).fetchall()))
+    origin: Dict[int, Optional[int]] = {}
+    merged = []
+    for shard, page in pages:
+        for r in page:
+            origin[r["id"]] = shard
+            merged.append(dict(r))
+    if len(pages) > 1:
+        merged.sort(key=lambda r: r["id"])
+        if id_list is None:
+            merged = merged[offset:]
+    rows = []
+    for r in merged:
+        obj = _object_row_to_dict(r)
+        if "project_id" in r:
+            obj["project_id"] = r["project_id"]
+        rows.append(expand.project(obj, wanted))
+    next_cursor = None if id_list is not None else _next_cursor(rows, limit)
+    if includes:
+        by_shard: Dict[Optional[int], List[Dict[str, Any]]] = {}
+        for obj in rows:
+            by_shard.setdefault(origin[obj["id"]], []).append(obj)
+        for shard, group_rows in by_shard.items():
+            with get_connection(shard=shard) as conn:
+                expand.expand(conn, group_rows, includes)
+    if id_list is not None:
+        return {"items": rows, "missing": sorted(set(id_list) - {o["id"] for o in rows})}
+    wrap = ("wrap" in qp) or ("limit" in qp) or ("offset" in qp) or ("meta_key" in qp) or ("project_id" in qp) \
+        or ("after_id" in qp) or ("cursor" in qp) or explain or bool(preds) or bool(includes) or bool(wanted)
     if wrap:
-        return {"items": rows, "limit": limit, "offset": offset}
+        out = {"items": rows, "limit": limit, "offset": offset, "next_cursor": next_cursor}
+        if plan is not None:
+            out["plan"] = plan
+        return out
     return rows
 
+def _shard_groups(obj_ids: List[int]) -> Dict[Optional[int], List[int]]:
+    # Unsharded: everything in one group; ids no shard knows are dropped
+    groups: Dict[Optional[int], List[int]] = {}
+    for oid in obj_ids:
+        try:
+            groups.setdefault(shard_for_object(oid), []).append(oid)
+        except LookupError:
+            continue
+    return groups
+
+def _object_shard(obj_id: int) -> Optional[int]:
+    try:
+        return shard_for_object(obj_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail={"error": {"code": "not_found", "message": "Object not found"}})
+
+def _http_date(ts: Optional[str]) -> Optional[str]:
+    # SQLite CURRENT_TIMESTAMP is "YYYY-MM-DD HH:MM:SS" in UTC
+    if not ts:
+        return None
+    try:
+        d = datetime.datetime.fromisoformat(str(ts)).replace(tzinfo=datetime.timezone.utc)
+    except ValueError:
+        return None
+    return email.utils.format_datetime(d, usegmt=True)
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[str]) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return objcache.etag_matches(inm, etag)
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified:
+        try:
+            return email.utils.parsedate_to_datetime(last_modified) <= email.utils.parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _cached_response(request: Request, entry: Any) -> Response:
+    body, etag, last_modified = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/objects/{obj_id}")
-def get_object(obj_id: int) -> Dict[str, Any]:
-    _metrics["requests"] += 1
-    with get_connection() as conn:
-        cur = conn.execute("SELECT id, noun, content FROM linguistic_objects WHERE id=?", (obj_id,))
+def get_object(obj_id: int, request: Request) -> Response:
+    # Serialised responses are cached (api/objcache.py) and invalidated by every
+    # write path touching the object; a matching If-None-Match is answered from
+    # the cache without touching the DB.
+    entry = objcache.cache.get(obj_id)
+    if entry is not None:
+        return _cached_response(request, entry)
+    read_seq = objcache.cache.seq()
+    with get_connection(shard=_object_shard(obj_id)) as conn:
+        cur = conn.execute("SELECT * FROM linguistic_objects WHERE id=?", (obj_id,))
         row = cur.fetchone()
         if not row:
-            _metrics["errors"] += 1
             raise HTTPException(status_code=404, detail={"error": {"code": "not_found", "message": "Object not found"}})
         obj = _object_row_to_dict(dict(row))
+        if row["content_ref"] is not None:
+            obj["content"] = blobs.read_text(row["content_ref"])
         mcur = conn.execute("SELECT key, value FROM metadata WHERE object_id=? ORDER BY key", (obj_id,))
         entries = [dict(m) for m in mcur.fetchall()]
         obj["metadata_entries"] = entries
         obj["metadata"] = entries
-    return obj
+    body = json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    entry = (body, objcache.make_etag(body), _http_date(obj.get("updated_at") or obj.get("created_at")))
+    objcache.cache.put(obj_id, entry, read_seq)
+    return _cached_response(request, entry)
+
+def _byte_range(header: Optional[str], size: int) -> Optional[Any]:
+    # A single "bytes=a-b" / "a-" / "-n" range as (start, end inclusive);
+    # None serves the whole body (no header, or one we don't honour)
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        elif last:
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start > end and last:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"},
+                            detail={"error": {"code": "range_not_satisfiable", "message": "Range not satisfiable"}})
+    return start, min(end, size - 1)
+
+@app.get("/objects/{obj_id}/content")
+def get_object_content(obj_id: int, request: Request) -> Response:
+    # The document body as text/plain. Offloaded content is streamed from the
+    # blob store: uncompressed blobs go out as a FileResponse (Range handled
+    # there, zero-copy when the server offers pathsend), compressed ones are
+    # decompressed on the fly and sliced to the requested range.
+    with get_connection(shard=_object_shard(obj_id)) as conn:
+        row = conn.execute("SELECT content, content_ref, content_size FROM linguistic_objects WHERE id=?", (obj_id,)).fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail={"error": {"code": "not_found", "message": "Object not found"}})
+    media_type = "text/plain; charset=utf-8"
+    ref = row["content_ref"]
+    if ref is None:
+        data = (row["content"] or "").encode("utf-8")
+        etag, size = objcache.make_etag(data), len(data)
+    else:
+        etag, size = blobs.etag(ref), row["content_size"]
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+    if objcache.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if ref is not None and blobs.parse_ref(ref)[0] == "raw":
+        return FileResponse(blobs.path(ref), media_type=media_type, headers=headers)
+    rng = _byte_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if rng is not None and if_range is not None and if_range != etag:
+        rng = None
+    start, end = rng if rng is not None else (0, size - 1)
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    status = 200
+    if rng is not None:
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    if ref is None:
+        return Response(content=data[start:end + 1], status_code=status, media_type=media_type, headers=headers)
+    return StreamingResponse(blobs.iter_bytes(ref, start, end), status_code=status, media_type=media_type, headers=headers)
 
 @app.get("/projects/{project_id}/objects")
-def list_project_objects(project_id: int, credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> Dict[str, Any]:
-    _metrics["requests"] += 1
+def list_project_objects(project_id: int, limit: int = PROJECT_PAGE_SIZE, after_id: Optional[int] = None, cursor: Optional[str] = None,
+                         credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> Dict[str, Any]:
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = _decode_cursor(cursor, after_id)
     # Optional authorization: enforce membership if JWT is configured and a token is provided
     if os.getenv("JWT_SECRET") and credentials and credentials.credentials:
-        sub = decode_token(credentials.credentials)
+        sub = authcache.verify_token(credentials.credentials)
         if not sub:
             raise HTTPException(status_code=401, detail={"error": {"code": "invalid_token", "message": "Invalid token"}})
-        with get_connection() as conn:
-            cur = conn.execute("SELECT u.id FROM users u WHERE u.username=?", (sub,))
-            urow = cur.fetchone()
-            if not urow:
-                raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "No access"}})
-            uid = urow[0]
-            # Owner or member allowed to read
-            cur = conn.execute("SELECT 1 FROM projects WHERE id=? AND owner_id=?", (project_id, uid))
-            if not cur.fetchone():
-                cur = conn.execute("SELECT 1 FROM projects_users WHERE project_id=? AND user_id=?", (project_id, uid))
-                if not cur.fetchone():
-                    raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "Not a project member"}})
-    with get_connection() as conn:
-        cur = conn.execute("SELECT id, noun, content FROM linguistic_objects WHERE project_id=? ORDER BY id", (project_id,))
+        uid = authcache.user_id(sub)
+        if uid is None:
+            raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "No access"}})
+        # Owner or member allowed to read
+        if authcache.project_role(uid, project_id) is None:
+            raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "Not a project member"}})
+    with get_connection(shard=shard_for_project(project_id)) as conn:
+        cur = conn.execute(
+            "SELECT id, noun, content, content_size FROM linguistic_objects WHERE project_id=? AND id>? ORDER BY id LIMIT ?",
+            (project_id, after if after is not None else -1, limit + 1)
+        )
         rows = [ _object_row_to_dict(dict(r)) for r in cur.fetchall() ]
-    return {"items": rows}
+    next_cursor = _next_cursor(rows, limit)
+    return {"items": rows, "limit": limit, "next_cursor": next_cursor}
+
+# Graph traversal over relations
+def _check_direction(direction: str) -> None:
+    if direction not in graph.DIRECTIONS:
+        raise HTTPException(status_code=422, detail={"error": {"code": "invalid_input", "message": "direction must be one of out, in, both"}})
+
+@app.get("/objects/{obj_id}/neighbors")
+def object_neighbors(obj_id: int, direction: str = "out", predicate: Optional[str] = None, depth: int = 1,
+                     max_nodes: int = graph.GRAPH_MAX_NODES) -> Dict[str, Any]:
+    _check_direction(direction)
+    limits = graph.Limits(max_nodes=max(1, min(max_nodes, graph.GRAPH_MAX_NODES)))
+    # Sharded: traversal stays within the start object's shard
+    with get_connection(shard=_object_shard(obj_id)) as conn:
+        if not conn.execute("SELECT 1 FROM linguistic_objects WHERE id=?", (obj_id,)).fetchone():
+            raise HTTPException(status_code=404, detail={"error": {"code": "not_found", "message": "Object not found"}})
+        return graph.neighbors(conn, obj_id, direction=direction, predicate=predicate, depth=depth, limits=limits)
+
+@app.get("/paths")
+def find_path(from_id: int = Query(..., alias="from"), to_id: int = Query(..., alias="to"), max_depth: int = graph.GRAPH_MAX_DEPTH,
+              direction: str = "out", predicate: Optional[str] = None) -> Dict[str, Any]:
+    _check_direction(direction)
+    with get_connection(shard=_object_shard(from_id)) as conn:
+        return graph.shortest_path(conn, from_id, to_id, direction=direction, predicate=predicate, max_depth=max_depth)
+
+# Full-text search over object names and content
+@app.get("/search")
+def search_objects(q: str = Query(..., min_length=1), project_id: Optional[int] = None, limit: int = 20,
+                   cursor: Optional[str] = None) -> Dict[str, Any]:
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    after = None
+    if cursor is not None:
+        try:
+            after = _decode_search_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail={"error": {"code": "invalid_cursor", "message": "Invalid cursor"}})
+    targets = shard_ids() if project_id is None else [shard_for_project(project_id)]
+    results = []
+    for shard in targets:
+        with get_connection(shard=shard) as conn:
+            try:
+                results.append(_search(conn, q, project_id=project_id, limit=limit, after=after))
+            except sqlite3.OperationalError:
+                raise HTTPException(status_code=400, detail={"error": {"code": "invalid_query", "message": "Invalid search query"}})
+    if len(results) == 1:
+        return results[0]
+    # Shards rank independently; merge on the same (score, id) order
+    items = sorted((i for r in results for i in r["items"]), key=lambda i: (i["score"], i["id"]))
+    more = len(items) > limit or any(r["next_cursor"] for r in results)
+    items = items[:limit]
+    next_cursor = _encode_search_cursor(items[-1]["score"], items[-1]["id"]) if more and items else None
+    return {"items": items, "limit": limit, "next_cursor": next_cursor}
+
+# Bulk export: one JSON line per object with its metadata and outgoing relations
+@app.get("/export/objects.ndjson")
+def export_objects(project_id: Optional[int] = None, since_id: int = 0, gzip: bool = False):
+    # Sharded: a project export reads its shard; otherwise shards are merged by id
+    targets = shard_ids() if project_id is None else [shard_for_project(project_id)]
+    body = iter_objects(project_id=project_id, since_id=since_id, shards=targets)
+    headers = {"Cache-Control": "no-store"}
+    if gzip:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+# Change feed: entries are written by triggers in the same transaction as
+# the row change (see db/changes.py)
+def _changes_shard(shard: Optional[int]) -> Optional[int]:
+    # Sharded: every shard has its own log; consumers follow each one
+    if not sharded():
+        return None
+    if shard is None or shard not in shard_ids():
+        raise HTTPException(status_code=400, detail={"error": {"code": "shard_required", "message": f"shard must be one of 0..{len(shard_ids()) - 1}"}})
+    return shard
+
+@app.get("/changes")
+async def get_changes(since: int = 0, limit: int = 100, wait: float = 0, shard: Optional[int] = None):
+    # wait>0 long-polls: returns as soon as something newer than `since` commits
+    limit = max(1, min(limit, changes.CHANGES_MAX_LIMIT))
+    shard = _changes_shard(shard)
+    try:
+        return await changes.poll(since, limit, wait, shard)
+    except changes.Compacted as e:
+        raise HTTPException(status_code=410, detail={"error": {"code": "changes_compacted", "message": str(e)}})
+
+@app.get("/changes/stream")
+async def stream_changes(request: Request, since: Optional[int] = None, shard: Optional[int] = None):
+    # Server-Sent Events; reconnecting clients resume from Last-Event-ID
+    if since is None:
+        last = request.headers.get("last-event-id", "")
+        since = int(last) if last.isdigit() else 0
+    headers = {"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    return StreamingResponse(changes.stream(request, since, _changes_shard(shard)), media_type="text/event-stream", headers=headers)
 
 # Auth endpoints
+# bcrypt runs in the hashing process pool (api/hashing.py); these handlers are
+# async so a login burst waits there instead of occupying threadpool slots.
+_OVERLOADED = HTTPException(status_code=503, headers={"Retry-After": "1"},
+                            detail={"error": {"code": "overloaded", "message": "Too many concurrent password operations"}})
+
 @app.post("/users/register")
-def register_user(data: UserRegister) -> Dict[str, Any]:
-    with get_connection() as conn:
-        cur = conn.execute("SELECT 1 FROM users WHERE username=?", (data.username,))
-        if cur.fetchone():
-            raise HTTPException(status_code=400, detail={"error": {"code": "username_exists", "message": "Username already exists"}})
-        if data.email:
-            cur = conn.execute("SELECT 1 FROM users WHERE email=?", (data.email,))
+async def register_user(data: UserRegister) -> Dict[str, Any]:
+    def _check():
+        with get_connection() as conn:
+            cur = conn.execute("SELECT 1 FROM users WHERE username=?", (data.username,))
             if cur.fetchone():
-                raise HTTPException(status_code=400, detail={"error": {"code": "email_exists", "message": "Email already exists"}})
-        ph = hash_password(data.password)
-        cur = conn.execute(
-            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
-            (data.username, data.email, ph)
-        )
-        uid = cur.lastrowid
-        conn.commit()
-        return {"id": uid, "username": data.username}
+                raise HTTPException(status_code=400, detail={"error": {"code": "username_exists", "message": "Username already exists"}})
+            if data.email:
+                cur = conn.execute("SELECT 1 FROM users WHERE email=?", (data.email,))
+                if cur.fetchone():
+                    raise HTTPException(status_code=400, detail={"error": {"code": "email_exists", "message": "Email already exists"}})
+
+    await run_in_threadpool(_check)
+    try:
+        ph = await hash_password_async(data.password)
+    except Overloaded:
+        raise _OVERLOADED
+
+    def _insert(conn):
+        try:
+            cur = conn.execute(
+                "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                (data.username, data.email, ph)
+            )
+        except sqlite3.IntegrityError:
+            # Lost a race with a concurrent registration
+            raise HTTPException(status_code=400, detail={"error": {"code": "username_exists", "message": "Username or email already exists"}})
+        return cur.lastrowid
+
+    uid = await run_in_threadpool(run_write, _insert)
+    return {"id": uid, "username": data.username}
 
 @app.post("/users/login")
-def login_user(data: UserLogin) -> Dict[str, Any]:
-    with get_connection() as conn:
-        cur = conn.execute("SELECT username, password_hash FROM users WHERE username=?", (data.username,))
-        row = cur.fetchone()
-        if not row or not row["password_hash"] or not verify_password(data.password, row["password_hash"]):
-            raise HTTPException(status_code=401, detail={"error": {"code": "invalid_credentials", "message": "Invalid credentials"}})
+async def login_user(data: UserLogin) -> Dict[str, Any]:
+    def _lookup():
+        with get_connection() as conn:
+            cur = conn.execute("SELECT username, password_hash FROM users WHERE username=?", (data.username,))
+            return cur.fetchone()
+
+    row = await run_in_threadpool(_lookup)
+    ok = False
+    if row and row["password_hash"]:
+        try:
+            ok = await verify_password_async(data.password, row["password_hash"])
+        except Overloaded:
+            raise _OVERLOADED
+    if not ok:
+        raise HTTPException(status_code=401, detail={"error": {"code": "invalid_credentials", "message": "Invalid credentials"}})
     access = create_access_token(sub=data.username, expires_minutes=int(os.getenv("JWT_ACCESS_MINUTES", "15")))
     refresh = create_access_token(sub=data.username, expires_minutes=int(os.getenv("JWT_REFRESH_MINUTES", "43200")))  # 30 days
     return {"access_token": access, "refresh_token": refresh, "token_type": "bearer"}
@@ -205,76 +628,232 @@ def refresh_token(payload: Dict[str, str]) -> Dict[str, Any]:
     access = create_access_token(sub=sub, expires_minutes=int(os.getenv("JWT_ACCESS_MINUTES", "15")))
     return {"access_token": access, "token_type": "bearer"}
 
+# Admin: online backups (see db/backup.py)
+@app.get("/admin/backups")
+def get_backups(user: Optional[str] = Depends(require_admin)):
+    return {"status": backups.stats(), "backups": list_backups(backups.directory)}
+
+@app.post("/admin/backups", status_code=202)
+async def create_backup(compress: Optional[bool] = None, wait: bool = False, user: Optional[str] = Depends(require_admin)):
+    # wait=1 returns the finished backup (201); otherwise it runs in the background
+    try:
+        if wait:
+            result = await run_in_threadpool(backups.run, compress)
+            return JSONResponse(result, status_code=201)
+        backups.start_in_background(compress=compress)
+    except (BackupError, sqlite3.Error, OSError) as e:
+        code = 409 if backups.running() else 500
+        raise HTTPException(status_code=code, detail={"error": {"code": "backup_failed" if code == 500 else "backup_running", "message": str(e)}})
+    return {"status": "started"}
+
 # Write endpoints (authorization required if JWT_SECRET is set)
+# Each endpoint hands a write unit to the single writer (db.writer), which
+# group-commits concurrent units; exceptions raised inside a unit roll back
+# only that unit and are re-raised to the caller.
 @app.post("/objects")
 def create_object(payload: ObjectCreate, user: Optional[str] = Depends(require_user)) -> Dict[str, Any]:
-    with get_connection() as conn:
-        # Authorization: if project_id provided and JWT enabled, only project owners can add
-        if os.getenv("JWT_SECRET") and payload.project_id is not None and user is not None:
-            # find user id
-            cur = conn.execute("SELECT id FROM users WHERE username=?", (user,))
-            urow = cur.fetchone()
-            if not urow:
-                raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "User not found"}})
-            uid = urow[0]
-            # Owner via projects.owner_id or projects_users role 'owner'
-            is_owner = False
-            cur = conn.execute("SELECT 1 FROM projects WHERE id=? AND owner_id=?", (payload.project_id, uid))
-            if cur.fetchone():
-                is_owner = True
-            else:
-                cur = conn.execute("SELECT role FROM projects_users WHERE project_id=? AND user_id=?", (payload.project_id, uid))
-                prow = cur.fetchone()
-                if prow and prow[0] == "owner":
-                    is_owner = True
-            if not is_owner:
-                raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "Only owners can add objects"}})
-        # Validate project if provided
-        if payload.project_id is not None:
-            cur = conn.execute("SELECT 1 FROM projects WHERE id=?", (payload.project_id,))
-            if not cur.fetchone():
+    # Authorization: if project_id provided and JWT enabled, only project owners can add
+    role = None
+    if os.getenv("JWT_SECRET") and payload.project_id is not None and user is not None:
+        uid = authcache.user_id(user)
+        if uid is None:
+            raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "User not found"}})
+        # Owner via projects.owner_id or projects_users role 'owner'
+        role = authcache.project_role(uid, payload.project_id)
+        if role != "owner":
+            raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "Only owners can add objects"}})
+
+    # Validate project if provided (projects live in the catalog); a role
+    # lookup that found one already proved it exists
+    if payload.project_id is not None and role is None:
+        with get_connection() as conn:
+            if not conn.execute("SELECT 1 FROM projects WHERE id=?", (payload.project_id,)).fetchone():
                 raise HTTPException(status_code=422, detail={"error": {"code": "invalid_project", "message": "Invalid project_id"}})
+
+    content, content_ref, content_size = blobs.offload(payload.content)
+
+    def _insert(conn):
         # Insert object
         cur = conn.execute(
-            "INSERT INTO linguistic_objects (noun, content) VALUES (?, ?)",
-            (payload.name, payload.content)
+            "INSERT INTO linguistic_objects (noun, content, content_ref, content_size, project_id) VALUES (?, ?, ?, ?, ?)",
+            (payload.name, content, content_ref, content_size, payload.project_id)
         )
         obj_id = cur.lastrowid
-        if payload.project_id is not None:
-            conn.execute("UPDATE linguistic_objects SET project_id=? WHERE id=?", (payload.project_id, obj_id))
+        if content_ref is not None:
+            blobs.index_text(conn, [(obj_id, payload.name, payload.content)])
         # Insert metadata entries if provided
         if payload.metadata:
-            for k, v in payload.metadata.items():
-                conn.execute(
-                    "INSERT OR IGNORE INTO metadata (key, value, object_id) VALUES (?, ?, ?)",
-                    (k, v, obj_id)
-                )
-        conn.commit()
-        return {
-            "id": obj_id,
-            "name": payload.name,
-            "content": payload.content,
-            "created_at": None,
-            "updated_at": None,
-            "metadata": [{"key": k, "value": v} for k, v in (payload.metadata or {}).items()]
-        }
+            conn.executemany(
+                "INSERT OR IGNORE INTO metadata (key, value, object_id) VALUES (?, ?, ?)",
+                [(k, v, obj_id) for k, v in payload.metadata.items()]
+            )
+        return obj_id
+
+    obj_id = run_write(_insert, shard_for_project(payload.project_id, assign=True))
+    objcache.cache.invalidate(obj_id)
+    return {
+        "id": obj_id,
+        "name": payload.name,
+        "content": payload.content,
+        "created_at": None,
+        "updated_at": None,
+        "metadata": [{"key": k, "value": v} for k, v in (payload.metadata or {}).items()]
+    }
+
+_PROJECT_ERRORS = {"invalid_project": "Invalid project_id", "forbidden": "Only owners can add objects"}
+
+@app.post("/objects/batch")
+async def create_objects_batch(request: Request, chunk_size: int = BATCH_CHUNK, user: Optional[str] = Depends(require_user)) -> Dict[str, Any]:
+    # Body: JSON array of ObjectCreate, {"items": [...], "relations": [...]}, or an
+    # NDJSON stream (application/x-ndjson) where lines carrying "predicate" are relations.
+    chunk_size = max(1, min(chunk_size, BATCH_MAX_CHUNK))
+    uid: Optional[int] = None
+    if os.getenv("JWT_SECRET") and user is not None:
+        uid = await run_in_threadpool(authcache.user_id, user)
+        if uid is None:
+            raise HTTPException(status_code=403, detail={"error": {"code": "forbidden", "message": "User not found"}})
+
+    ids: List[Optional[int]] = []
+    errors: List[Dict[str, Any]] = []
+    projects: Dict[int, Optional[str]] = {}
+    pending: List[Any] = []
+    raw_relations: List[Any] = []
+
+    def _accept(raw: Any) -> None:
+        idx = len(ids)
+        ids.append(None)
+        try:
+            pending.append((idx, ObjectCreate.model_validate(raw)))
+        except ValidationError as e:
+            errors.append({"index": idx, **_error("invalid_input", e.errors()[0]["msg"])})
+
+    def _flush(chunk: List[Any]) -> None:
+        new = {o.project_id for _, o in chunk if o.project_id is not None and o.project_id not in projects}
+        if new:
+            with get_connection() as conn:
+                projects.update(resolve_projects(conn, new, uid))
+        ok = []
+        for idx, o in chunk:
+            code = projects.get(o.project_id) if o.project_id is not None else None
+            if code:
+                errors.append({"index": idx, **_error(code, _PROJECT_ERRORS[code])})
+            else:
+                ok.append((idx, o))
+        by_shard: Dict[Optional[int], List[Any]] = {}
+        for idx, o in ok:
+            by_shard.setdefault(shard_for_project(o.project_id, assign=True), []).append((idx, o))
+        for shard, group in by_shard.items():
+            rows = [(o.name, o.content, blobs.offload(o.content), o.project_id, o.metadata) for _, o in group]
+            try:
+                new_ids = run_write(lambda conn, rows=rows: insert_objects(conn, rows), shard)
+            except sqlite3.Error:
+                # Retry the chunk row by row so only the rows that fail are reported
+                new_ids = run_write(lambda conn, rows=rows: insert_objects_each(conn, rows), shard)
+            for (idx, _), oid in zip(group, new_ids):
+                if isinstance(oid, sqlite3.Error):
+                    errors.append({"index": idx, **_error("insert_failed", str(oid))})
+                else:
+                    ids[idx] = oid
+
+    async def _drain(force: bool = False) -> None:
+        while pending and (force or len(pending) >= chunk_size):
+            chunk = pending[:chunk_size]
+            del pending[:chunk_size]
+            await run_in_threadpool(_flush, chunk)
+
+    ctype = request.headers.get("content-type", "")
+    if "ndjson" in ctype or "jsonl" in ctype:
+        buf = b""
+
+        def _line(line: bytes) -> None:
+            line = line.strip()
+            if not line:
+                return
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                ids.append(None)
+                errors.append({"index": len(ids) - 1, **_error("invalid_input", "Malformed JSON line")})
+                return
+            if isinstance(raw, dict) and "predicate" in raw:
+                raw_relations.append(raw)
+            else:
+                _accept(raw)
+
+        async for part in request.stream():
+            buf += part
+            *lines, buf = buf.split(b"\n")
+            for line in lines:
+                _line(line)
+            await _drain()
+        _line(buf)
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail={"error": {"code": "bad_request", "message": "Malformed JSON body"}})
+        if isinstance(body, dict):
+            items, raw_relations = body.get("items") or [], body.get("relations") or []
+        else:
+            items = body
+        if not isinstance(items, list) or not isinstance(raw_relations, list):
+            raise HTTPException(status_code=400, detail={"error": {"code": "bad_request", "message": "Expected a list of objects"}})
+        for raw in items:
+            _accept(raw)
+            await _drain()
+    await _drain(force=True)
+
+    # Relations are resolved once every item has an id, so they may point forward
+    rel_rows: Dict[Optional[int], List[Any]] = {}
+    rel_errors: List[Dict[str, Any]] = []
+    for i, raw in enumerate(raw_relations):
+        try:
+            r = BatchRelation.model_validate(raw)
+        except ValidationError as e:
+            rel_errors.append({"index": i, **_error("invalid_input", e.errors()[0]["msg"])})
+            continue
+        ends = [ids[j] if 0 <= j < len(ids) else None for j in (r.subject_index, r.object_index)]
+        if None in ends:
+            rel_errors.append({"index": i, **_error("invalid_input", "Invalid subject_index or object_index")})
+            continue
+        shard = shard_for_object(ends[0])
+        if shard != shard_for_object(ends[1]):
+            rel_errors.append({"index": i, **_error("cross_shard_relation", "Related objects live in different shards")})
+            continue
+        rel_rows.setdefault(shard, []).append((ends[0], r.predicate, ends[1]))
+    inserted = 0
+    for shard, shard_rows in rel_rows.items():
+        for start in range(0, len(shard_rows), chunk_size):
+            part = shard_rows[start:start + chunk_size]
+            inserted += await run_in_threadpool(run_write, lambda conn, part=part: insert_relations(conn, part), shard)
+    errors.sort(key=lambda e: e["index"])
+    return {"ids": ids, "errors": errors, "relations_inserted": inserted, "relation_errors": rel_errors}
 
 @app.post("/metadata")
 def create_metadata(item: MetadataCreate, user: Optional[str] = Depends(require_user)) -> Dict[str, Any]:
-    with get_connection() as conn:
+    def _insert(conn):
         cur = conn.execute("SELECT 1 FROM linguistic_objects WHERE id=?", (item.object_id,))
         if not cur.fetchone():
             raise HTTPException(status_code=422, detail={"error": {"code": "invalid_object", "message": "Invalid object_id"}})
-        conn.execute(
+        cur = conn.execute(
             "INSERT OR IGNORE INTO metadata (key, value, object_id) VALUES (?, ?, ?)",
             (item.key, item.value, item.object_id)
         )
-        conn.commit()
-        return {"object_id": item.object_id, "key": item.key, "value": item.value}
+        if cur.rowcount:
+            # The object's representation includes its metadata; keeps Last-Modified honest
+            conn.execute("UPDATE linguistic_objects SET updated_at=CURRENT_TIMESTAMP WHERE id=?", (item.object_id,))
+
+    try:
+        shard = shard_for_object(item.object_id)
+    except LookupError:
+        raise HTTPException(status_code=422, detail={"error": {"code": "invalid_object", "message": "Invalid object_id"}})
+    run_write(_insert, shard)
+    objcache.cache.invalidate(item.object_id)
+    return {"object_id": item.object_id, "key": item.key, "value": item.value}
 
 @app.post("/relations")
 def create_relation(rel: RelationCreate, user: Optional[str] = Depends(require_user)) -> Dict[str, Any]:
-    with get_connection() as conn:
+    def _insert(conn):
         cur = conn.execute("SELECT COUNT(*) AS c FROM linguistic_objects WHERE id IN (?, ?)", (rel.subject_id, rel.object_id))
         cnt = cur.fetchone()[0]
         if cnt != 2:
@@ -283,5 +862,12 @@ def create_relation(rel: RelationCreate, user: Optional[str] = Depends(require_u
             "INSERT OR IGNORE INTO relations (subject_id, predicate, object_id) VALUES (?, ?, ?)",
             (rel.subject_id, rel.predicate, rel.object_id)
         )
-        conn.commit()
-        return {"from_id": rel.subject_id, "predicate": rel.predicate, "type": rel.predicate, "to_id": rel.object_id}
+
+    try:
+        shard = shard_for_object(rel.subject_id)
+        if shard != shard_for_object(rel.object_id):
+            raise HTTPException(status_code=422, detail={"error": {"code": "cross_shard_relation", "message": "Related objects live in different shards"}})
+    except LookupError:
+        raise HTTPException(status_code=422, detail={"error": {"code": "invalid_input", "message": "Invalid subject_id or object_id"}})
+    run_write(_insert, shard)
+    return {"from_id": rel.subject_id, "predicate": rel.predicate, "type": rel.predicate, "to_id": rel.object_id}
@@ -0,0 +1,209 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from db.connection import get_connection
+
+# Filters arrive as query parameters:
+#   meta.lang=en                 value equals
+#   meta.status=in(draft,final)  value in list
+#   meta.title=prefix(intro)     value starts with
+#   meta.reviewed=exists()       key present (same as the legacy meta_key=)
+# Every predicate becomes a parameterised EXISTS (or the driving index range),
+# all ANDed together.
+
+META_PREFIX = "meta."
+META_STATS_TTL = float(os.getenv("APIOS_META_STATS_TTL", "300"))
+# Drive the query from the metadata index when the best predicate is expected
+# to match less than this fraction of objects; otherwise walk objects in id
+# order and let LIMIT stop early.
+DRIVE_RATIO = 0.2
+
+log = logging.getLogger("apios")
+
+# Relies on idx_metadata_key_value_object (db/migrations.py)
+
+
+class Predicate:
+    def __init__(self, key: str, op: str, values: List[str]):
+        self.key = key
+        self.op = op
+        self.values = values
+
+    def condition(self, alias: str) -> Tuple[str, List[Any]]:
+        if self.op == "eq":
+            return f"{alias}.key=? AND {alias}.value=?", [self.key, self.values[0]]
+        if self.op == "in":
+            marks = ",".join("?" * len(self.values))
+            return f"{alias}.key=? AND {alias}.value IN ({marks})", [self.key] + self.values
+        if self.op == "prefix":
+            # Index range instead of LIKE, which is case-insensitive and unindexed
+            lo = self.values[0]
+            stem = lo.rstrip("\U0010ffff")
+            if not stem:
+                # Only U+10FFFF: nothing sorts above it, so the range is open
+                return f"{alias}.key=? AND {alias}.value>=?", [self.key, lo]
+            nxt = ord(stem[-1]) + 1
+            # Surrogates can't be encoded; UTF-8 byte order skips straight past them
+            hi = stem[:-1] + chr(0xE000 if 0xD800 <= nxt <= 0xDFFF else nxt)
+            return f"{alias}.key=? AND {alias}.value>=? AND {alias}.value<?", [self.key, lo, hi]
+        return f"{alias}.key=?", [self.key]
+
+    def estimate(self, stats: Dict[str, Tuple[int, int]]) -> float:
+        rows, distinct = stats.get(self.key, (0, 0))
+        if rows == 0:
+            return 0.0
+        per_value = rows / max(1, distinct)
+        if self.op == "eq":
+            return per_value
+        if self.op == "in":
+            return min(rows, per_value * len(self.values))
+        if self.op == "prefix":
+            return rows / 4.0
+        return float(rows)
+
+
+def _parse_value(key: str, raw: str) -> Predicate:
+    if raw.startswith("in(") and raw.endswith(")"):
+        values = [v for v in raw[3:-1].split(",") if v != ""]
+        if not values:
+            raise ValueError(f"empty in() for {key}")
+        return Predicate(key, "in", values)
+    if raw.startswith("prefix(") and raw.endswith(")"):
+        if len(raw) == len("prefix()"):
+            raise ValueError(f"empty prefix() for {key}")
+        return Predicate(key, "prefix", [raw[7:-1]])
+    if raw == "exists()":
+        return Predicate(key, "exists", [])
+    return Predicate(key, "eq", [raw])
+
+
+def parse_filters(params: Iterable[Tuple[str, str]], meta_key: Optional[str] = None) -> List[Predicate]:
+    preds = []
+    for name, raw in params:
+        if name.startswith(META_PREFIX):
+            key = name[len(META_PREFIX):]
+            if not key:
+                raise ValueError("missing metadata key")
+            preds.append(_parse_value(key, raw))
+    if meta_key:
+        preds.append(Predicate(meta_key, "exists", []))
+    return preds
+
+
+Snapshot = Tuple[int, Dict[str, Tuple[int, int]]]  # object count, {key: (rows, distinct values)}
+
+
+class MetaStats:
+    # Per database (catalog or shard): the object count and per-key (rows,
+    # distinct values). The count is a real COUNT(*); ids aren't dense
+    # (sharded ids start at 2**40). Requests are served the last snapshot;
+    # one older than META_STATS_TTL seconds is recomputed on a background
+    # thread, one at a time per database, so the GROUP BY scan never runs on
+    # the request path. Until the first snapshot lands, no predicate drives.
+
+    def __init__(self, ttl: float = META_STATS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshots: Dict[Optional[int], Tuple[float, Snapshot]] = {}
+        self._refreshing: Set[Optional[int]] = set()
+
+    def get(self, shard: Optional[int] = None) -> Snapshot:
+        with self._lock:
+            at, snap = self._snapshots.get(shard, (None, (0, {})))
+        if at is None or time.monotonic() - at >= self.ttl:
+            self.start_refresh(shard)
+        return snap
+
+    def start_refresh(self, shard: Optional[int] = None) -> None:
+        with self._lock:
+            if shard in self._refreshing:
+                return
+            self._refreshing.add(shard)
+        threading.Thread(target=self._refresh_in_background, args=(shard,), name="apios-metastats", daemon=True).start()
+
+    def _refresh_in_background(self, shard: Optional[int]) -> None:
+        try:
+            with get_connection(shard=shard) as conn:
+                self.refresh(conn, shard)
+        except sqlite3.Error as e:
+            log.warning("metadata stats refresh failed: %s", e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(shard)
+
+    def refresh(self, conn, shard: Optional[int] = None) -> Snapshot:
+        total = conn.execute("SELECT COUNT(*) FROM linguistic_objects").fetchone()[0]
+        keys = {r[0]: (r[1], r[2]) for r in conn.execute(
+            "SELECT key, COUNT(*), COUNT(DISTINCT value) FROM metadata GROUP BY key")}
+        with self._lock:
+            self._snapshots[shard] = (time.monotonic(), (total, keys))
+        return total, keys
+
+    def invalidate(self) -> None:
+        # Keeps serving the current snapshots until the refresh lands
+        with self._lock:
+            self._snapshots = {k: (0.0, snap) for k, (_, snap) in self._snapshots.items()}
+
+
+stats = MetaStats()
+
+
+def build_query(conn, preds: List[Predicate], project_id: Optional[int], after: Optional[int],
+                limit: int, offset: int, cols: str = "lo.id, lo.noun, lo.content",
+                shard: Optional[int] = None) -> Tuple[str, List[Any]]:
+    conds: List[str] = []
+    params: List[Any] = []
+    driver: Optional[Predicate] = None
+    if preds:
+        total, keys = stats.get(shard)
+        preds = sorted(preds, key=lambda p: p.estimate(keys))
+        if preds[0].estimate(keys) < total * DRIVE_RATIO:
+            driver, preds = preds[0], preds[1:]
+    if driver is not None:
+        # (key, object_id) is unique, so the driving row is one per object;
+        # CROSS JOIN pins metadata as the outer loop.
+        cond, p = driver.condition("d")
+        conds.append(cond)
+        params += p
+        id_col = "d.object_id"
+        source = "metadata d CROSS JOIN linguistic_objects lo ON lo.id=d.object_id"
+    else:
+        id_col = "lo.id"
+        source = "linguistic_objects lo"
+    if project_id is not None:
+        conds.append("lo.project_id=?")
+        params.append(project_id)
+    if after is not None:
+        conds.append(f"{id_col}>?")
+        params.append(after)
+    _exists(preds, conds, params)
+    where = " AND ".join(conds) or "1=1"
+    sql = f"SELECT {cols} FROM {source} WHERE {where} ORDER BY {id_col} LIMIT ? OFFSET ?"
+    return sql, params + [limit, offset]
+
+
+def build_ids_query(preds: List[Predicate], project_id: Optional[int], ids: List[int],
+                    cols: str = "lo.id, lo.noun, lo.content") -> Tuple[str, List[Any]]:
+    # Batch read by id: the id list drives, the filters only narrow it
+    conds = [f"lo.id IN ({','.join('?' * len(ids))})"]
+    params: List[Any] = list(ids)
+    if project_id is not None:
+        conds.append("lo.project_id=?")
+        params.append(project_id)
+    _exists(preds, conds, params)
+    return f"SELECT {cols} FROM linguistic_objects lo WHERE {' AND '.join(conds)} ORDER BY lo.id", params
+
+
+def _exists(preds: List[Predicate], conds: List[str], params: List[Any]) -> None:
+    for pred in preds:
+        cond, p = pred.condition("m")
+        conds.append(f"EXISTS (SELECT 1 FROM metadata m WHERE m.object_id=lo.id AND {cond})")
+        params += p
+
+
+def explain(conn, sql: str, params: List[Any]) -> List[str]:
+    return [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
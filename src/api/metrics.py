@@ -0,0 +1,227 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from db import sqlite as _sqlite
+
+SLOW_QUERY_MS = float(os.getenv("APIOS_SLOW_QUERY_MS", "200"))
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+HELP = {
+    "apios_http_requests_total": ("counter", "HTTP requests by route, method and status"),
+    "apios_http_request_duration_seconds": ("histogram", "HTTP request latency"),
+    "apios_db_acquire_seconds": ("histogram", "Time waiting for a pooled connection"),
+    "apios_db_statement_seconds": ("histogram", "Statement execute time (prepare + first step)"),
+    "apios_db_fetch_seconds_total": ("counter", "Time spent fetching result rows"),
+    "apios_db_rows_total": ("counter", "Rows returned (SELECT) or changed (DML)"),
+    "apios_db_slow_queries_total": ("counter", "Statements slower than APIOS_SLOW_QUERY_MS"),
+    "apios_password_hash_seconds": ("histogram", "bcrypt hash/verify time in the worker"),
+    "apios_password_queue_seconds": ("histogram", "Time waiting for a hashing worker"),
+    "apios_password_rejected_total": ("counter", "Password operations shed because the hashing queue was full"),
+    "apios_admission_wait_seconds": ("histogram", "Time queued for an admission slot"),
+    "apios_admission_shed_total": ("counter", "Requests rejected by admission control, by class and reason"),
+    "apios_db_busy_total": ("counter", "Requests failed with 503 because SQLite stayed locked past the busy timeout"),
+}
+
+slow_log = logging.getLogger("apios.slow")
+
+
+class _Shard:
+    # Per-thread accumulators: only the owning thread writes, so the hot
+    # path takes no lock; readers merge all shards at scrape time.
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.hists: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[_Shard] = []
+        self.slow: "deque[Dict[str, Any]]" = deque(maxlen=100)
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0) -> None:
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        hists = self._shard().hists
+        key = (name, labels)
+        h = hists.get(key)
+        if h is None:
+            # per-bucket counts (+Inf last), then sum and count
+            h = hists[key] = [0.0] * (len(BUCKETS) + 3)
+        h[bisect.bisect_left(BUCKETS, value)] += 1
+        h[-2] += value
+        h[-1] += 1
+
+    def snapshot(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], List[float]]]:
+        with self._lock:
+            shards = list(self._shards)
+        counters: Dict[Tuple[str, Labels], float] = {}
+        hists: Dict[Tuple[str, Labels], List[float]] = {}
+        for shard in shards:
+            for key, v in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0.0) + v
+            for key, h in list(shard.hists.items()):
+                acc = hists.setdefault(key, [0.0] * len(h))
+                for i, v in enumerate(h):
+                    acc[i] += v
+        return counters, hists
+
+    def reset(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard.counters.clear()
+                shard.hists.clear()
+        self.slow.clear()
+
+
+registry = Registry()
+
+
+@contextmanager
+def timer(name: str, labels: Labels = ()) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, labels, time.perf_counter() - start)
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    # Literals -> ?, IN (?, ?, ...) -> IN (...), whitespace collapsed
+    fp = _LITERALS.sub("?", sql)
+    fp = _IN_LIST.sub("(...)", fp)
+    fp = _SPACE.sub(" ", fp).strip().rstrip(";")
+    return fp[:160]
+
+
+class _DbObserver:
+    # Installed into db.sqlite; called from the connection wrapper
+    def statement(self, sql: str, seconds: float, rows: int) -> None:
+        labels = (("sql", fingerprint(sql)),)
+        registry.observe("apios_db_statement_seconds", labels, seconds)
+        if rows > 0:
+            registry.inc("apios_db_rows_total", labels, rows)
+        if seconds * 1000.0 >= SLOW_QUERY_MS:
+            registry.inc("apios_db_slow_queries_total", labels)
+            registry.slow.append({"sql": labels[0][1], "seconds": round(seconds, 6), "rows": rows, "at": time.time()})
+            slow_log.warning("slow query %.1fms rows=%s: %s", seconds * 1000.0, rows, labels[0][1])
+
+    def fetched(self, sql: str, rows: int, seconds: float) -> None:
+        labels = (("sql", fingerprint(sql)),)
+        registry.inc("apios_db_rows_total", labels, rows)
+        registry.inc("apios_db_fetch_seconds_total", labels, seconds)
+
+    def acquire(self, mode: str, seconds: float) -> None:
+        registry.observe("apios_db_acquire_seconds", (("mode", mode),), seconds)
+
+
+_sqlite.set_observer(_DbObserver())
+
+
+class MetricsMiddleware:
+    # Pure ASGI so streaming responses are timed to the last byte
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            registry.inc("apios_http_requests_total", (("method", method), ("route", path), ("status", str(status[0]))))
+            registry.observe("apios_http_request_duration_seconds", (("method", method), ("route", path)),
+                             time.perf_counter() - start)
+
+
+def totals() -> Dict[str, int]:
+    counters, _ = registry.snapshot()
+    requests = errors = 0
+    for (name, labels), v in counters.items():
+        if name == "apios_http_requests_total":
+            requests += int(v)
+            if int(dict(labels).get("status", "200")) >= 400:
+                errors += int(v)
+    return {"requests": requests, "errors": errors}
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    esc = [(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in esc) + "}"
+
+
+def _num(v: float) -> str:
+    return repr(int(v)) if float(v).is_integer() else repr(v)
+
+
+def render(gauges: Dict[str, Dict[str, Any]]) -> str:
+    counters, hists = registry.snapshot()
+    lines: List[str] = []
+    by_name: Dict[str, List[str]] = {}
+    for (name, labels), v in sorted(counters.items()):
+        by_name.setdefault(name, []).append(f"{name}{_fmt_labels(labels)} {_num(v)}")
+    for (name, labels), h in sorted(hists.items()):
+        out = by_name.setdefault(name, [])
+        cum = 0.0
+        for bound, n in zip(BUCKETS, h):
+            cum += n
+            out.append(f"{name}_bucket{_fmt_labels(labels, ('le', repr(bound)))} {_num(cum)}")
+        cum += h[len(BUCKETS)]
+        out.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {_num(cum)}")
+        out.append(f"{name}_sum{_fmt_labels(labels)} {repr(h[-2])}")
+        out.append(f"{name}_count{_fmt_labels(labels)} {_num(h[-1])}")
+    for name in sorted(by_name):
+        kind, text = HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(by_name[name])
+    for prefix, values in sorted(gauges.items()):
+        for k, v in sorted(values.items()):
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                lines.append(f"# TYPE apios_{prefix}_{k} gauge")
+                lines.append(f"apios_{prefix}_{k} {_num(v)}")
+    return "\n".join(lines) + "\n"
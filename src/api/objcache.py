@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+OBJECT_CACHE_BYTES = int(os.getenv("APIOS_OBJECT_CACHE_BYTES", str(32 * 1024 * 1024)))
+# Larger responses are served but never cached, so one huge document can't
+# flush the whole cache.
+OBJECT_CACHE_MAX_ENTRY = int(os.getenv("APIOS_OBJECT_CACHE_MAX_ENTRY", str(1024 * 1024)))
+_RECENT_INVALIDATIONS = 10000
+
+Entry = Tuple[bytes, str, Optional[str]]  # body, etag, last-modified
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+class ObjectCache:
+    # Serialised GET /objects/{id} responses, LRU-evicted by total bytes.
+    # Writers call invalidate(id) after commit; readers pass the sequence
+    # number taken before their DB read to put(), which drops the entry if
+    # the object was invalidated in between (so stale reads never stick).
+
+    def __init__(self, max_bytes: int = OBJECT_CACHE_BYTES, max_entry: int = OBJECT_CACHE_MAX_ENTRY):
+        self.max_bytes = max_bytes
+        self.max_entry = max_entry
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[int, Entry]" = OrderedDict()
+        self._bytes = 0
+        self._seq = 0
+        self._recent: "OrderedDict[int, int]" = OrderedDict()
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def seq(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def get(self, obj_id: int) -> Optional[Entry]:
+        with self._lock:
+            entry = self._data.get(obj_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(obj_id)
+            self.hits += 1
+            return entry
+
+    def put(self, obj_id: int, entry: Entry, read_seq: int) -> None:
+        size = len(entry[0])
+        if size > self.max_entry or size > self.max_bytes:
+            return
+        with self._lock:
+            if read_seq < self._floor or self._recent.get(obj_id, -1) > read_seq:
+                return
+            old = self._data.pop(obj_id, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._data[obj_id] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted[0])
+
+    def invalidate(self, obj_id: int) -> None:
+        with self._lock:
+            self._seq += 1
+            self.invalidations += 1
+            self._recent[obj_id] = self._seq
+            self._recent.move_to_end(obj_id)
+            if len(self._recent) > _RECENT_INVALIDATIONS:
+                _, seq = self._recent.popitem(last=False)
+                self._floor = max(self._floor, seq)
+            old = self._data.pop(obj_id, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                    "hit_ratio": round(self.hits / total, 4) if total else 0.0}
+
+
+cache = ObjectCache()
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
@@ -0,0 +1,129 @@
+import base64
+import codecs
+import re
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from db import blobs
+
+SEARCH_MAX_LIMIT = 100
+# objects_fts is contentless (db/fts.py), so snippets are cut here: up to
+# SNIPPET_WORDS words around the first hit, scanning at most
+# SNIPPET_SCAN_BYTES of an offloaded document
+SNIPPET_WORDS = 12
+SNIPPET_SCAN_BYTES = 1024 * 1024
+_WORD = re.compile(r"\w+")
+
+
+def to_match(q: str) -> str:
+    # Treat user input as plain terms (implicitly ANDed) rather than raw FTS5
+    # syntax; a trailing * keeps prefix matching.
+    terms = []
+    for tok in q.split():
+        prefix = tok.endswith("*")
+        tok = tok.rstrip("*")
+        if tok:
+            terms.append('"' + tok.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def _terms(q: str) -> List[Tuple[str, bool]]:
+    return [(tok.rstrip("*").casefold(), tok.endswith("*")) for tok in q.split() if tok.rstrip("*")]
+
+
+def _hit(word: str, terms: List[Tuple[str, bool]]) -> bool:
+    w = word.casefold()
+    return any(w == t or (prefix and w.startswith(t)) for t, prefix in terms)
+
+
+def _words(chunks: Iterable[str]) -> Iterator[str]:
+    # Words across chunk boundaries; a partial word waits for the next chunk
+    tail = ""
+    for chunk in chunks:
+        text = tail + chunk
+        cut = len(text)
+        while cut > 0 and (text[cut - 1].isalnum() or text[cut - 1] == "_"):
+            cut -= 1
+        tail = text[cut:]
+        yield from _WORD.findall(text, 0, cut)
+    yield from _WORD.findall(tail)
+
+
+def snippet(chunks: Iterable[str], terms: List[Tuple[str, bool]]) -> Optional[str]:
+    # The first hit with up to half the window of words before it, hits in
+    # [brackets], '…' where text was left out; None when nothing matches
+    before: Deque[str] = deque(maxlen=SNIPPET_WORDS // 2)
+    dropped = False
+    out: List[str] = []
+    for word in _words(chunks):
+        if out:
+            if len(out) == SNIPPET_WORDS:
+                return " ".join(out) + " …"
+            out.append(f"[{word}]" if _hit(word, terms) else word)
+        elif _hit(word, terms):
+            out = list(before) + [f"[{word}]"]
+            if dropped:
+                out.insert(0, "…")
+        else:
+            dropped = dropped or len(before) == before.maxlen
+            before.append(word)
+    return " ".join(out) if out else None
+
+
+def _blob_chunks(ref: str) -> Iterator[str]:
+    dec = codecs.getincrementaldecoder("utf-8")("replace")
+    for data in blobs.iter_bytes(ref, 0, SNIPPET_SCAN_BYTES - 1):
+        yield dec.decode(data)
+
+
+def _snippet(row: Any, terms: List[Tuple[str, bool]]) -> Optional[str]:
+    found = snippet([row["noun"] or ""], terms)
+    if found is not None:
+        return found
+    if row["content_ref"] is not None:
+        try:
+            return snippet(_blob_chunks(row["content_ref"]), terms)
+        except (OSError, ValueError):
+            return None
+    return snippet([row["content"] or ""], terms)
+
+
+def encode_cursor(score: float, obj_id: int) -> str:
+    return base64.urlsafe_b64encode(f"s:{score!r}:{obj_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    prefix, score, obj_id = raw.split(":")
+    if prefix != "s":
+        raise ValueError(raw)
+    return float(score), int(obj_id)
+
+
+def search(conn, q: str, project_id: Optional[int] = None, limit: int = 20,
+           after: Optional[Tuple[float, int]] = None) -> Dict[str, Any]:
+    # BM25 ranked (noun weighted above content), keyset-paged on (score, id).
+    # The join also drops index entries left by deleted objects (db/fts.py).
+    inner = ("SELECT lo.id AS id, lo.noun AS noun, lo.project_id AS project_id, "
+             "lo.content AS content, lo.content_ref AS content_ref, bm25(objects_fts, 10.0, 1.0) AS score "
+             "FROM objects_fts JOIN linguistic_objects lo ON lo.id=objects_fts.rowid "
+             "WHERE objects_fts MATCH ?")
+    params: List[Any] = [to_match(q)]
+    if project_id is not None:
+        inner += " AND lo.project_id=?"
+        params.append(project_id)
+    sql = f"SELECT id, noun, project_id, content, content_ref, score FROM ({inner})"
+    if after is not None:
+        sql += " WHERE score>? OR (score=? AND id>?)"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY score, id LIMIT ?"
+    params.append(limit + 1)
+    rows = conn.execute(sql, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["score"], rows[-1]["id"])
+    terms = _terms(q)
+    items = [{"id": r["id"], "name": r["noun"], "project_id": r["project_id"],
+              "score": r["score"], "snippet": _snippet(r, terms)} for r in rows]
+    return {"items": items, "limit": limit, "next_cursor": next_cursor}
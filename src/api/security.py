@@ -1,6 +1,6 @@
 import os
 import datetime as dt
-from typing import Optional
+from typing import Any, Dict, Optional
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 
@@ -21,9 +21,12 @@ def create_access_token(sub: str, expires_minutes: Optional[int] = None) -> str:
     to_encode = {"sub": sub, "exp": expire}
     return jwt.encode(to_encode, JWT_SECRET, algorithm=ALGO)
 
-def decode_token(token: str) -> Optional[str]:
+def decode_claims(token: str) -> Optional[Dict[str, Any]]:
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGO])
-        return payload.get("sub")
+        return jwt.decode(token, JWT_SECRET, algorithms=[ALGO])
     except JWTError:
         return None
+
+def decode_token(token: str) -> Optional[str]:
+    payload = decode_claims(token)
+    return payload.get("sub") if payload else None
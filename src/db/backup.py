@@ -0,0 +1,345 @@
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import shards
+from .sqlite import DB_PATH, _connect
+
+BACKUP_DIR = os.getenv("APISQLITE_BACKUP_DIR", os.path.join(os.path.dirname(DB_PATH) or ".", "backups"))
+# Pages copied per step and pause between steps: 256 x 4 KiB pages every
+# 20 ms caps the copy at roughly 50 MB/s and leaves the disk to requests.
+BACKUP_STEP_PAGES = int(os.getenv("APISQLITE_BACKUP_STEP_PAGES", "256"))
+BACKUP_SLEEP_MS = float(os.getenv("APISQLITE_BACKUP_SLEEP_MS", "20"))
+BACKUP_COMPRESS = os.getenv("APISQLITE_BACKUP_COMPRESS", "1") not in ("0", "false", "no")
+BACKUP_CHECK = os.getenv("APISQLITE_BACKUP_CHECK", "full")  # full | quick | off
+BACKUP_KEEP = int(os.getenv("APISQLITE_BACKUP_KEEP", "7"))
+BACKUP_MAX_AGE_DAYS = float(os.getenv("APISQLITE_BACKUP_MAX_AGE_DAYS", "30"))
+BACKUP_INTERVAL = float(os.getenv("APISQLITE_BACKUP_INTERVAL", "0"))  # seconds; 0 = no schedule
+# A write from another connection restarts a stepped backup; after this many
+# restarts the remainder is copied in one step (a WAL read, writers continue).
+BACKUP_MAX_RESTARTS = 3
+_CHUNK = 1024 * 1024
+PREFIX = "apios-"
+# Snapshots are named apios-<stamp>.db for the catalog (the only database
+# when unsharded) and apios-shard-NNN-<stamp>.db for shards; one run backs up
+# every database under the same stamp, and each is pruned on its own.
+CATALOG = "catalog"
+
+log = logging.getLogger("apios")
+
+
+class BackupError(Exception):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _stamp() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def _copy_pages(src: sqlite3.Connection, dst: sqlite3.Connection, pages: int, sleep: float,
+                progress: Callable[[int, int], None]) -> int:
+    restarts = 0
+    while True:
+        last = [None]
+
+        def on_step(status: int, remaining: int, total: int) -> None:
+            if last[0] is not None and remaining > last[0]:
+                raise _Restarted()
+            last[0] = remaining
+            progress(total - remaining, total)
+            if remaining and sleep:
+                time.sleep(sleep)
+
+        step = pages if restarts < BACKUP_MAX_RESTARTS else -1
+        try:
+            src.backup(dst, pages=step, progress=on_step)
+            return restarts
+        except _Restarted:
+            # The progress callback aborts the copy; start over
+            restarts += 1
+
+
+def _check(path: str, mode: str) -> str:
+    if mode == "off":
+        return "skipped"
+    conn = sqlite3.connect(path)
+    try:
+        pragma = "quick_check" if mode == "quick" else "integrity_check"
+        rows = [r[0] for r in conn.execute(f"PRAGMA {pragma}")]
+    finally:
+        conn.close()
+    if rows != ["ok"]:
+        raise BackupError(f"{pragma} failed: {'; '.join(rows[:5])}")
+    return "ok"
+
+
+def _compress(path: str, sleep: float) -> str:
+    out = path + ".gz"
+    with open(path, "rb") as src, gzip.open(out, "wb", compresslevel=6) as dst:
+        while True:
+            chunk = src.read(_CHUNK)
+            if not chunk:
+                break
+            dst.write(chunk)
+            if sleep:
+                time.sleep(sleep)
+    os.remove(path)
+    return out
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _database_of(name: str) -> str:
+    rest = name[len(PREFIX):]
+    if rest[:1].isdigit():
+        return CATALOG
+    return rest.rsplit("-", 1)[0]
+
+
+def list_backups(directory: str = BACKUP_DIR) -> List[Dict[str, Any]]:
+    if not os.path.isdir(directory):
+        return []
+    out = []
+    # Newest first within each database (the stamp sorts lexically)
+    for name in sorted(os.listdir(directory), key=lambda n: n.rsplit("-", 1)[-1], reverse=True):
+        if not name.startswith(PREFIX) or not (name.endswith(".db") or name.endswith(".db.gz")):
+            continue
+        path = os.path.join(directory, name)
+        info: Dict[str, Any] = {"file": name, "bytes": os.path.getsize(path), "database": _database_of(name)}
+        manifest = path + ".json"
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                info.update(json.load(f))
+        out.append(info)
+    return out
+
+
+def prune(directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP, max_age_days: float = BACKUP_MAX_AGE_DAYS) -> List[str]:
+    # Per database, newest first; keeps at most `keep`, drops anything older
+    # than `max_age_days`, but never removes a database's newest backup
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    seen: Dict[str, int] = {}
+    for info in list_backups(directory):
+        i = seen[info["database"]] = seen.get(info["database"], -1) + 1
+        path = os.path.join(directory, info["file"])
+        too_many = keep > 0 and i >= keep
+        too_old = max_age_days > 0 and os.path.getmtime(path) < cutoff
+        if i > 0 and (too_many or too_old):
+            for p in (path, path + ".json"):
+                if os.path.exists(p):
+                    os.remove(p)
+            removed.append(info["file"])
+    return removed
+
+
+class BackupManager:
+    # One backup at a time, triggered by the schedule, the admin endpoint or
+    # the CLI. Progress is readable from any thread via stats().
+
+    def __init__(self, db_path: str = DB_PATH, directory: str = BACKUP_DIR, label: str = CATALOG,
+                 include_shards: bool = True):
+        self.db_path = db_path
+        self.directory = directory
+        self.label = label
+        self.include_shards = include_shards
+        self._lock = threading.Lock()
+        self._running = False
+        self._progress: Dict[str, Any] = {}
+        self._counters = {"ok": 0, "failed": 0, "bytes_total": 0, "seconds_total": 0.0}
+        self._last: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def running(self) -> bool:
+        return self._running
+
+    def _claim(self) -> None:
+        with self._lock:
+            if self._running:
+                raise BackupError("a backup is already running")
+            self._running = True
+            self._progress = {"started_at": time.time(), "pages_done": 0, "pages_total": 0, "phase": "copy"}
+
+    def databases(self) -> List[Tuple[str, str]]:
+        # Sharded: the catalog alone holds no objects, so every shard is part of the set
+        dbs = [(self.label, self.db_path)]
+        router = shards.router if self.include_shards else None
+        if router is not None:
+            dbs += [(f"shard-{k:03d}", shards.shard_path(k, router.directory)) for k in router.ids()]
+        return dbs
+
+    def run(self, compress: Optional[bool] = None, check: str = BACKUP_CHECK,
+            step_pages: int = BACKUP_STEP_PAGES, sleep_ms: float = BACKUP_SLEEP_MS) -> Dict[str, Any]:
+        self._claim()
+        return self._execute(compress, check, step_pages, sleep_ms)
+
+    def _execute(self, compress: Optional[bool] = None, check: str = BACKUP_CHECK,
+                 step_pages: int = BACKUP_STEP_PAGES, sleep_ms: float = BACKUP_SLEEP_MS) -> Dict[str, Any]:
+        try:
+            result = self._run_set(BACKUP_COMPRESS if compress is None else compress, check, step_pages, sleep_ms / 1000.0)
+        except Exception as e:
+            self._counters["failed"] += 1
+            self._last = {"ok": False, "error": str(e), "finished_at": time.time()}
+            log.error("backup failed: %s", e)
+            raise
+        finally:
+            self._running = False
+        self._counters["ok"] += 1
+        self._counters["bytes_total"] += result["bytes"]
+        self._counters["seconds_total"] += result["seconds"]
+        self._last = dict(result, ok=True)
+        return result
+
+    def _run_set(self, compress: bool, check: str, step_pages: int, sleep: float) -> Dict[str, Any]:
+        # The first database's result, with the others under "shards" and
+        # their sizes and times included in the totals
+        stamp = _stamp()
+        results = [self._run(label, path, stamp, compress, check, step_pages, sleep) for label, path in self.databases()]
+        self._progress["phase"] = "prune"
+        pruned = prune(self.directory)
+        result = dict(results[0], pruned=pruned)
+        if len(results) > 1:
+            result["shards"] = results[1:]
+            result["bytes"] = sum(r["bytes"] for r in results)
+            result["seconds"] = round(sum(r["seconds"] for r in results), 3)
+        return result
+
+    def _run(self, label: str, db_path: str, stamp: str, compress: bool, check: str, step_pages: int,
+             sleep: float) -> Dict[str, Any]:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{PREFIX}{stamp}.db" if label == CATALOG else f"{PREFIX}{label}-{stamp}.db"
+        self._progress.update(database=label, pages_done=0, pages_total=0, phase="copy")
+        final = os.path.join(self.directory, name)
+        partial = final + ".partial"
+        start = time.perf_counter()
+        src = _connect(db_path)
+        dst = sqlite3.connect(partial)
+        try:
+            def progress(done: int, total: int) -> None:
+                self._progress.update(pages_done=done, pages_total=total)
+
+            restarts = _copy_pages(src, dst, max(1, step_pages), sleep, progress)
+            page_size = src.execute("PRAGMA page_size").fetchone()[0]
+            pages = dst.execute("PRAGMA page_count").fetchone()[0]
+            # The copy inherits WAL mode; make the snapshot a single file
+            dst.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            dst.close()
+            src.close()
+        copy_seconds = time.perf_counter() - start
+        try:
+            self._progress["phase"] = "check"
+            integrity = _check(partial, check)
+            os.replace(partial, final)
+            path = final
+            if compress:
+                self._progress["phase"] = "compress"
+                path = _compress(final, sleep)
+        except Exception:
+            for p in (partial, final):
+                if os.path.exists(p):
+                    os.remove(p)
+            raise
+        seconds = time.perf_counter() - start
+        size = pages * page_size
+        result = {"file": os.path.basename(path), "database": label, "source": os.path.abspath(db_path),
+                  "bytes": os.path.getsize(path), "db_bytes": size, "pages": pages,
+                  "restarts": restarts, "integrity": integrity, "seconds": round(seconds, 3),
+                  "copy_mb_per_s": round(size / copy_seconds / 1e6, 2) if copy_seconds else None,
+                  "sha256": _sha256(path),
+                  "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")}
+        with open(path + ".json", "w") as f:
+            json.dump(result, f, indent=2)
+        return result
+
+    def start_in_background(self, **kwargs: Any) -> None:
+        # Claims the slot before returning, so a second trigger gets BackupError
+        self._claim()
+
+        def target() -> None:
+            try:
+                self._execute(**kwargs)
+            except Exception:
+                pass  # recorded in stats()["last"]
+
+        threading.Thread(target=target, name="apios-backup", daemon=True).start()
+
+    def start_schedule(self, interval: float = BACKUP_INTERVAL) -> None:
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+
+        def loop() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.run()
+                except Exception:
+                    pass
+
+        self._thread = threading.Thread(target=loop, name="apios-backup-schedule", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"running": self._running, **self._counters}
+        out["seconds_total"] = round(out["seconds_total"], 3)
+        if self._running:
+            p = dict(self._progress)
+            elapsed = time.time() - p.pop("started_at")
+            out.update(p, elapsed_seconds=round(elapsed, 3),
+                       percent=round(100.0 * p["pages_done"] / p["pages_total"], 1) if p["pages_total"] else 0.0)
+        out["last"] = self._last
+        return out
+
+
+backups = BackupManager()
+
+
+def main() -> None:
+    #   APISQLITE_DB_PATH=/data/apios.db python -m db.backup [--dest DIR] [--no-compress]
+    # With APISQLITE_SHARDS set, the catalog and every shard are backed up together.
+    parser = argparse.ArgumentParser(description="Take an online backup of the SQLite database")
+    parser.add_argument("--db", default=DB_PATH, help="back up only this database file")
+    parser.add_argument("--dest", default=BACKUP_DIR, help="backup directory")
+    parser.add_argument("--no-compress", action="store_true")
+    parser.add_argument("--check", choices=("full", "quick", "off"), default=BACKUP_CHECK)
+    parser.add_argument("--list", action="store_true", help="list existing backups and exit")
+    args = parser.parse_args()
+    if args.list:
+        for info in list_backups(args.dest):
+            print(f"{info['file']}  {info['database']}  {info['bytes']} bytes  {info.get('integrity', '?')}")
+        return
+    if args.db == DB_PATH:
+        mgr = BackupManager(DB_PATH, args.dest)
+    else:
+        label = os.path.basename(args.db).rsplit(".", 1)[0]
+        mgr = BackupManager(args.db, args.dest, label=label, include_shards=False)
+    result = mgr.run(compress=not args.no_compress, check=args.check)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
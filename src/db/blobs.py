@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import ExitStack
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional: zlib is always available
+    zstandard = None
+
+# Content tier for large documents. Content of BLOB_THRESHOLD bytes or more
+# (UTF-8) is written once to BLOB_DIR, named by its sha256 so identical
+# documents share a file, and the row keeps content=NULL plus
+# content_ref="<codec>:<sha256>" and content_size (uncompressed bytes).
+# Listings never read it; GET /objects/{id} and /objects/{id}/content do.
+# (db/sqlite.py imports this module, so the database path is read here directly)
+_DB_DIR = os.path.dirname(os.getenv("APISQLITE_DB_PATH", "/data/apios.db")) or "."
+BLOB_DIR = os.getenv("APISQLITE_BLOB_DIR", os.path.join(_DB_DIR, "objects", "linguistic_objects"))
+BLOB_THRESHOLD = int(os.getenv("APISQLITE_BLOB_THRESHOLD", "16384"))
+# auto: zstd when the zstandard package is installed, else zlib; none stores raw
+BLOB_CODEC = os.getenv("APISQLITE_BLOB_CODEC", "auto")
+BLOB_LEVEL = int(os.getenv("APISQLITE_BLOB_LEVEL", "6"))
+# Blobs younger than this are never collected: their row may not be committed yet
+BLOB_GC_MIN_AGE = float(os.getenv("APISQLITE_BLOB_GC_MIN_AGE", "3600"))
+
+_EXT = {"raw": "", "zlib": ".z", "zstd": ".zst"}
+_CHUNK = 64 * 1024
+_OFFLOAD_BATCH = 200
+
+Stored = Tuple[Optional[str], Optional[str], Optional[int]]  # content, content_ref, content_size
+
+
+def codec() -> str:
+    if BLOB_CODEC == "none":
+        return "raw"
+    if BLOB_CODEC == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    return BLOB_CODEC
+
+
+def _compress(data: bytes, name: str) -> bytes:
+    if name == "zstd":
+        return zstandard.ZstdCompressor(level=BLOB_LEVEL).compress(data)
+    return zlib.compress(data, BLOB_LEVEL)
+
+
+def _decompressor(name: str):
+    if name == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zlib.decompressobj()
+
+
+def parse_ref(ref: str) -> Tuple[str, str]:
+    name, _, digest = ref.partition(":")
+    if name not in _EXT or len(digest) != 64:
+        raise ValueError(f"bad content_ref: {ref!r}")
+    return name, digest
+
+
+def path(ref: str, directory: Optional[str] = None) -> str:
+    name, digest = parse_ref(ref)
+    return os.path.join(directory or BLOB_DIR, digest[:2], digest[2:4], digest + _EXT[name])
+
+
+def etag(ref: str) -> str:
+    return '"' + parse_ref(ref)[1] + '"'
+
+
+def put(data: bytes, directory: Optional[str] = None) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    # Dedup across codecs: the hash is over the uncompressed bytes
+    for name in _EXT:
+        ref = f"{name}:{digest}"
+        existing = path(ref, directory)
+        if os.path.exists(existing):
+            # Fresh mtime keeps collect() off a blob about to be referenced again
+            os.utime(existing)
+            return ref
+    name = codec()
+    body = data if name == "raw" else _compress(data, name)
+    if name != "raw" and len(body) >= len(data) * 0.9:
+        # Incompressible: keep it raw so reads can go straight from the file
+        name, body = "raw", data
+    ref = f"{name}:{digest}"
+    dest = path(ref, directory)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, dest)
+    return ref
+
+
+def offload(content: Optional[str], threshold: int = BLOB_THRESHOLD) -> Stored:
+    # Runs before the write is queued, so hashing and compression happen
+    # outside the writer's lock
+    if content is None or threshold <= 0:
+        return content, None, None
+    data = content.encode("utf-8")
+    if len(data) < threshold:
+        return content, None, None
+    return None, put(data), len(data)
+
+
+def iter_bytes(ref: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    # Uncompressed bytes [start, end] (inclusive), decompressing as it goes
+    name, _ = parse_ref(ref)
+    dec = None if name == "raw" else _decompressor(name)
+    pos = 0
+    with open(path(ref), "rb") as f:
+        while end is None or pos <= end:
+            raw = f.read(_CHUNK)
+            if not raw:
+                break
+            chunk = raw if dec is None else dec.decompress(raw)
+            lo, hi = max(start - pos, 0), len(chunk) if end is None else min(end + 1 - pos, len(chunk))
+            pos += len(chunk)
+            if lo < hi:
+                yield chunk[lo:hi]
+        if dec is not None and (end is None or pos <= end):
+            chunk = dec.flush()
+            lo, hi = max(start - pos, 0), len(chunk) if end is None else min(end + 1 - pos, len(chunk))
+            if lo < hi:
+                yield chunk[lo:hi]
+
+
+def read(ref: str) -> bytes:
+    return b"".join(iter_bytes(ref))
+
+
+def read_text(ref: str) -> str:
+    return read(ref).decode("utf-8")
+
+
+def index_text(conn: sqlite3.Connection, rows: Iterable[Tuple[int, Optional[str], str]]) -> None:
+    # (object id, noun, text) of offloaded objects into objects_fts (db/fts.py),
+    # which keeps only tokens. Call in the transaction that stores content_ref.
+    conn.executemany("INSERT INTO objects_fts(rowid, noun, content) VALUES (?, ?, ?)", rows)
+
+
+def offload_rows(conn: sqlite3.Connection, threshold: int = BLOB_THRESHOLD) -> int:
+    # Moves inline content at or over the threshold into the store, a batch
+    # per transaction; re-running picks up where it stopped
+    if threshold <= 0:
+        return 0
+    moved, after = 0, 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, noun, content FROM linguistic_objects WHERE id>? AND content IS NOT NULL "
+            "AND length(CAST(content AS BLOB))>=? ORDER BY id LIMIT ?", (after, threshold, _OFFLOAD_BATCH)).fetchall()
+        if not rows:
+            return moved
+        for obj_id, _, content in rows:
+            data = content.encode("utf-8")
+            # The update trigger drops the inline entry; re-index from the text in hand
+            conn.execute("UPDATE linguistic_objects SET content=NULL, content_ref=?, content_size=? WHERE id=?",
+                         (put(data), len(data), obj_id))
+        index_text(conn, rows)
+        conn.commit()
+        moved += len(rows)
+        after = rows[-1][0]
+
+
+def collect(conns: Iterable[sqlite3.Connection], directory: Optional[str] = None,
+            min_age: float = BLOB_GC_MIN_AGE) -> List[str]:
+    # Removes blobs no row references (objects are never rewritten in place,
+    # but failed inserts and deleted rows leave files behind)
+    live = set()
+    for conn in conns:
+        live.update(parse_ref(r[0])[1] for r in conn.execute(
+            "SELECT DISTINCT content_ref FROM linguistic_objects WHERE content_ref IS NOT NULL"))
+    root = directory or BLOB_DIR
+    cutoff = time.time() - min_age
+    removed = []
+    for dirpath, _, files in os.walk(root):
+        for fname in files:
+            digest = fname.split(".", 1)[0]
+            full = os.path.join(dirpath, fname)
+            if len(digest) == 64 and digest not in live and os.path.getmtime(full) < cutoff:
+                os.remove(full)
+                removed.append(full)
+    return removed
+
+
+def main() -> None:
+    #   APISQLITE_DB_PATH=/data/apios.db python -m db.blobs --offload | --gc
+    parser = argparse.ArgumentParser(description="Move large content into the blob store or collect unused blobs")
+    parser.add_argument("--offload", action="store_true", help="move inline content over APISQLITE_BLOB_THRESHOLD")
+    parser.add_argument("--gc", action="store_true", help="remove blobs no object references")
+    args = parser.parse_args()
+    from db.connection import get_connection, shard_ids
+    if args.offload:
+        moved = 0
+        for shard in shard_ids():
+            with get_connection(write=True, shard=shard) as conn:
+                moved += offload_rows(conn)
+        print(f"offloaded {moved} objects")
+    if args.gc:
+        with ExitStack() as stack:
+            removed = collect([stack.enter_context(get_connection(shard=shard)) for shard in shard_ids()])
+        print(f"removed {len(removed)} blobs")
+
+
+if __name__ == "__main__":
+    main()
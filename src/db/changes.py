@@ -0,0 +1,90 @@
+import os
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+CHANGES_RETENTION = int(os.getenv("APIOS_CHANGES_RETENTION", "1000000"))
+CHANGES_MAX_AGE_DAYS = float(os.getenv("APIOS_CHANGES_MAX_AGE_DAYS", "7"))
+
+# Append-only change log. Triggers write it, so every write path (single,
+# batch, nested units, manual SQL) logs in the same transaction as the row
+# change and a rolled-back unit leaves no entry. AUTOINCREMENT keeps seq
+# monotonic even after compaction deletes the oldest rows.
+CHANGES_SQL = """
+CREATE TABLE IF NOT EXISTS changes (
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  entity TEXT NOT NULL,
+  op TEXT NOT NULL,
+  entity_id INTEGER NOT NULL,
+  object_id INTEGER,
+  at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TRIGGER IF NOT EXISTS changes_objects_ai AFTER INSERT ON linguistic_objects BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('object', 'insert', new.id, new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS changes_objects_au AFTER UPDATE ON linguistic_objects BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('object', 'update', new.id, new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS changes_objects_ad AFTER DELETE ON linguistic_objects BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('object', 'delete', old.id, old.id);
+END;
+CREATE TRIGGER IF NOT EXISTS changes_metadata_ai AFTER INSERT ON metadata BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('metadata', 'insert', new.id, new.object_id);
+END;
+CREATE TRIGGER IF NOT EXISTS changes_metadata_au AFTER UPDATE ON metadata BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('metadata', 'update', new.id, new.object_id);
+END;
+CREATE TRIGGER IF NOT EXISTS changes_metadata_ad AFTER DELETE ON metadata BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('metadata', 'delete', old.id, old.object_id);
+END;
+CREATE TRIGGER IF NOT EXISTS changes_relations_ai AFTER INSERT ON relations BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('relation', 'insert', new.id, new.subject_id);
+END;
+CREATE TRIGGER IF NOT EXISTS changes_relations_au AFTER UPDATE ON relations BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('relation', 'update', new.id, new.subject_id);
+END;
+CREATE TRIGGER IF NOT EXISTS changes_relations_ad AFTER DELETE ON relations BEGIN
+  INSERT INTO changes(entity, op, entity_id, object_id) VALUES ('relation', 'delete', old.id, old.subject_id);
+END;
+"""
+
+_TABLES = ("linguistic_objects", "metadata", "relations")
+
+
+def ensure_changes(conn: sqlite3.Connection) -> bool:
+    # Returns True when the log was created by this call
+    have = {r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE name IN ('changes', 'linguistic_objects', 'metadata', 'relations')")}
+    if not set(_TABLES) <= have:
+        return False
+    conn.executescript(CHANGES_SQL)
+    conn.commit()
+    return "changes" not in have
+
+
+def read_changes(conn: sqlite3.Connection, since: int, limit: int) -> List[Dict[str, Any]]:
+    rows = conn.execute(
+        "SELECT seq, entity, op, entity_id, object_id, at FROM changes WHERE seq>? ORDER BY seq LIMIT ?",
+        (since, limit)).fetchall()
+    return [{"seq": r[0], "entity": r[1], "op": r[2], "id": r[3], "object_id": r[4], "at": r[5]} for r in rows]
+
+
+def bounds(conn: sqlite3.Connection) -> Dict[str, Optional[int]]:
+    # oldest retained seq and the latest seq ever issued (survives compaction)
+    oldest = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='changes'").fetchone()
+    return {"oldest": oldest, "latest": row[0] if row else 0}
+
+
+def compact(conn: sqlite3.Connection, keep: int = CHANGES_RETENTION, max_age_days: float = CHANGES_MAX_AGE_DAYS) -> int:
+    # Drops entries beyond the newest `keep` and older than `max_age_days`;
+    # the newest entry always survives so `latest` stays observable.
+    removed = 0
+    top = conn.execute("SELECT MAX(seq) FROM changes").fetchone()[0]
+    if top is None:
+        return 0
+    if keep > 0:
+        removed += conn.execute("DELETE FROM changes WHERE seq<=?", (top - max(1, keep),)).rowcount
+    if max_age_days > 0:
+        removed += conn.execute("DELETE FROM changes WHERE seq<? AND at<datetime('now', ?)",
+                                (top, f"-{max_age_days} days")).rowcount
+    return removed
@@ -1,28 +1,92 @@
 import os
 from contextlib import contextmanager
-from typing import Iterator
+from typing import Any, Dict, Iterator, List, Optional
 
 DB_BACKEND = os.getenv("DB_BACKEND", "sqlite").lower()
 
 # SQLite backend
 if DB_BACKEND == "sqlite":
+    from . import shards
     from .sqlite import get_connection as _sqlite_get_connection
+    from .sqlite import pool_stats as _sqlite_pool_stats
 
+    # shard=None is the catalog (the only database when unsharded); objects,
+    # metadata and relations live in shard_for_project()/shard_for_object().
+    # Unsharded, every shard lookup returns None so callers need no branches.
     @contextmanager
-    def get_connection():  # type: ignore
-        with _sqlite_get_connection() as conn:
-            yield conn
+    def get_connection(write: bool = False, shard: Optional[int] = None):  # type: ignore
+        if shard is None or shards.router is None:
+            with _sqlite_get_connection(write=write) as conn:
+                yield conn
+        else:
+            with shards.router.pool(shard).connection(write=write) as conn:
+                yield conn
+
+    def pool_stats() -> Dict[str, Any]:
+        out = _sqlite_pool_stats()
+        if shards.router is not None:
+            out["shards"] = shards.router.stats()
+        return out
+
+    def sharded() -> bool:
+        return shards.router is not None
+
+    def shard_ids() -> List[Optional[int]]:
+        # Every database holding objects: [None] unsharded, else each shard
+        return [None] if shards.router is None else list(shards.router.ids())
+
+    def shard_for_project(project_id: Optional[int], assign: bool = False) -> Optional[int]:
+        return None if shards.router is None else shards.router.for_project(project_id, assign)
+
+    def shard_for_object(obj_id: int) -> Optional[int]:
+        # Sharded: raises LookupError when no shard has the object
+        if shards.router is None:
+            return None
+        shard = shards.router.for_object(obj_id)
+        if shard is None:
+            raise LookupError(obj_id)
+        return shard
 
 # Postgres stub (not implemented yet)
 elif DB_BACKEND == "postgres":
     import sqlite3
 
     @contextmanager
-    def get_connection() -> Iterator[sqlite3.Connection]:  # type: ignore
+    def get_connection(write: bool = False, shard: Optional[int] = None) -> Iterator[sqlite3.Connection]:  # type: ignore
         raise NotImplementedError("Postgres backend not implemented; set DB_BACKEND=sqlite")
+
+    def pool_stats() -> Dict[str, Any]:
+        return {}
+
+    def sharded() -> bool:
+        return False
+
+    def shard_ids() -> List[Optional[int]]:
+        return [None]
+
+    def shard_for_project(project_id: Optional[int], assign: bool = False) -> Optional[int]:
+        return None
+
+    def shard_for_object(obj_id: int) -> Optional[int]:
+        return None
 else:
     import sqlite3
 
     @contextmanager
-    def get_connection() -> Iterator[sqlite3.Connection]:  # type: ignore
+    def get_connection(write: bool = False, shard: Optional[int] = None) -> Iterator[sqlite3.Connection]:  # type: ignore
         raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND}")
+
+    def pool_stats() -> Dict[str, Any]:
+        return {}
+
+    def sharded() -> bool:
+        return False
+
+    def shard_ids() -> List[Optional[int]]:
+        return [None]
+
+    def shard_for_project(project_id: Optional[int], assign: bool = False) -> Optional[int]:
+        return None
+
+    def shard_for_object(obj_id: int) -> Optional[int]:
+        return None
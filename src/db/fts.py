@@ -0,0 +1,152 @@
+import argparse
+import sqlite3
+
+from .blobs import read_text
+
+# Contentless FTS5 index over linguistic_objects(noun, content). It holds only
+# tokens, so no text is duplicated: inline content stays in its row and
+# offloaded content (db/blobs.py) only in the blob store. Triggers index rows
+# with inline content; the write path indexes offloaded content itself
+# (blobs.index_text), since plain SQL can't read the blob store. Snippets are
+# built in api/search.py.
+#
+# SQLite 3.43+ can delete from a contentless table by rowid
+# (contentless_delete=1). Older versions need the indexed values back, which
+# triggers only have for inline content: an offloaded row deleted there keeps
+# its tokens until the next rebuild, and searches drop it by joining
+# linguistic_objects (ids are never reused).
+CONTENTLESS_DELETE = sqlite3.sqlite_version_info >= (3, 43, 0)
+
+
+def _fts_sql(contentless_delete: bool) -> str:
+    if contentless_delete:
+        option = "contentless_delete=1, "
+        drop_any = "DELETE FROM objects_fts WHERE rowid=old.id;"
+        drop_inline = "DELETE FROM objects_fts WHERE rowid=old.id AND old.content_ref IS NULL;"
+    else:
+        option = ""
+        drop_inline = ("INSERT INTO objects_fts(objects_fts, rowid, noun, content)\n"
+                       "    SELECT 'delete', old.id, old.noun, old.content WHERE old.content_ref IS NULL;")
+        drop_any = drop_inline
+    return f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS objects_fts USING fts5(
+  noun, content, content='', {option}tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS objects_fts_ai AFTER INSERT ON linguistic_objects BEGIN
+  INSERT INTO objects_fts(rowid, noun, content) SELECT new.id, new.noun, new.content WHERE new.content_ref IS NULL;
+END;
+CREATE TRIGGER IF NOT EXISTS objects_fts_ad AFTER DELETE ON linguistic_objects BEGIN
+  {drop_any}
+END;
+CREATE TRIGGER IF NOT EXISTS objects_fts_au AFTER UPDATE OF noun, content, content_ref ON linguistic_objects BEGIN
+  {drop_inline}
+  INSERT INTO objects_fts(rowid, noun, content) SELECT new.id, new.noun, new.content WHERE new.content_ref IS NULL;
+END;
+"""
+
+
+FTS_SQL = _fts_sql(CONTENTLESS_DELETE)
+# The index as migration 018 created it, before linguistic_objects had
+# content_ref (migration 021 switches to the layout above)
+EXTERNAL_FTS_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS objects_fts USING fts5(
+  noun, content, content='linguistic_objects', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS objects_fts_ai AFTER INSERT ON linguistic_objects BEGIN
+  INSERT INTO objects_fts(rowid, noun, content) VALUES (new.id, new.noun, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS objects_fts_ad AFTER DELETE ON linguistic_objects BEGIN
+  INSERT INTO objects_fts(objects_fts, rowid, noun, content) VALUES ('delete', old.id, old.noun, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS objects_fts_au AFTER UPDATE OF noun, content ON linguistic_objects BEGIN
+  INSERT INTO objects_fts(objects_fts, rowid, noun, content) VALUES ('delete', old.id, old.noun, old.content);
+  INSERT INTO objects_fts(rowid, noun, content) VALUES (new.id, new.noun, new.content);
+END;
+"""
+_TRIGGERS = ("objects_fts_ai", "objects_fts_ad", "objects_fts_au")
+# Earlier layouts: a view joining offloaded_text, which held a copy of the text
+_LEGACY_TRIGGERS = ("offloaded_text_ai", "offloaded_text_au", "offloaded_text_ad")
+_BATCH = 200
+
+
+def _exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (name,)).fetchone() is not None
+
+
+def ensure_fts(conn: sqlite3.Connection) -> bool:
+    # Creates the index and triggers if missing; backfills when newly created.
+    # Returns True when a backfill ran.
+    if not _exists(conn, "linguistic_objects"):
+        return False
+    if "content_ref" not in [r[1] for r in conn.execute("PRAGMA table_info(linguistic_objects)")]:
+        created = not _exists(conn, "objects_fts")
+        conn.executescript(EXTERNAL_FTS_SQL)
+        if created:
+            rebuild_fts(conn)
+        conn.commit()
+        return created
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name='objects_fts'").fetchone()
+    if row is not None and "content=''" not in row[0]:
+        # External-content index from an earlier layout: recreate
+        for name in _TRIGGERS + _LEGACY_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute("DROP VIEW IF EXISTS objects_text")
+        conn.execute("DROP TABLE IF EXISTS offloaded_text")
+        conn.execute("DROP TABLE objects_fts")
+        row = None
+    created = row is None
+    conn.executescript(FTS_SQL)
+    if created:
+        rebuild_fts(conn)
+    conn.commit()
+    return created
+
+
+def rebuild_fts(conn: sqlite3.Connection) -> None:
+    # Inline rows in one statement, then offloaded documents a batch per
+    # transaction, read back from the blob store one at a time
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name='objects_fts'").fetchone()[0]
+    if "content=''" not in sql:
+        conn.execute("INSERT INTO objects_fts(objects_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO objects_fts(objects_fts) VALUES ('optimize')")
+        conn.commit()
+        return
+    conn.execute("INSERT INTO objects_fts(objects_fts) VALUES ('delete-all')")
+    conn.execute("INSERT INTO objects_fts(rowid, noun, content) "
+                 "SELECT id, noun, content FROM linguistic_objects WHERE content_ref IS NULL")
+    conn.commit()
+    after = 0
+    while True:
+        rows = conn.execute("SELECT id, noun, content_ref FROM linguistic_objects WHERE id>? AND content_ref IS NOT NULL "
+                            "ORDER BY id LIMIT ?", (after, _BATCH)).fetchall()
+        if not rows:
+            break
+        for obj_id, noun, ref in rows:
+            try:
+                text = read_text(ref)
+            except (OSError, ValueError):
+                text = None  # missing blob: still findable by name
+            conn.execute("INSERT INTO objects_fts(rowid, noun, content) VALUES (?, ?, ?)", (obj_id, noun, text))
+        conn.commit()
+        after = rows[-1][0]
+    conn.execute("INSERT INTO objects_fts(objects_fts) VALUES ('optimize')")
+    conn.commit()
+
+
+def main() -> None:
+    # One-time backfill for existing databases:
+    #   APISQLITE_DB_PATH=/data/apios.db python -m db.fts --rebuild
+    parser = argparse.ArgumentParser(description="Create or rebuild the objects full-text index")
+    parser.add_argument("--rebuild", action="store_true", help="re-index every row even if the index exists")
+    args = parser.parse_args()
+    from db.connection import get_connection
+    with get_connection(write=True) as conn:
+        backfilled = ensure_fts(conn)
+        if args.rebuild and not backfilled:
+            rebuild_fts(conn)
+        count = conn.execute("SELECT COUNT(*) FROM linguistic_objects").fetchone()[0]
+    print(f"objects_fts ready ({count} objects indexed)")
+
+
+if __name__ == "__main__":
+    main()
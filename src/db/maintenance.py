@@ -0,0 +1,103 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .connection import get_connection, shard_ids
+
+OPTIMIZE_INTERVAL = float(os.getenv("APISQLITE_OPTIMIZE_INTERVAL", "3600"))
+CHECKPOINT_INTERVAL = float(os.getenv("APISQLITE_CHECKPOINT_INTERVAL", "60"))
+# Rows sampled per index by ANALYZE inside PRAGMA optimize; keeps each run
+# cheap on large tables.
+ANALYSIS_LIMIT = int(os.getenv("APISQLITE_ANALYSIS_LIMIT", "1000"))
+
+log = logging.getLogger("apios")
+
+
+def optimize(conn: sqlite3.Connection) -> None:
+    # Re-ANALYZEs only tables whose statistics have drifted
+    conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+    conn.execute("PRAGMA optimize")
+
+
+def checkpoint(conn: sqlite3.Connection) -> Dict[str, int]:
+    # PASSIVE never blocks readers or the writer; it copies what it can
+    busy, log_frames, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    return {"busy": busy, "wal_frames": log_frames, "checkpointed": done}
+
+
+class Maintenance:
+    # Background thread running PRAGMA optimize and WAL checkpoints on the
+    # writer connection, so plans track table growth and the WAL stays short.
+
+    def __init__(self, optimize_every: float = OPTIMIZE_INTERVAL, checkpoint_every: float = CHECKPOINT_INTERVAL):
+        self.optimize_every = optimize_every
+        self.checkpoint_every = checkpoint_every
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats: Dict[str, Any] = {"optimize_runs": 0, "checkpoint_runs": 0, "errors": 0, "last_checkpoint": None}
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="apios-maintenance", daemon=True)
+        self._thread.start()
+
+    def _next(self, every: float, now: float) -> float:
+        return now + every if every > 0 else float("inf")
+
+    def _run(self) -> None:
+        now = time.monotonic()
+        next_opt = self._next(self.optimize_every, now)
+        next_ckpt = self._next(self.checkpoint_every, now)
+        while True:
+            due = min(next_opt, next_ckpt)
+            if self._stop.wait(None if due == float("inf") else max(0.0, due - time.monotonic())):
+                return
+            now = time.monotonic()
+            try:
+                if now >= next_ckpt:
+                    self.run_checkpoint()
+                if now >= next_opt:
+                    self.run_optimize()
+            except sqlite3.Error as e:
+                self._stats["errors"] += 1
+                log.warning("database maintenance failed: %s", e)
+            if now >= next_ckpt:
+                next_ckpt = self._next(self.checkpoint_every, now)
+            if now >= next_opt:
+                next_opt = self._next(self.optimize_every, now)
+
+    def _databases(self) -> List[Optional[int]]:
+        # The catalog plus every shard (just the one database when unsharded)
+        return [None] + [k for k in shard_ids() if k is not None]
+
+    def run_optimize(self) -> None:
+        for shard in self._databases():
+            with get_connection(write=True, shard=shard) as conn:
+                optimize(conn)
+        self._stats["optimize_runs"] += 1
+
+    def run_checkpoint(self) -> Dict[str, int]:
+        result = {"busy": 0, "wal_frames": 0, "checkpointed": 0}
+        for shard in self._databases():
+            with get_connection(write=True, shard=shard) as conn:
+                for k, v in checkpoint(conn).items():
+                    result[k] += v
+        self._stats["checkpoint_runs"] += 1
+        self._stats["last_checkpoint"] = result
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+maintenance = Maintenance()
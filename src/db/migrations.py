@@ -0,0 +1,285 @@
+import argparse
+import sqlite3
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .blobs import offload_rows
+from .changes import ensure_changes
+from .fts import ensure_fts
+from .shards import PROJECT_SHARDS_SQL
+
+# Versioned schema migrations, applied in order once at API startup (and by
+# `python -m db.migrations`). Versions 001-015 were applied by the shell
+# steps; Python migrations continue from 016. Every migration is idempotent
+# (IF NOT EXISTS / column checks), so a crash between applying one and
+# recording it is safe to re-run.
+
+CORE_SQL = """
+CREATE TABLE IF NOT EXISTS users (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  username TEXT UNIQUE NOT NULL,
+  email TEXT UNIQUE,
+  password_hash TEXT,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS projects (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name TEXT UNIQUE NOT NULL,
+  owner_id INTEGER NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS linguistic_objects (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  noun TEXT,
+  adjectives TEXT,
+  verbs TEXT,
+  content TEXT,
+  metadata TEXT,
+  project_id INTEGER,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP,
+  deleted_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS metadata (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  key TEXT NOT NULL,
+  value TEXT,
+  object_id INTEGER NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP,
+  deleted_at TIMESTAMP,
+  FOREIGN KEY (object_id) REFERENCES linguistic_objects(id) ON DELETE CASCADE,
+  UNIQUE(key, object_id)
+);
+CREATE TABLE IF NOT EXISTS relations (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  subject_id INTEGER NOT NULL,
+  predicate TEXT NOT NULL,
+  object_id INTEGER NOT NULL,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  deleted_at TIMESTAMP,
+  FOREIGN KEY (subject_id) REFERENCES linguistic_objects(id) ON DELETE CASCADE,
+  FOREIGN KEY (object_id) REFERENCES linguistic_objects(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS projects_users (
+  project_id INTEGER NOT NULL,
+  user_id INTEGER NOT NULL,
+  role TEXT NOT NULL,
+  PRIMARY KEY (project_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_projects_owner_id ON projects(owner_id);
+"""
+
+# Columns added by shell steps over time; older databases may lack some.
+# ALTER TABLE ADD COLUMN cannot use a non-constant default.
+CORE_COLUMNS: Dict[str, Sequence[Tuple[str, str]]] = {
+    "users": (("email", "TEXT"), ("password_hash", "TEXT"), ("created_at", "TIMESTAMP")),
+    "linguistic_objects": (("content", "TEXT"), ("project_id", "INTEGER"), ("created_at", "TIMESTAMP"),
+                           ("updated_at", "TIMESTAMP"), ("deleted_at", "TIMESTAMP")),
+    "metadata": (("created_at", "TIMESTAMP"), ("updated_at", "TIMESTAMP"), ("deleted_at", "TIMESTAMP")),
+    "relations": (("created_at", "TIMESTAMP"), ("deleted_at", "TIMESTAMP")),
+}
+
+# Added by 021 (content blob store)
+BLOB_COLUMNS: Sequence[Tuple[str, str]] = (("content_ref", "TEXT"), ("content_size", "INTEGER"))
+
+# Bumped by every change to users, projects or memberships, from any
+# connection; api/authcache.py drops its cached lookups when it moves
+AUTH_EPOCH_SQL = """
+CREATE TABLE IF NOT EXISTS auth_epoch (id INTEGER PRIMARY KEY CHECK (id = 1), n INTEGER NOT NULL);
+INSERT OR IGNORE INTO auth_epoch (id, n) VALUES (1, 0);
+""" + "".join(
+    f"CREATE TRIGGER IF NOT EXISTS auth_epoch_{table}_{op[0].lower()} AFTER {op} ON {table} BEGIN\n"
+    f"  UPDATE auth_epoch SET n=n+1 WHERE id=1;\nEND;\n"
+    for table in ("users", "projects", "projects_users") for op in ("INSERT", "UPDATE", "DELETE"))
+
+# Indexes behind the hot queries: project listing (keyset on id), metadata
+# expansion and filters, graph traversal in both directions, predicate scans.
+HOT_INDEXES: Sequence[Tuple[str, str, Tuple[str, ...]]] = (
+    ("idx_objects_project_id", "linguistic_objects", ("project_id", "id")),
+    ("idx_metadata_object_key", "metadata", ("object_id", "key")),
+    ("idx_metadata_key_object", "metadata", ("key", "object_id")),
+    ("idx_metadata_key_value_object", "metadata", ("key", "value", "object_id")),
+    ("idx_relations_subject_predicate", "relations", ("subject_id", "predicate", "object_id")),
+    ("idx_relations_object_predicate", "relations", ("object_id", "predicate", "subject_id")),
+    ("idx_relations_predicate", "relations", ("predicate",)),
+)
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _indexes(conn: sqlite3.Connection, table: str) -> Dict[str, Tuple[bool, List[str]]]:
+    # name -> (unique, key columns); every index also carries the rowid
+    out = {}
+    for row in conn.execute(f"PRAGMA index_list({table})"):
+        cols = [r[2] for r in conn.execute(f"PRAGMA index_info('{row[1]}')")]
+        out[row[1]] = (bool(row[2]), cols)
+    return out
+
+
+def _covered(existing: Dict[str, Tuple[bool, List[str]]], cols: Tuple[str, ...]) -> bool:
+    # An index on (a) already orders (a, id): rowid is its implicit last column
+    want = list(cols)
+    return any((keys + ["id"])[:len(want)] == want for _, keys in existing.values())
+
+
+def ensure_index(conn: sqlite3.Connection, name: str, table: str, cols: Tuple[str, ...]) -> bool:
+    if _covered(_indexes(conn, table), cols):
+        return False
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(cols)})")
+    return True
+
+
+def drop_redundant_indexes(conn: sqlite3.Connection, table: str) -> List[str]:
+    # Non-unique indexes whose columns are a strict prefix of another index
+    # only cost writes (e.g. metadata(object_id) next to (object_id, key))
+    existing = _indexes(conn, table)
+    dropped = []
+    for name, (unique, keys) in existing.items():
+        if unique or name.startswith("sqlite_autoindex"):
+            continue
+        if any(other != name and len(o_keys) > len(keys) and o_keys[:len(keys)] == keys
+               for other, (_, o_keys) in existing.items()):
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+            dropped.append(name)
+    return dropped
+
+
+def _core_schema(conn: sqlite3.Connection) -> None:
+    conn.executescript(CORE_SQL)
+    for table, cols in CORE_COLUMNS.items():
+        have = _columns(conn, table)
+        for col, typ in cols:
+            if col not in have:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {typ}")
+
+
+def _hot_indexes(conn: sqlite3.Connection) -> None:
+    for name, table, cols in HOT_INDEXES:
+        ensure_index(conn, name, table, cols)
+    for table in {t for _, t, _ in HOT_INDEXES}:
+        drop_redundant_indexes(conn, table)
+
+
+def _fts(conn: sqlite3.Connection) -> None:
+    ensure_fts(conn)
+
+
+def _changes(conn: sqlite3.Connection) -> None:
+    ensure_changes(conn)
+
+
+def _project_shards(conn: sqlite3.Connection) -> None:
+    conn.executescript(PROJECT_SHARDS_SQL)
+
+
+def _blob_store(conn: sqlite3.Connection) -> None:
+    # content_ref/content_size, the objects_fts layout that indexes offloaded
+    # content, then move existing content over APISQLITE_BLOB_THRESHOLD out of the rows
+    have = _columns(conn, "linguistic_objects")
+    for col, typ in BLOB_COLUMNS:
+        if col not in have:
+            conn.execute(f"ALTER TABLE linguistic_objects ADD COLUMN {col} {typ}")
+    ensure_fts(conn)
+    offload_rows(conn)
+
+
+def _contentless_fts(conn: sqlite3.Connection) -> None:
+    # objects_fts becomes contentless and offloaded text is indexed from the
+    # blob store, so no SQL function is needed and no text is copied back.
+    # 023 repeats it for databases where 022 recorded the interim layout that
+    # kept a copy of the text in offloaded_text.
+    ensure_fts(conn)
+
+
+def _auth_epoch(conn: sqlite3.Connection) -> None:
+    conn.executescript(AUTH_EPOCH_SQL)
+
+
+def _unique_relations(conn: sqlite3.Connection) -> None:
+    # INSERT OR IGNORE on relations only dedupes with a unique index. Keep one
+    # row per (subject_id, predicate, object_id), a live one over a soft-deleted
+    # one, then rebuild idx_relations_subject_predicate as UNIQUE and drop any
+    # other index on exactly those columns.
+    cols = ["subject_id", "predicate", "object_id"]
+    conn.execute(
+        "DELETE FROM relations WHERE id IN (SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+        "PARTITION BY subject_id, predicate, object_id ORDER BY deleted_at IS NOT NULL, id) AS n FROM relations) WHERE n>1)")
+    for name, (_, keys) in _indexes(conn, "relations").items():
+        if keys == cols and not name.startswith("sqlite_autoindex"):
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.execute(f"CREATE UNIQUE INDEX idx_relations_subject_predicate ON relations({', '.join(cols)})")
+    drop_redundant_indexes(conn, "relations")
+
+
+Migration = Tuple[str, str, Callable[[sqlite3.Connection], None]]
+
+MIGRATIONS: List[Migration] = [
+    ("016", "core schema and late-added columns", _core_schema),
+    ("017", "indexes for hot queries", _hot_indexes),
+    ("018", "objects_fts full-text index", _fts),
+    ("019", "change log", _changes),
+    ("020", "project -> shard map", _project_shards),
+    ("021", "content blob store", _blob_store),
+    ("022", "contentless objects_fts", _contentless_fts),
+    ("023", "drop offloaded_text copy", _contentless_fts),
+    ("024", "auth cache epoch", _auth_epoch),
+    ("025", "unique relations", _unique_relations),
+]
+
+
+def _ensure_table(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS migrations (version TEXT PRIMARY KEY)")
+    if "applied_at" not in _columns(conn, "migrations"):
+        conn.execute("ALTER TABLE migrations ADD COLUMN applied_at TIMESTAMP")
+    conn.commit()
+
+
+def applied(conn: sqlite3.Connection) -> List[str]:
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='migrations'").fetchone():
+        return []
+    return [r[0] for r in conn.execute("SELECT version FROM migrations ORDER BY version")]
+
+
+def pending(conn: sqlite3.Connection) -> List[str]:
+    done = set(applied(conn))
+    return [v for v, _, _ in MIGRATIONS if v not in done]
+
+
+def migrate(conn: sqlite3.Connection, target: Optional[str] = None) -> List[str]:
+    # Applies pending migrations up to and including `target` (all by default)
+    _ensure_table(conn)
+    done = set(applied(conn))
+    ran = []
+    for version, _, fn in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        if version in done:
+            continue
+        fn(conn)
+        conn.execute("INSERT OR IGNORE INTO migrations (version, applied_at) VALUES (?, CURRENT_TIMESTAMP)", (version,))
+        conn.commit()
+        ran.append(version)
+    return ran
+
+
+def main() -> None:
+    #   APISQLITE_DB_PATH=/data/apios.db python -m db.migrations [--status]
+    parser = argparse.ArgumentParser(description="Apply or list schema migrations")
+    parser.add_argument("--status", action="store_true", help="list pending migrations without applying them")
+    parser.add_argument("--target", help="stop after this version")
+    args = parser.parse_args()
+    from db.connection import get_connection
+    with get_connection(write=True) as conn:
+        if args.status:
+            todo = pending(conn)
+            print("pending: " + (", ".join(todo) if todo else "none"))
+            return
+        ran = migrate(conn, args.target)
+    print("applied: " + (", ".join(ran) if ran else "nothing to do"))
+
+
+if __name__ == "__main__":
+    main()
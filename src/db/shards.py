@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .fts import rebuild_fts
+from .sqlite import DB_PATH, ConnectionPool, pool as catalog_pool
+
+# Optional per-project sharding. APISQLITE_DB_PATH becomes the catalog
+# (users, projects, memberships, the project -> shard map); objects, metadata
+# and relations of a project live in shard-NNN.db under APISQLITE_SHARD_DIR.
+# Each shard has its own pool and writer, so writes to different shards
+# don't share a lock.
+SHARDS = int(os.getenv("APISQLITE_SHARDS", "0"))
+SHARD_DIR = os.getenv("APISQLITE_SHARD_DIR", os.path.join(os.path.dirname(DB_PATH) or ".", "shards"))
+
+# Ids are allocated from a per-shard range, (shard + 1) << SHARD_ID_BITS, so
+# the shard of a new object follows from its id. Ids below 1 << SHARD_ID_BITS
+# predate sharding (kept by the split tool) and are located by probing.
+SHARD_ID_BITS = 40
+_SEQUENCED = ("linguistic_objects", "metadata", "relations", "changes")
+_PROBE_CACHE = 100000
+
+PROJECT_SHARDS_SQL = """
+CREATE TABLE IF NOT EXISTS project_shards (
+  project_id INTEGER PRIMARY KEY,
+  shard INTEGER NOT NULL
+);
+"""
+
+
+def shard_path(shard: int, directory: str = SHARD_DIR) -> str:
+    return os.path.join(directory, f"shard-{shard:03d}.db")
+
+
+def id_base(shard: int) -> int:
+    return (shard + 1) << SHARD_ID_BITS
+
+
+def set_id_base(conn: sqlite3.Connection, shard: int) -> None:
+    # AUTOINCREMENT continues from max(sqlite_sequence, max(rowid)); lift the
+    # sequence into this shard's range
+    base = id_base(shard)
+    for table in _SEQUENCED:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (table,)).fetchone():
+            continue
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (table,)).fetchone()
+        if row is None:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, base))
+        elif row[0] < base:
+            conn.execute("UPDATE sqlite_sequence SET seq=? WHERE name=?", (base, table))
+    conn.commit()
+
+
+class ShardRouter:
+    def __init__(self, count: int = SHARDS, directory: str = SHARD_DIR):
+        self.count = count
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pools: Dict[int, ConnectionPool] = {}
+        self._projects: Dict[int, int] = {}
+        self._probed: "OrderedDict[int, int]" = OrderedDict()
+
+    def ids(self) -> List[int]:
+        return list(range(self.count))
+
+    def pool(self, shard: int) -> ConnectionPool:
+        if not 0 <= shard < self.count:
+            raise ValueError(f"no such shard: {shard}")
+        with self._lock:
+            p = self._pools.get(shard)
+            if p is None:
+                path = shard_path(shard, self.directory)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                p = self._pools[shard] = ConnectionPool(path)
+            return p
+
+    def for_project(self, project_id: Optional[int], assign: bool = False) -> int:
+        # Stable map: an explicit catalog entry wins (written by the split
+        # tool, or on a project's first write); otherwise project_id % count.
+        if project_id is None:
+            return 0
+        with self._lock:
+            shard = self._projects.get(project_id)
+        if shard is not None:
+            return shard
+        with catalog_pool.connection() as conn:
+            row = conn.execute("SELECT shard FROM project_shards WHERE project_id=?", (project_id,)).fetchone()
+        shard = row[0] if row else project_id % self.count
+        if row is None and assign:
+            with catalog_pool.connection(write=True) as conn:
+                conn.execute("INSERT OR IGNORE INTO project_shards (project_id, shard) VALUES (?, ?)", (project_id, shard))
+                conn.commit()
+                shard = conn.execute("SELECT shard FROM project_shards WHERE project_id=?", (project_id,)).fetchone()[0]
+        if row is not None or assign:
+            with self._lock:
+                self._projects[project_id] = shard
+        return shard
+
+    def for_object(self, obj_id: int) -> Optional[int]:
+        shard = (obj_id >> SHARD_ID_BITS) - 1
+        if 0 <= shard < self.count:
+            return shard
+        if shard >= self.count:
+            return None
+        with self._lock:
+            if obj_id in self._probed:
+                self._probed.move_to_end(obj_id)
+                return self._probed[obj_id]
+        for k in self.ids():
+            with self.pool(k).connection() as conn:
+                if conn.execute("SELECT 1 FROM linguistic_objects WHERE id=?", (obj_id,)).fetchone():
+                    with self._lock:
+                        self._probed[obj_id] = k
+                        if len(self._probed) > _PROBE_CACHE:
+                            self._probed.popitem(last=False)
+                    return k
+        return None
+
+    def forget(self) -> None:
+        with self._lock:
+            self._projects.clear()
+            self._probed.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = dict(self._pools)
+        return {str(k): p.stats() for k, p in sorted(pools.items())}
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = dict(self._pools), {}
+        for p in pools.values():
+            p.close()
+
+
+router = ShardRouter() if SHARDS > 0 else None
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> str:
+    return ", ".join(r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({table})"))
+
+
+def split(source: str, count: int, directory: str = SHARD_DIR) -> Dict[str, Any]:
+    # Offline: moves objects, metadata and relations out of `source` into
+    # `count` new shard files, keeping their ids, and leaves `source` as the
+    # catalog. Projects map to project_id % count (NULL project -> shard 0).
+    # Relations between objects that end up in different shards are dropped.
+    from .migrations import migrate
+    paths = [shard_path(k, directory) for k in range(count)]
+    existing = [p for p in paths if os.path.exists(p)]
+    if existing:
+        raise FileExistsError(existing[0])
+    os.makedirs(directory, exist_ok=True)
+    src = sqlite3.connect(source)
+    migrate(src)
+    src.execute("INSERT OR IGNORE INTO project_shards (project_id, shard) SELECT id, id % ? FROM projects", (count,))
+    src.commit()
+    src.execute("PRAGMA foreign_keys=OFF")
+    out: Dict[str, Any] = {"shards": {}}
+    kept = 0
+    for k, path in enumerate(paths):
+        dst = sqlite3.connect(path)
+        migrate(dst)
+        dst.close()
+        src.execute("ATTACH DATABASE ? AS shard", (path,))
+        cond = "project_id IN (SELECT project_id FROM project_shards WHERE shard=?)"
+        params: List[Any] = [k]
+        if k == 0:
+            cond = f"({cond} OR project_id IS NULL)"
+        cols = _columns(src, "main", "linguistic_objects")
+        src.execute(f"INSERT INTO shard.linguistic_objects ({cols}) SELECT {cols} FROM main.linguistic_objects WHERE {cond}", params)
+        cols = _columns(src, "main", "metadata")
+        src.execute(f"INSERT INTO shard.metadata ({cols}) SELECT {cols} FROM main.metadata "
+                    "WHERE object_id IN (SELECT id FROM shard.linguistic_objects)")
+        cols = _columns(src, "main", "relations")
+        src.execute(f"INSERT INTO shard.relations ({cols}) SELECT {cols} FROM main.relations "
+                    "WHERE subject_id IN (SELECT id FROM shard.linguistic_objects) "
+                    "AND object_id IN (SELECT id FROM shard.linguistic_objects)")
+        # The copy fired the change-log triggers; a split shard starts a fresh feed
+        src.execute("DELETE FROM shard.changes")
+        objects = src.execute("SELECT COUNT(*) FROM shard.linguistic_objects").fetchone()[0]
+        kept += src.execute("SELECT COUNT(*) FROM shard.relations").fetchone()[0]
+        src.commit()
+        src.execute("DETACH DATABASE shard")
+        dst = sqlite3.connect(path)
+        set_id_base(dst, k)
+        # The copy's triggers indexed inline content; offloaded text comes from the blob store
+        rebuild_fts(dst)
+        dst.close()
+        out["shards"][str(k)] = {"path": path, "objects": objects}
+    out["relations_dropped"] = src.execute("SELECT COUNT(*) FROM relations").fetchone()[0] - kept
+    src.execute("DELETE FROM relations")
+    src.execute("DELETE FROM metadata")
+    src.execute("DELETE FROM linguistic_objects")
+    src.execute("DELETE FROM changes")
+    src.commit()
+    rebuild_fts(src)
+    src.execute("VACUUM")
+    src.close()
+    return out
+
+
+def main() -> None:
+    # One-time, with the API stopped:
+    #   APISQLITE_DB_PATH=/data/apios.db python -m db.shards --split --shards 4
+    # then start the API with APISQLITE_SHARDS=4.
+    parser = argparse.ArgumentParser(description="Split objects into per-project shard databases")
+    parser.add_argument("--split", action="store_true", help="move objects out of APISQLITE_DB_PATH into shard files")
+    parser.add_argument("--shards", type=int, default=SHARDS, help="number of shards")
+    parser.add_argument("--dir", default=SHARD_DIR, help="shard directory")
+    args = parser.parse_args()
+    if not args.split:
+        parser.print_help()
+        return
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    print(json.dumps(split(DB_PATH, args.shards, args.dir), indent=2))
+
+
+if __name__ == "__main__":
+    main()
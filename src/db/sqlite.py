@@ -1,22 +1,233 @@
 import os
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
 
 DB_PATH = os.getenv("APISQLITE_DB_PATH", "/data/apios.db")
+POOL_SIZE = int(os.getenv("APISQLITE_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("APISQLITE_POOL_TIMEOUT", "30"))
+STATEMENT_CACHE = int(os.getenv("APISQLITE_STATEMENT_CACHE", "256"))
+# How long a statement waits for another connection's lock before failing
+# with "database is locked" (the API turns that into 503 db_busy)
+BUSY_TIMEOUT_MS = int(os.getenv("APISQLITE_BUSY_TIMEOUT_MS", "5000"))
 
-@contextmanager
-def get_connection():
-    # Allow usage across threads in FastAPI
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+# Optional instrumentation (see api/metrics.py): an object with
+# statement(sql, seconds, rows), fetched(sql, rows, seconds) and
+# acquire(mode, seconds). When unset the wrappers add a single check.
+_observer: Any = None
+
+
+def set_observer(observer: Any) -> None:
+    global _observer
+    _observer = observer
+
+
+class TimedCursor(sqlite3.Cursor):
+    sql = ""
+
+    def _fetched(self, rows: int, start: float) -> None:
+        if _observer is not None and rows:
+            _observer.fetched(self.sql, rows, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(0 if row is None else 1, start)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        self._fetched(len(rows), start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), start)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        row = super().__next__()
+        self._fetched(1, start)
+        return row
+
+
+class TimedConnection(sqlite3.Connection):
+    def execute(self, sql, parameters=()):
+        if _observer is None:
+            return super().execute(sql, parameters)
+        cur = self.cursor(TimedCursor)
+        cur.sql = sql
+        start = time.perf_counter()
+        cur.execute(sql, parameters)
+        _observer.statement(sql, time.perf_counter() - start, max(cur.rowcount, 0))
+        return cur
+
+    def executemany(self, sql, seq_of_parameters):
+        if _observer is None:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        cur = super().executemany(sql, seq_of_parameters)
+        _observer.statement(sql, time.perf_counter() - start, max(cur.rowcount, 0))
+        return cur
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    # ":memory:" would give every pooled connection its own empty database;
+    # use a named shared-cache memory DB so the pool sees one database.
+    if path == ":memory:":
+        conn = sqlite3.connect("file:apios_memdb?mode=memory&cache=shared", uri=True, factory=TimedConnection,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE,
+                               timeout=BUSY_TIMEOUT_MS / 1000.0)
+    else:
+        # Allow usage across threads in FastAPI
+        conn = sqlite3.connect(path, factory=TimedConnection, check_same_thread=False, cached_statements=STATEMENT_CACHE,
+                               timeout=BUSY_TIMEOUT_MS / 1000.0)
     conn.row_factory = sqlite3.Row
+    # Enforce constraints and performance settings once per connection
+    conn.execute("PRAGMA foreign_keys=ON;")
     try:
-        # Enforce constraints and performance settings per-connection
-        conn.execute("PRAGMA foreign_keys=ON;")
+        conn.execute("PRAGMA journal_mode=WAL;")
+    except sqlite3.DatabaseError:
+        pass
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    return conn
+
+
+class ConnectionPool:
+    # Bounded pool: up to `size` reader connections, preferably handed back to
+    # the thread that last used them, plus a single writer connection.
+
+    def __init__(self, path: str, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: List[sqlite3.Connection] = []
+        self._all: List[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.Lock()
+        self._stats = {"checkouts": 0, "waits": 0, "wait_seconds": 0.0,
+                       "writer_checkouts": 0, "writer_waits": 0, "created": 0}
+        self._waiting = 0  # callers blocked in _acquire right now
+
+    def _acquire(self, sem: Any, wait_key: str) -> None:
+        if sem.acquire(blocking=False):
+            return
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
         try:
-            conn.execute("PRAGMA journal_mode=WAL;")
-        except sqlite3.DatabaseError:
-            pass
-        conn.execute("PRAGMA synchronous=NORMAL;")
+            acquired = sem.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise sqlite3.OperationalError("connection pool exhausted")
+        with self._lock:
+            self._stats[wait_key] += 1
+            self._stats["wait_seconds"] += time.perf_counter() - start
+
+    def _checkout(self) -> sqlite3.Connection:
+        self._acquire(self._slots, "waits")
+        try:
+            with self._lock:
+                self._stats["checkouts"] += 1
+                conn = getattr(self._local, "conn", None)
+                if conn is not None and conn in self._idle:
+                    self._idle.remove(conn)
+                elif self._idle:
+                    conn = self._idle.pop()
+                else:
+                    conn = None
+            if conn is None:
+                conn = _connect(self.path)
+                with self._lock:
+                    self._all.append(conn)
+                    self._stats["created"] += 1
+            self._local.conn = conn
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn: sqlite3.Connection) -> None:
+        try:
+            # Never hand out a connection with a dangling transaction
+            if conn.in_transaction:
+                conn.rollback()
+        finally:
+            with self._lock:
+                self._idle.append(conn)
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, write: bool = False):
+        start = time.perf_counter()
+        if write:
+            self._acquire(self._writer_lock, "writer_waits")
+            try:
+                with self._lock:
+                    self._stats["writer_checkouts"] += 1
+                if self._writer is None:
+                    self._writer = _connect(self.path)
+                if _observer is not None:
+                    _observer.acquire("write", time.perf_counter() - start)
+                try:
+                    yield self._writer
+                finally:
+                    if self._writer.in_transaction:
+                        self._writer.rollback()
+            finally:
+                self._writer_lock.release()
+            return
+        conn = self._checkout()
+        if _observer is not None:
+            _observer.acquire("read", time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            self._checkin(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["size"] = self.size
+            out["open"] = len(self._all) + (1 if self._writer is not None else 0)
+            out["idle"] = len(self._idle)
+            out["in_use"] = len(self._all) - len(self._idle)
+            out["waiting"] = self._waiting
+        out["wait_seconds"] = round(out["wait_seconds"], 6)
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            conns = list(self._all)
+            self._all.clear()
+            self._idle.clear()
+            writer, self._writer = self._writer, None
+        for conn in conns + ([writer] if writer is not None else []):
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+pool = ConnectionPool(DB_PATH)
+
+
+@contextmanager
+def get_connection(write: bool = False):
+    with pool.connection(write=write) as conn:
         yield conn
-    finally:
-        conn.close()
+
+
+def pool_stats() -> Dict[str, Any]:
+    return pool.stats()
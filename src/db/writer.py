@@ -0,0 +1,194 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .connection import get_connection
+
+WRITE_BATCH = int(os.getenv("APISQLITE_WRITE_BATCH", "64"))
+WRITE_WINDOW_MS = float(os.getenv("APISQLITE_WRITE_WINDOW_MS", "2"))
+
+WriteUnit = Callable[[Any], Any]
+
+
+class WriteQueue:
+    # Single writer thread: callers enqueue units of work (fn(conn) -> result)
+    # and the thread coalesces whatever is queued into one transaction, each
+    # unit isolated by a SAVEPOINT so a failing unit only rolls back itself.
+
+    def __init__(self, batch_size: int = WRITE_BATCH, window_ms: float = WRITE_WINDOW_MS,
+                 shard: Optional[int] = None, listeners: Optional[List[Callable[[], None]]] = None):
+        self.shard = shard
+        self.batch_size = max(1, batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+        self._q: "queue.Queue[Optional[Tuple[WriteUnit, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Any = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Called with no arguments after each successful commit (from the
+        # writer thread; listeners must not block)
+        self._listeners: List[Callable[[], None]] = listeners if listeners is not None else []
+        self._stats = {"batches": 0, "units": 0, "unit_errors": 0, "commit_errors": 0,
+                       "max_batch": 0, "commit_seconds": 0.0, "max_commit_seconds": 0.0}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="apios-writer" if self.shard is None else f"apios-writer-{self.shard}", daemon=True)
+                self._thread.start()
+
+    def add_listener(self, fn: Callable[[], None]) -> None:
+        self._listeners.append(fn)
+
+    def submit(self, fn: WriteUnit) -> Future:
+        fut: Future = Future()
+        if threading.current_thread() is self._thread:
+            # Nested submit from inside a unit: run inline in the open transaction
+            try:
+                fut.set_result(fn(self._conn))
+            except BaseException as e:
+                fut.set_exception(e)
+            return fut
+        self._ensure_started()
+        self._q.put((fn, fut))
+        return fut
+
+    def run(self, fn: WriteUnit) -> Any:
+        return self.submit(fn).result()
+
+    def _collect(self, first: Tuple[WriteUnit, Future]) -> Tuple[List[Tuple[WriteUnit, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._q.get_nowait() if remaining <= 0 else self._q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: List[Tuple[WriteUnit, Future]]) -> None:
+        outcomes: List[Tuple[Future, bool, Any]] = []
+        errors = 0
+        start = time.perf_counter()
+        try:
+            with get_connection(write=True, shard=self.shard) as conn:
+                self._conn = conn
+                conn.execute("BEGIN")
+                for fn, fut in batch:
+                    if not fut.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT unit")
+                    try:
+                        result = fn(conn)
+                    except BaseException as e:
+                        conn.execute("ROLLBACK TO unit")
+                        conn.execute("RELEASE unit")
+                        outcomes.append((fut, False, e))
+                        errors += 1
+                        continue
+                    conn.execute("RELEASE unit")
+                    outcomes.append((fut, True, result))
+                conn.commit()
+        except BaseException as e:
+            # The whole group failed to commit: nobody's write is durable
+            with self._stats_lock:
+                self._stats["commit_errors"] += 1
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._conn = None
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            st = self._stats
+            st["batches"] += 1
+            st["units"] += len(outcomes)
+            st["unit_errors"] += errors
+            st["max_batch"] = max(st["max_batch"], len(outcomes))
+            st["commit_seconds"] += elapsed
+            st["max_commit_seconds"] = max(st["max_commit_seconds"], elapsed)
+        if len(outcomes) > errors:
+            for listener in self._listeners:
+                try:
+                    listener()
+                except Exception:
+                    pass
+        for fut, ok, value in outcomes:
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out["avg_batch"] = round(out["units"] / out["batches"], 3) if out["batches"] else 0.0
+        out["avg_commit_seconds"] = round(out["commit_seconds"] / out["batches"], 6) if out["batches"] else 0.0
+        out["commit_seconds"] = round(out["commit_seconds"], 6)
+        out["max_commit_seconds"] = round(out["max_commit_seconds"], 6)
+        out["queued"] = self._q.qsize()
+        out["batch_size"] = self.batch_size
+        out["window_ms"] = self.window * 1000.0
+        return out
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._q.put(None)
+            self._thread.join(timeout)
+
+
+writer = WriteQueue()
+# One writer per shard (see db/shards.py), sharing the default writer's
+# commit listeners; created on first use.
+_shard_writers: Dict[int, WriteQueue] = {}
+_shard_lock = threading.Lock()
+
+
+def writer_for(shard: Optional[int]) -> WriteQueue:
+    if shard is None:
+        return writer
+    with _shard_lock:
+        w = _shard_writers.get(shard)
+        if w is None:
+            w = _shard_writers[shard] = WriteQueue(shard=shard, listeners=writer._listeners)
+        return w
+
+
+def run_write(fn: WriteUnit, shard: Optional[int] = None) -> Any:
+    return writer_for(shard).run(fn)
+
+
+def writer_stats() -> Dict[str, Any]:
+    out = writer.stats()
+    with _shard_lock:
+        shard_writers = dict(_shard_writers)
+    if shard_writers:
+        out["shards"] = {str(k): w.stats() for k, w in sorted(shard_writers.items())}
+    return out
+
+
+def stop_all(timeout: Optional[float] = None) -> None:
+    with _shard_lock:
+        shard_writers = list(_shard_writers.values())
+    for w in shard_writers + [writer]:
+        w.stop(timeout)
@@ -0,0 +1,73 @@
+import asyncio
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from api import admission, main
+from api.admission import Limiter, Shed, TokenBuckets
+
+
+def test_limiter_queues_hands_off_and_sheds():
+    async def scenario():
+        lim = Limiter("read", limit=1, queue=1, wait_ms=50)
+        await lim.acquire()
+        waiter = asyncio.ensure_future(lim.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Shed, match="queue_full"):
+            await lim.acquire()
+        lim.release()
+        await waiter
+        assert lim.in_flight == 1
+        waiter = asyncio.ensure_future(lim.acquire())
+        with pytest.raises(Shed, match="deadline"):
+            await waiter
+        lim.release()
+        assert lim.in_flight == 0 and lim.depth() == 0
+        assert lim.shed == {"queue_full": 1, "deadline": 1}
+
+    asyncio.run(scenario())
+
+
+def test_timed_out_waiters_free_their_queue_slots():
+    async def scenario():
+        lim = Limiter("read", limit=1, queue=2, wait_ms=10)
+        await lim.acquire()
+        for _ in range(2):
+            with pytest.raises(Shed, match="deadline"):
+                await lim.acquire()
+        assert lim.depth() == 0
+        waiter = asyncio.ensure_future(lim.acquire())
+        await asyncio.sleep(0)
+        lim.release()
+        await waiter
+        assert lim.in_flight == 1 and lim.shed == {"queue_full": 0, "deadline": 2}
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_per_user(client, monkeypatch):
+    monkeypatch.setattr(admission.admission, "buckets", TokenBuckets(rate=0.01, burst=2))
+    headers = {}
+    for name in ("rl-a", "rl-b"):
+        client.post("/users/register", json={"username": name, "password": "password8"})
+        tok = client.post("/users/login", json={"username": name, "password": "password8"}).json()["access_token"]
+        headers[name] = {"Authorization": f"Bearer {tok}"}
+    assert [client.get("/objects", headers=headers["rl-a"]).status_code for _ in range(3)] == [200, 200, 429]
+    r = client.get("/objects", headers=headers["rl-a"])
+    assert r.json()["detail"]["error"]["code"] == "rate_limited" and int(r.headers["retry-after"]) >= 1
+    assert client.get("/objects", headers=headers["rl-b"]).status_code == 200
+    assert client.get("/health", headers=headers["rl-a"]).status_code == 200
+    assert client.get("/metrics").json()["admission"]["rate_limited"] == 2
+
+
+def test_locked_database_is_503(client, monkeypatch):
+    @contextmanager
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+        yield
+
+    monkeypatch.setattr(main, "get_connection", locked)
+    r = client.get("/objects/1")
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+    assert r.json()["detail"]["error"]["code"] == "db_busy"
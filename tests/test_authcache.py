@@ -0,0 +1,84 @@
+from api import authcache
+from db.connection import get_connection
+
+
+def _login(client, username):
+    client.post("/users/register", json={"username": username, "password": "password8"})
+    return client.post("/users/login", json={"username": username, "password": "password8"}).json()["access_token"]
+
+
+def test_authenticated_write_hot_path_is_cached(client):
+    tok = _login(client, "cacheown")
+    with get_connection() as conn:
+        uid = conn.execute("SELECT id FROM users WHERE username='cacheown'").fetchone()[0]
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES ('CACHE', ?)", (uid,))
+        pid = conn.execute("SELECT id FROM projects WHERE name='CACHE'").fetchone()[0]
+        conn.commit()
+    headers = {"Authorization": f"Bearer {tok}"}
+    assert client.post("/objects", headers=headers, json={"name": "c1", "project_id": pid}).status_code == 200
+    before = authcache.stats()
+    assert client.post("/objects", headers=headers, json={"name": "c2", "project_id": pid}).status_code == 200
+    after = authcache.stats()
+    for name in ("tokens", "users", "roles"):
+        assert after[name]["misses"] == before[name]["misses"]
+        assert after[name]["hits"] > before[name]["hits"]
+
+
+def test_membership_invalidation(client):
+    own = _login(client, "inv_own")
+    mem = _login(client, "inv_mem")
+    with get_connection() as conn:
+        own_id = conn.execute("SELECT id FROM users WHERE username='inv_own'").fetchone()[0]
+        mem_id = conn.execute("SELECT id FROM users WHERE username='inv_mem'").fetchone()[0]
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES ('INV', ?)", (own_id,))
+        pid = conn.execute("SELECT id FROM projects WHERE name='INV'").fetchone()[0]
+        conn.commit()
+    url = f"/projects/{pid}/objects"
+    assert client.get(url, headers={"Authorization": f"Bearer {own}"}).status_code == 200
+    assert client.get(url, headers={"Authorization": f"Bearer {mem}"}).status_code == 403
+    with get_connection() as conn:
+        conn.execute("INSERT INTO projects_users (project_id, user_id, role) VALUES (?, ?, 'member')", (pid, mem_id))
+        conn.commit()
+    # The cached 403 is dropped as soon as the membership row changes
+    assert client.get(url, headers={"Authorization": f"Bearer {mem}"}).status_code == 200
+
+
+def test_revocation_takes_effect_immediately(client):
+    own = _login(client, "rev_own")
+    mem = _login(client, "rev_mem")
+    with get_connection() as conn:
+        own_id = conn.execute("SELECT id FROM users WHERE username='rev_own'").fetchone()[0]
+        mem_id = conn.execute("SELECT id FROM users WHERE username='rev_mem'").fetchone()[0]
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES ('REV', ?)", (own_id,))
+        pid = conn.execute("SELECT id FROM projects WHERE name='REV'").fetchone()[0]
+        conn.execute("INSERT INTO projects_users (project_id, user_id, role) VALUES (?, ?, 'owner')", (pid, mem_id))
+        conn.commit()
+    headers = {"Authorization": f"Bearer {mem}"}
+    assert client.post("/objects", headers=headers, json={"name": "r1", "project_id": pid}).status_code == 200
+    assert client.post("/objects", headers=headers, json={"name": "r2", "project_id": pid}).status_code == 200
+    with get_connection() as conn:
+        conn.execute("DELETE FROM projects_users WHERE project_id=? AND user_id=?", (pid, mem_id))
+        conn.commit()
+    assert client.post("/objects", headers=headers, json={"name": "r3", "project_id": pid}).status_code == 403
+    # Deleting the user revokes every project at once
+    with get_connection() as conn:
+        conn.execute("INSERT INTO projects_users (project_id, user_id, role) VALUES (?, ?, 'owner')", (pid, mem_id))
+        conn.commit()
+    assert client.post("/objects", headers=headers, json={"name": "r4", "project_id": pid}).status_code == 200
+    with get_connection() as conn:
+        conn.execute("DELETE FROM projects_users WHERE user_id=?", (mem_id,))
+        conn.execute("DELETE FROM users WHERE id=?", (mem_id,))
+        conn.commit()
+    assert client.post("/objects", headers=headers, json={"name": "r5", "project_id": pid}).status_code in (401, 403)
+
+
+def test_lru_eviction_and_expiry():
+    cache = authcache.TTLCache(maxsize=2)
+    cache.set("a", 1, expires_at=1e12)
+    cache.set("b", 2, expires_at=1e12)
+    cache.get("a")
+    cache.set("c", 3, expires_at=1e12)
+    assert cache.get("b") is authcache._MISSING and cache.get("a") == 1
+    cache.set("old", 1, expires_at=0)
+    assert cache.get("old") is authcache._MISSING
+    assert cache.stats()["evictions"] == 2
@@ -0,0 +1,59 @@
+import gzip
+import sqlite3
+
+from api import main
+from db import shards
+from db.backup import BackupManager, list_backups, prune
+from db.connection import get_connection
+from db.shards import ShardRouter
+
+
+def test_backup_is_consistent_compressed_and_pruned(tmp_path):
+    with get_connection() as conn:
+        conn.execute("INSERT INTO linguistic_objects (noun) VALUES ('backed-up')")
+        conn.commit()
+    mgr = BackupManager(directory=str(tmp_path))
+    result = mgr.run(compress=True, step_pages=2, sleep_ms=0)
+    assert result["integrity"] == "ok" and result["file"].endswith(".db.gz")
+    restored = tmp_path / "restored.db"
+    restored.write_bytes(gzip.decompress((tmp_path / result["file"]).read_bytes()))
+    conn = sqlite3.connect(str(restored))
+    assert conn.execute("SELECT COUNT(*) FROM linguistic_objects WHERE noun='backed-up'").fetchone()[0] == 1
+    conn.close()
+    assert mgr.stats()["ok"] == 1 and mgr.stats()["last"]["pages"] == result["pages"]
+
+    mgr.run(compress=False, check="quick")
+    assert len(list_backups(str(tmp_path))) == 2
+    assert prune(str(tmp_path), keep=1) == [result["file"]]
+    assert [b["file"] for b in list_backups(str(tmp_path))] != [result["file"]]
+
+
+def test_admin_endpoint_requires_admin(client, monkeypatch):
+    client.post("/users/register", json={"username": "backup-admin", "password": "password8"})
+    tok = client.post("/users/login", json={"username": "backup-admin", "password": "password8"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {tok}"}
+    assert client.get("/admin/backups", headers=headers).status_code == 403
+    monkeypatch.setenv("APIOS_ADMIN_USERS", "backup-admin")
+    r = client.get("/admin/backups", headers=headers)
+    assert r.status_code == 200 and r.json()["status"]["running"] is False
+
+
+def test_sharded_backup_covers_every_shard(client, tmp_path, monkeypatch):
+    router = ShardRouter(2, str(tmp_path / "shards"))
+    monkeypatch.setattr(shards, "router", router)
+    main._startup()
+    for k in router.ids():
+        with get_connection(write=True, shard=k) as conn:
+            conn.execute("INSERT INTO linguistic_objects (noun) VALUES (?)", (f"shard-{k}",))
+            conn.commit()
+    mgr = BackupManager(directory=str(tmp_path / "backups"))
+    first = mgr.run(compress=False, check="quick")
+    assert [s["database"] for s in first["shards"]] == ["shard-000", "shard-001"]
+    assert first["shards"][1]["source"] == shards.shard_path(1, router.directory)
+    mgr.run(compress=False, check="quick")
+    assert len(list_backups(mgr.directory)) == 6
+    # One old snapshot per database goes; each database keeps its newest
+    pruned = prune(mgr.directory, keep=1)
+    assert sorted(pruned) == sorted([first["file"]] + [s["file"] for s in first["shards"]])
+    assert sorted(b["database"] for b in list_backups(mgr.directory)) == ["catalog", "shard-000", "shard-001"]
+    router.close()
@@ -0,0 +1,70 @@
+import json
+
+from db.connection import get_connection
+
+
+def _owner_project(client, username, project):
+    client.post("/users/register", json={"username": username, "password": "password8"})
+    tok = client.post("/users/login", json={"username": username, "password": "password8"}).json()["access_token"]
+    with get_connection() as conn:
+        uid = conn.execute("SELECT id FROM users WHERE username=?", (username,)).fetchone()[0]
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES (?, ?)", (project, uid))
+        pid = conn.execute("SELECT id FROM projects WHERE name=?", (project,)).fetchone()[0]
+        conn.commit()
+    return {"Authorization": f"Bearer {tok}"}, pid
+
+
+def test_batch_insert_with_relations_and_errors(client):
+    headers, pid = _owner_project(client, "batcher", "PB")
+    body = {
+        "items": [
+            {"name": "a", "project_id": pid, "metadata": {"lang": "en"}},
+            {"content": "missing name"},
+            {"name": "c", "project_id": 999999},
+            {"name": "d"},
+        ],
+        "relations": [{"subject_index": 0, "predicate": "next", "object_index": 3},
+                      {"subject_index": 0, "predicate": "next", "object_index": 2}],
+    }
+    r = client.post("/objects/batch?chunk_size=2", headers=headers, json=body)
+    assert r.status_code == 200
+    data = r.json()
+    ids = data["ids"]
+    assert ids[0] and ids[3] and ids[1] is None and ids[2] is None
+    assert [e["index"] for e in data["errors"]] == [1, 2]
+    assert data["errors"][1]["error"]["code"] == "invalid_project"
+    assert data["relations_inserted"] == 1 and data["relation_errors"][0]["index"] == 1
+    obj = client.get(f"/objects/{ids[0]}").json()
+    assert obj["metadata"] == [{"key": "lang", "value": "en"}]
+    with get_connection() as conn:
+        assert conn.execute("SELECT project_id FROM linguistic_objects WHERE id=?", (ids[0],)).fetchone()[0] == pid
+
+
+def test_batch_ndjson_stream(client):
+    headers, _ = _owner_project(client, "ndjson", "PN")
+    lines = [{"name": f"n{i}"} for i in range(5)] + [{"subject_index": 4, "predicate": "p", "object_index": 0}]
+    payload = "\n".join(json.dumps(x) for x in lines)
+    r = client.post("/objects/batch?chunk_size=2", headers={**headers, "Content-Type": "application/x-ndjson"}, content=payload)
+    data = r.json()
+    assert len(data["ids"]) == 5 and data["ids"] == sorted(data["ids"])
+    assert data["errors"] == [] and data["relations_inserted"] == 1
+
+
+def test_failed_row_does_not_fail_its_chunk(client):
+    headers, pid = _owner_project(client, "batchfail", "PF")
+    with get_connection() as conn:
+        conn.execute("CREATE TRIGGER reject_boom BEFORE INSERT ON linguistic_objects WHEN new.noun='boom' "
+                     "BEGIN SELECT RAISE(ABORT, 'boom rejected'); END")
+        conn.commit()
+    try:
+        items = [{"name": "ok1", "project_id": pid}, {"name": "boom", "project_id": pid}, {"name": "ok2", "project_id": pid}]
+        data = client.post("/objects/batch", headers=headers, json=items).json()
+    finally:
+        with get_connection() as conn:
+            conn.execute("DROP TRIGGER reject_boom")
+            conn.commit()
+    ids = data["ids"]
+    assert ids[0] and ids[1] is None and ids[2]
+    assert [(e["index"], e["error"]["code"]) for e in data["errors"]] == [(1, "insert_failed")]
+    assert "boom rejected" in data["errors"][0]["error"]["message"]
+    assert client.get(f"/objects/{ids[2]}").json()["name"] == "ok2"
@@ -0,0 +1,44 @@
+from db.connection import get_connection
+
+
+def test_ids_with_include_and_fields(client):
+    with get_connection() as conn:
+        a = conn.execute("INSERT INTO linguistic_objects (noun, content) VALUES ('br-a', 'big text')").lastrowid
+        b = conn.execute("INSERT INTO linguistic_objects (noun, content) VALUES ('br-b', 'other')").lastrowid
+        conn.execute("INSERT INTO metadata (object_id, key, value) VALUES (?, 'lang', 'en')", (a,))
+        conn.execute("INSERT INTO relations (subject_id, predicate, object_id) VALUES (?, 'links', ?)", (a, b))
+        conn.commit()
+    missing = b + 1000
+    r = client.get(f"/objects?ids={b},{a},{missing}&include=metadata,relations&fields=name")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["missing"] == [missing]
+    first, second = body["items"]
+    assert first == {"id": a, "name": "br-a", "metadata": [{"key": "lang", "value": "en"}],
+                     "relations": {"out": [{"predicate": "links", "to_id": b}], "in": []}}
+    assert second["relations"]["in"] == [{"predicate": "links", "from_id": a}] and "content" not in second
+
+
+def test_invalid_include_is_rejected(client):
+    r = client.get("/objects?include=everything")
+    assert r.status_code == 400
+    assert r.json()["detail"]["error"]["code"] == "invalid_request"
+
+
+def test_ids_respect_project_and_meta_filters(client):
+    with get_connection() as conn:
+        uid = conn.execute("INSERT INTO users (username) VALUES ('br-owner')").lastrowid
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES ('BR', ?)", (uid,))
+        pid = conn.execute("SELECT id FROM projects WHERE name='BR'").fetchone()[0]
+        a = conn.execute("INSERT INTO linguistic_objects (noun, project_id) VALUES ('br-p1', ?)", (pid,)).lastrowid
+        b = conn.execute("INSERT INTO linguistic_objects (noun, project_id) VALUES ('br-p2', ?)", (pid,)).lastrowid
+        c = conn.execute("INSERT INTO linguistic_objects (noun) VALUES ('br-none')").lastrowid
+        conn.execute("INSERT INTO metadata (object_id, key, value) VALUES (?, 'lang', 'de')", (b,))
+        conn.execute("INSERT INTO metadata (object_id, key, value) VALUES (?, 'lang', 'de')", (c,))
+        conn.commit()
+    body = client.get(f"/objects?ids={a},{b},{c}&project_id={pid}").json()
+    assert [o["id"] for o in body["items"]] == [a, b] and body["missing"] == [c]
+    body = client.get(f"/objects?ids={a},{b},{c}&project_id={pid}&meta.lang=de").json()
+    assert [o["id"] for o in body["items"]] == [b] and body["missing"] == [a, c]
+    body = client.get(f"/objects?ids={a},{b},{c}&meta_key=lang").json()
+    assert [o["id"] for o in body["items"]] == [b, c]
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+
+from db import blobs
+from db.migrations import migrate
+
+
+def _auth(client, name):
+    client.post("/users/register", json={"username": name, "password": "password8"})
+    tok = client.post("/users/login", json={"username": name, "password": "password8"}).json()["access_token"]
+    return {"Authorization": f"Bearer {tok}"}
+
+
+def test_large_content_is_offloaded_and_served(client, monkeypatch):
+    headers = _auth(client, "blob-writer")
+    doc = "".join(f"line {i} of the quixotic manuscript\n" for i in range(1000))
+    ids = [client.post("/objects", json={"name": f"big-{i}", "content": doc}, headers=headers).json()["id"] for i in range(2)]
+    files = [f for _, _, fs in os.walk(blobs.BLOB_DIR) for f in fs if f.endswith(".z") or f.endswith(".zst")]
+    assert len(files) >= 1
+
+    listed = client.get("/objects", params={"ids": ",".join(map(str, ids))}).json()["items"]
+    assert listed[0]["content"] is None and listed[0]["content_size"] == len(doc)
+    assert listed[0]["content_url"] == f"/objects/{ids[0]}/content"
+    assert client.get(f"/objects/{ids[0]}").json()["content"] == doc
+    assert "quixotic" in client.get("/search", params={"q": "quixotic"}).json()["items"][0]["snippet"]
+
+    r = client.get(listed[0]["content_url"], headers={"Range": "bytes=5-10"})
+    assert r.status_code == 206 and r.text == doc[5:11] and r.headers["content-range"] == f"bytes 5-10/{len(doc)}"
+    assert client.get(listed[0]["content_url"], headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+    assert client.get(listed[0]["content_url"]).text == doc
+
+    # Uncompressed blobs are served straight from the file
+    monkeypatch.setattr(blobs, "BLOB_CODEC", "none")
+    raw_doc = doc.replace("quixotic", "verbatim")
+    raw_id = client.post("/objects", json={"name": "big-raw", "content": raw_doc}, headers=headers).json()["id"]
+    r = client.get(f"/objects/{raw_id}/content", headers={"Range": "bytes=-7"})
+    assert r.status_code == 206 and r.text == raw_doc[-7:]
+
+
+def test_migration_moves_existing_large_rows(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "pre-blob.db"))
+    migrate(conn, target="020")
+    big = "zebra " * 5000
+    conn.executemany("INSERT INTO linguistic_objects (noun, content) VALUES (?, ?)", [("small", "zebra"), ("large", big)])
+    conn.commit()
+    assert migrate(conn, target="023") == ["021", "022", "023"]
+    rows = conn.execute("SELECT noun, content, content_ref, content_size FROM linguistic_objects ORDER BY id").fetchall()
+    assert rows[0][1:] == ("zebra", None, None)
+    assert rows[1][1] is None and rows[1][3] == len(big) and blobs.read_text(rows[1][2]) == big
+    hits = conn.execute("SELECT rowid FROM objects_fts WHERE objects_fts MATCH 'zebra' ORDER BY rowid").fetchall()
+    assert len(hits) == 2
+    conn.execute("INSERT INTO objects_fts(objects_fts) VALUES ('integrity-check')")
+    conn.close()
+
+
+def test_plain_connection_keeps_index_consistent(tmp_path):
+    # No application functions: what the sqlite3 shell or a steps/ script sees
+    path = str(tmp_path / "plain.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    big = "okapi " * 5000
+    conn.executemany("INSERT INTO linguistic_objects (noun, content) VALUES (?, ?)", [("large", big), ("other", "okapi")])
+    conn.commit()
+    assert blobs.offload_rows(conn) == 1
+    conn.close()
+
+    conn = sqlite3.connect(path)
+
+    def hits(q):
+        return [r[0] for r in conn.execute("SELECT lo.noun FROM objects_fts JOIN linguistic_objects lo "
+                                           "ON lo.id=objects_fts.rowid WHERE objects_fts MATCH ? ORDER BY lo.id", (q,))]
+
+    assert hits("okapi") == ["large", "other"] and hits("large okapi") == ["large"]
+    # The index keeps tokens only: the offloaded text is nowhere in the database
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name IN ('offloaded_text', 'objects_text')").fetchone()[0] == 0
+    assert conn.execute("SELECT content FROM objects_fts WHERE rowid=1").fetchone()[0] is None
+    conn.execute("UPDATE linguistic_objects SET noun='renamed' WHERE noun='other'")
+    conn.execute("DELETE FROM linguistic_objects WHERE noun='large'")
+    conn.execute("INSERT INTO linguistic_objects (noun, content) VALUES ('new', 'okapi')")
+    conn.commit()
+    conn.execute("INSERT INTO objects_fts(objects_fts) VALUES ('integrity-check')")
+    assert hits("okapi") == ["renamed", "new"] and hits("other") == []
+    conn.close()
@@ -0,0 +1,45 @@
+import threading
+import time
+
+from db.connection import get_connection
+from db.writer import run_write
+
+
+def test_writes_are_logged_in_order(client):
+    start = client.get("/changes?limit=1000").json()["latest"]
+    client.post("/users/register", json={"username": "feed", "password": "password8"})
+    tok = client.post("/users/login", json={"username": "feed", "password": "password8"}).json()["access_token"]
+    oid = client.post("/objects", headers={"Authorization": f"Bearer {tok}"},
+                      json={"name": "fed", "metadata": {"lang": "en"}}).json()["id"]
+    page = client.get(f"/changes?since={start}").json()
+    kinds = [(c["entity"], c["op"], c["object_id"]) for c in page["changes"]]
+    assert kinds == [("object", "insert", oid), ("metadata", "insert", oid)]
+    assert page["next"] == page["changes"][-1]["seq"] == page["latest"]
+
+
+def test_long_poll_wakes_on_commit(client, monkeypatch):
+    from api import changes
+    # A recheck well past the assertion below, whatever the environment sets
+    monkeypatch.setattr(changes, "CHANGES_RECHECK", 5.0)
+    since = client.get("/changes").json()["latest"]
+
+    def write():
+        time.sleep(0.2)
+        run_write(lambda conn: conn.execute("INSERT INTO linguistic_objects (noun) VALUES ('late')"))
+
+    threading.Thread(target=write).start()
+    t0 = time.monotonic()
+    page = client.get(f"/changes?since={since}&wait=10").json()
+    # woken by the writer notification, not the 5s recheck
+    assert time.monotonic() - t0 < 0.9
+    assert page["changes"][0]["entity"] == "object"
+
+
+def test_compacted_cursor_is_gone(client):
+    from db.changes import compact
+    with get_connection() as conn:
+        conn.execute("INSERT INTO linguistic_objects (noun) VALUES ('a'), ('b'), ('c')")
+        compact(conn, keep=1)
+        conn.commit()
+    r = client.get("/changes?since=0")
+    assert r.status_code == 410 and r.json()["detail"]["error"]["code"] == "changes_compacted"
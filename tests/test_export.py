@@ -0,0 +1,51 @@
+import json
+
+from api import export
+from db import blobs
+from db.connection import get_connection
+
+
+def test_export_merges_metadata_and_relations(client):
+    with get_connection() as conn:
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES ('EXP', 1)")
+        pid = conn.execute("SELECT id FROM projects WHERE name='EXP'").fetchone()[0]
+        ids = []
+        for i in range(3):
+            ids.append(conn.execute("INSERT INTO linguistic_objects (noun, project_id) VALUES (?, ?)", (f"e{i}", pid)).lastrowid)
+            # Interleaved rows of other projects stay out of the window's merge
+            other = conn.execute("INSERT INTO linguistic_objects (noun) VALUES ('x')").lastrowid
+            conn.execute("INSERT INTO metadata (key, value, object_id) VALUES ('lang', 'xx', ?)", (other,))
+        conn.execute("INSERT INTO metadata (key, value, object_id) VALUES ('lang', 'en', ?)", (ids[1],))
+        conn.execute("INSERT INTO relations (subject_id, predicate, object_id) VALUES (?, 'next', ?)", (ids[0], ids[1]))
+        conn.commit()
+    r = client.get(f"/export/objects.ndjson?project_id={pid}")
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [o["id"] for o in rows] == ids
+    assert rows[0]["relations"] == [{"predicate": "next", "to_id": ids[1]}]
+    assert rows[1]["metadata"] == [{"key": "lang", "value": "en"}] and rows[2]["metadata"] == []
+
+    # Resume after the first object, gzip-encoded
+    r = client.get(f"/export/objects.ndjson?project_id={pid}&since_id={ids[0]}&gzip=1")
+    assert r.headers["content-encoding"] == "gzip"
+    assert [json.loads(line)["id"] for line in r.text.splitlines()] == ids[1:]
+
+
+def test_offloaded_content_is_streamed(client, monkeypatch):
+    # Small raw chunks split multi-byte characters across reads
+    monkeypatch.setattr(blobs, "BLOB_CODEC", "none")
+    monkeypatch.setattr(blobs, "_CHUNK", 7)
+    doc = 'große "Dokumente" \\ über 🦓\n' * 50
+    data = doc.encode("utf-8")
+    with get_connection() as conn:
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES ('EXP-BLOB', 1)")
+        pid = conn.execute("SELECT id FROM projects WHERE name='EXP-BLOB'").fetchone()[0]
+        oid = conn.execute("INSERT INTO linguistic_objects (noun, content_ref, content_size, project_id) VALUES ('big', ?, ?, ?)",
+                           (blobs.put(data), len(data), pid)).lastrowid
+        conn.execute("INSERT INTO linguistic_objects (noun, content, project_id) VALUES ('small', 'x', ?)", (pid,))
+        conn.commit()
+    chunks = list(export.iter_objects(project_id=pid))
+    assert max(map(len, chunks)) < len(data)
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert rows[0] == {"id": oid, "name": "big", "content": doc, "project_id": pid, "metadata": [], "relations": []}
+    assert rows[1]["content"] == "x"
@@ -0,0 +1,41 @@
+from db.connection import get_connection
+
+
+def _chain(n, predicate="next"):
+    # a0 -> a1 -> ... -> a(n-1) -> a0 (a cycle) plus a shortcut a0 -> a3
+    with get_connection() as conn:
+        ids = [conn.execute("INSERT INTO linguistic_objects (noun) VALUES (?)", (f"g{i}",)).lastrowid for i in range(n)]
+        edges = [(ids[i], predicate, ids[(i + 1) % n]) for i in range(n)] + [(ids[0], "skip", ids[3])]
+        conn.executemany("INSERT INTO relations (subject_id, predicate, object_id) VALUES (?, ?, ?)", edges)
+        conn.commit()
+    return ids
+
+
+def test_neighbors_k_hop_with_cycle(client):
+    ids = _chain(6)
+    r = client.get(f"/objects/{ids[0]}/neighbors?depth=2")
+    assert r.status_code == 200
+    data = r.json()
+    assert {n["id"]: n["depth"] for n in data["nodes"]} == {ids[1]: 1, ids[3]: 1, ids[2]: 2, ids[4]: 2}
+    # The cycle returns to the root but never re-visits it
+    data = client.get(f"/objects/{ids[0]}/neighbors?depth=6&predicate=next").json()
+    assert len(data["nodes"]) == 5 and not data["truncated"]
+    data = client.get(f"/objects/{ids[0]}/neighbors?direction=in").json()
+    assert [n["id"] for n in data["nodes"]] == [ids[5]]
+    data = client.get(f"/objects/{ids[0]}/neighbors?depth=3&max_nodes=2").json()
+    assert data["truncated"] and data["reason"] == "node_limit"
+    # Every edge returned joins nodes that are returned
+    returned = {ids[0]} | {n["id"] for n in data["nodes"]}
+    assert data["edges"] and all({e["from_id"], e["to_id"]} <= returned for e in data["edges"])
+    assert client.get(f"/objects/{ids[0]}/neighbors?direction=up").status_code == 422
+
+
+def test_shortest_path(client):
+    ids = _chain(6)
+    data = client.get(f"/paths?from={ids[0]}&to={ids[4]}").json()
+    assert data["path"] == [ids[0], ids[3], ids[4]] and data["length"] == 2
+    assert data["edges"][0] == {"from_id": ids[0], "predicate": "skip", "to_id": ids[3]}
+    data = client.get(f"/paths?from={ids[0]}&to={ids[4]}&predicate=next").json()
+    assert data["length"] == 4
+    data = client.get(f"/paths?from={ids[0]}&to={ids[5]}&predicate=next&max_depth=2").json()
+    assert data["path"] is None
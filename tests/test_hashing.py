@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from api.hashing import HashPool, Overloaded
+
+
+def test_hash_pool_roundtrip_and_sheds_when_full():
+    pool = HashPool(workers=1, max_pending=1)
+
+    async def scenario():
+        hashed = await pool.run("hash", "password8")
+        assert await pool.run("verify", "password8", hashed)
+        first = asyncio.ensure_future(pool.run("verify", "wrong-pass", hashed))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await pool.run("verify", "password8", hashed)
+        assert await first is False
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert pool.stats()["rejected"] == 1 and pool.stats()["pending"] == 0
+
+
+def test_login_returns_503_when_overloaded(client, monkeypatch):
+    from api import hashing
+
+    async def full(*args, **kwargs):
+        raise Overloaded("verify")
+
+    client.post("/users/register", json={"username": "storm", "password": "password8"})
+    monkeypatch.setattr(hashing.hasher, "run", full)
+    r = client.post("/users/login", json={"username": "storm", "password": "password8"})
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
@@ -0,0 +1,97 @@
+import sqlite3
+import time
+
+from api import metaquery
+from db.connection import get_connection
+from db.migrations import migrate
+
+
+def _seed(name):
+    docs = [
+        {"lang": "en", "status": "draft", "title": "intro to zebras"},
+        {"lang": "en", "status": "final", "title": "outro"},
+        {"lang": "de", "status": "final", "title": "intro auf deutsch"},
+        {"lang": "en"},
+    ]
+    with get_connection() as conn:
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES (?, 1)", (name,))
+        pid = conn.execute("SELECT id FROM projects WHERE name=?", (name,)).fetchone()[0]
+        ids = []
+        for md in docs:
+            oid = conn.execute("INSERT INTO linguistic_objects (noun, project_id) VALUES ('mq', ?)", (pid,)).lastrowid
+            conn.executemany("INSERT INTO metadata (key, value, object_id) VALUES (?, ?, ?)", [(k, v, oid) for k, v in md.items()])
+            ids.append(oid)
+        conn.commit()
+    metaquery.stats.invalidate()
+    return pid, ids
+
+
+def test_meta_predicates_are_anded(client):
+    pid, ids = _seed("MQ1")
+
+    def q(params):
+        return [o["id"] for o in client.get(f"/objects?project_id={pid}&{params}").json()["items"]]
+
+    assert q("meta.lang=en") == [ids[0], ids[1], ids[3]]
+    assert q("meta.lang=en&meta.status=in(draft,final)") == [ids[0], ids[1]]
+    assert q("meta.title=prefix(intro)") == [ids[0], ids[2]]
+    assert q("meta.title=prefix(intro)&meta.lang=de") == [ids[2]]
+    assert q("meta_key=status&meta.lang=en") == [ids[0], ids[1]]
+    assert q("meta.status=exists()&limit=1&after_id=" + str(ids[0])) == [ids[1]]
+    assert client.get("/objects?meta.lang=in()").status_code == 400
+
+
+def test_prefix_ending_in_max_code_point(client):
+    pid, ids = _seed("MQ4")
+    with get_connection() as conn:
+        conn.executemany("INSERT INTO metadata (key, value, object_id) VALUES ('tag', ?, ?)",
+                         [("x\U0010ffff", ids[0]), ("x\U0010ffffz", ids[1]), ("y", ids[2]), ("\ud7ff!", ids[3])])
+        conn.commit()
+
+    def q(prefix):
+        r = client.get("/objects", params={"project_id": pid, "meta.tag": f"prefix({prefix})"})
+        assert r.status_code == 200
+        return [o["id"] for o in r.json()["items"]]
+
+    assert q("x\U0010ffff") == [ids[0], ids[1]]
+    assert q("\U0010ffff") == []
+    assert q("\ud7ff") == [ids[3]]
+
+
+def test_explain_reports_index_use(client):
+    pid, ids = _seed("MQ2")
+    data = client.get(f"/objects?project_id={pid}&meta.lang=de&meta.status=final&explain=1").json()
+    assert [o["id"] for o in data["items"]] == [ids[2]]
+    plan = " | ".join(data["plan"])
+    assert "SCAN m" not in plan and "SCAN d" not in plan
+    assert "idx_metadata_key_value_object" in plan or "sqlite_autoindex_metadata" in plan
+
+
+def test_plan_uses_object_count_not_max_id():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    # Sharded ids start at 2**40, far above the number of rows
+    base = (1 << 40) + 1
+    conn.executemany("INSERT INTO linguistic_objects (id, noun) VALUES (?, 'mq')", [(base + i,) for i in range(10)])
+    conn.executemany("INSERT INTO metadata (key, value, object_id) VALUES (?, ?, ?)",
+                     [("common", "x", base + i) for i in range(10)] + [("unique", str(i), base + i) for i in range(10)])
+    metaquery.stats.refresh(conn, shard=99)
+    sql, _ = metaquery.build_query(conn, metaquery.parse_filters([("meta.common", "x")]), None, None, 10, 0, shard=99)
+    assert "CROSS JOIN" not in sql
+    sql, _ = metaquery.build_query(conn, metaquery.parse_filters([("meta.unique", "3")]), None, None, 10, 0, shard=99)
+    assert "CROSS JOIN" in sql
+    conn.close()
+
+
+def test_stats_refresh_off_the_request_path(client):
+    _seed("MQ3")
+    ms = metaquery.MetaStats(ttl=60)
+    # Nothing computed yet: the caller gets an empty snapshot at once
+    assert ms.get() == (0, {})
+    deadline = time.monotonic() + 5
+    while ms.get() == (0, {}) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    total, keys = ms.get()
+    assert total >= 4 and keys["lang"][1] >= 2
+    ms.invalidate()
+    assert ms.get() == (total, keys)
@@ -0,0 +1,25 @@
+from api import metrics
+
+
+def test_fingerprint_normalises_literals():
+    fp = metrics.fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?) AND name='x'  AND n=42;")
+    assert fp == "SELECT * FROM t WHERE id IN (...) AND name=? AND n=?"
+
+
+def test_prometheus_exposition(client):
+    client.get("/objects/999999")
+    client.get("/objects?limit=1")
+    data = client.get("/metrics").json()
+    assert data["requests"] >= 2 and data["errors"] >= 1
+    text = client.get("/metrics", headers={"Accept": "text/plain;version=0.0.4"}).text
+    assert 'apios_http_requests_total{method="GET",route="/objects/{obj_id}",status="404"}' in text
+    assert 'apios_http_request_duration_seconds_bucket{method="GET",route="/objects",le="+Inf"}' in text
+    assert 'apios_db_statement_seconds_count{sql="SELECT * FROM linguistic_objects WHERE id=?"}' in text
+    assert 'apios_db_acquire_seconds_count{mode="read"}' in text
+    assert "apios_pool_checkouts" in text
+
+
+def test_slow_query_log(client, monkeypatch):
+    monkeypatch.setattr(metrics, "SLOW_QUERY_MS", 0.0)
+    client.get("/objects?limit=1")
+    assert any("linguistic_objects" in q["sql"] for q in client.get("/metrics").json()["slow_queries"])
@@ -0,0 +1,66 @@
+import sqlite3
+
+from db.migrations import MIGRATIONS, migrate, pending
+
+LEGACY_SQL = """
+CREATE TABLE linguistic_objects (id INTEGER PRIMARY KEY AUTOINCREMENT, noun TEXT, adjectives TEXT, verbs TEXT, metadata TEXT);
+CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE, email TEXT NOT NULL UNIQUE);
+CREATE TABLE metadata (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, value TEXT, object_id INTEGER NOT NULL, UNIQUE(key, object_id));
+CREATE TABLE relations (id INTEGER PRIMARY KEY AUTOINCREMENT, subject_id INTEGER NOT NULL, predicate TEXT NOT NULL, object_id INTEGER NOT NULL);
+CREATE INDEX idx_metadata_object_id ON metadata(object_id);
+CREATE INDEX idx_relations_object ON relations(object_id);
+CREATE TABLE migrations (version TEXT PRIMARY KEY);
+INSERT INTO migrations (version) VALUES ('001'), ('015');
+INSERT INTO linguistic_objects (noun) VALUES ('old');
+"""
+
+
+def test_upgrades_legacy_database(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "legacy.db"))
+    conn.executescript(LEGACY_SQL)
+    assert migrate(conn) == [v for v, _, _ in MIGRATIONS]
+    assert {"content", "project_id", "deleted_at"} <= {r[1] for r in conn.execute("PRAGMA table_info(linguistic_objects)")}
+    indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {"idx_metadata_object_key", "idx_relations_object_predicate", "idx_objects_project_id"} <= indexes
+    # superseded by the composite indexes
+    assert "idx_metadata_object_id" not in indexes and "idx_relations_object" not in indexes
+    # (key, object_id) is already served by the UNIQUE constraint
+    assert "idx_metadata_key_object" not in indexes
+    assert conn.execute("SELECT COUNT(*) FROM objects_fts WHERE objects_fts MATCH 'old'").fetchone()[0] == 1
+    assert migrate(conn) == [] and pending(conn) == []
+    conn.close()
+
+
+def test_core_schema_predates_blob_columns(tmp_path):
+    # 016 has shipped: its schema must not change with later features
+    conn = sqlite3.connect(str(tmp_path / "core.db"))
+    migrate(conn, target="020")
+    assert "content_ref" not in {r[1] for r in conn.execute("PRAGMA table_info(linguistic_objects)")}
+    conn.execute("INSERT INTO linguistic_objects (noun, content) VALUES ('pre', 'blob')")
+    assert migrate(conn, target="021") == ["021"]
+    assert {"content_ref", "content_size"} <= {r[1] for r in conn.execute("PRAGMA table_info(linguistic_objects)")}
+    assert conn.execute("SELECT COUNT(*) FROM objects_fts WHERE objects_fts MATCH 'pre'").fetchone()[0] == 1
+    conn.close()
+
+
+def test_duplicate_relations_are_removed_before_unique_index(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "dup.db"))
+    migrate(conn, target="024")
+    conn.executemany("INSERT INTO relations (subject_id, predicate, object_id, deleted_at) VALUES (?, ?, ?, ?)",
+                     [(1, "p", 2, "2020-01-01"), (1, "p", 2, None), (1, "p", 2, None), (1, "q", 2, None)])
+    conn.commit()
+    assert migrate(conn) == ["025"]
+    assert conn.execute("SELECT id, predicate, deleted_at FROM relations ORDER BY id").fetchall() == [(2, "p", None), (4, "q", None)]
+    assert conn.execute("SELECT \"unique\" FROM pragma_index_list('relations') "
+                        "WHERE name='idx_relations_subject_predicate'").fetchone() == (1,)
+    conn.execute("INSERT OR IGNORE INTO relations (subject_id, predicate, object_id) VALUES (1, 'p', 2)")
+    assert conn.execute("SELECT COUNT(*) FROM relations").fetchone()[0] == 2
+    conn.close()
+
+
+def test_ready_reads_startup_result(client):
+    from api import main
+    main._startup()
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["migrations_ok"] is True and r.json()["version"] == MIGRATIONS[-1][0]
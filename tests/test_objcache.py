@@ -0,0 +1,55 @@
+from api import objcache
+from db.connection import get_connection
+
+
+def test_conditional_get_and_invalidation(client):
+    client.post("/users/register", json={"username": "etag", "password": "password8"})
+    tok = client.post("/users/login", json={"username": "etag", "password": "password8"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {tok}"}
+    oid = client.post("/objects", headers=headers, json={"name": "cached", "content": "v1"}).json()["id"]
+
+    r1 = client.get(f"/objects/{oid}")
+    etag = r1.headers["etag"]
+    assert r1.json()["name"] == "cached" and "last-modified" in r1.headers
+    hits = objcache.cache.stats()["hits"]
+    r2 = client.get(f"/objects/{oid}", headers={"If-None-Match": etag})
+    assert r2.status_code == 304 and r2.headers["etag"] == etag and r2.content == b""
+    assert objcache.cache.stats()["hits"] == hits + 1
+
+    client.post("/metadata", headers=headers, json={"object_id": oid, "key": "k", "value": "v"})
+    r3 = client.get(f"/objects/{oid}", headers={"If-None-Match": etag})
+    assert r3.status_code == 200 and r3.headers["etag"] != etag
+    assert r3.json()["metadata"] == [{"key": "k", "value": "v"}]
+
+
+def test_metadata_write_moves_last_modified(client):
+    client.post("/users/register", json={"username": "ims", "password": "password8"})
+    tok = client.post("/users/login", json={"username": "ims", "password": "password8"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {tok}"}
+    oid = client.post("/objects", headers=headers, json={"name": "ims"}).json()["id"]
+    # Last-Modified has one-second resolution; age the row so the write is later
+    with get_connection() as conn:
+        conn.execute("UPDATE linguistic_objects SET created_at='2020-01-01 00:00:00' WHERE id=?", (oid,))
+        conn.commit()
+    objcache.cache.invalidate(oid)
+    since = client.get(f"/objects/{oid}").headers["last-modified"]
+    assert client.get(f"/objects/{oid}", headers={"If-Modified-Since": since}).status_code == 304
+    client.post("/metadata", headers=headers, json={"object_id": oid, "key": "k", "value": "v"})
+    r = client.get(f"/objects/{oid}", headers={"If-Modified-Since": since})
+    assert r.status_code == 200 and r.headers["last-modified"] != since
+
+
+def test_cache_is_bounded_by_bytes_and_skips_stale_puts():
+    cache = objcache.ObjectCache(max_bytes=10, max_entry=8)
+    seq = cache.seq()
+    cache.put(1, (b"aaaa", '"1"', None), seq)
+    cache.put(2, (b"bbbb", '"2"', None), seq)
+    cache.put(3, (b"cccc", '"3"', None), seq)
+    assert cache.get(1) is None and cache.get(3) is not None
+    assert cache.stats()["bytes"] == 8
+    cache.put(4, (b"too large!", '"4"', None), seq)
+    assert cache.get(4) is None
+    # A read that started before an invalidation must not repopulate the entry
+    cache.invalidate(5)
+    cache.put(5, (b"old", '"5"', None), seq)
+    assert cache.get(5) is None
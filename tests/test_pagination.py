@@ -0,0 +1,27 @@
+from db.connection import get_connection
+
+
+def test_cursor_pagination_walks_project_in_id_order(client):
+    with get_connection() as conn:
+        conn.execute("INSERT INTO projects (name, owner_id) VALUES ('PAGE', 1)")
+        pid = conn.execute("SELECT id FROM projects WHERE name='PAGE'").fetchone()[0]
+        conn.executemany("INSERT INTO linguistic_objects (noun, project_id) VALUES (?, ?)", [(f"p{i}", pid) for i in range(7)])
+        conn.commit()
+    seen, cursor = [], None
+    while True:
+        url = f"/objects?project_id={pid}&limit=3" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url).json()
+        seen += [o["name"] for o in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [f"p{i}" for i in range(7)]
+
+    page = client.get(f"/projects/{pid}/objects?limit=5").json()
+    assert len(page["items"]) == 5 and page["next_cursor"]
+    rest = client.get(f"/projects/{pid}/objects?limit=5&cursor={page['next_cursor']}").json()
+    assert [o["name"] for o in rest["items"]] == ["p5", "p6"] and rest["next_cursor"] is None
+
+
+def test_invalid_cursor_rejected(client):
+    assert client.get("/objects?cursor=bm9wZQ").status_code == 400
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from db.sqlite import ConnectionPool, pool_stats
+
+
+def test_pool_reuses_thread_affine_connection(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=2)
+    with pool.connection() as c1:
+        pass
+    with pool.connection() as c2:
+        assert c2 is c1
+    with pool.connection(write=True) as w:
+        assert w is not c1
+        assert w.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    st = pool.stats()
+    assert st["checkouts"] == 2 and st["writer_checkouts"] == 1
+    assert st["created"] == 1 and st["in_use"] == 0
+    pool.close()
+
+
+def test_pool_bounds_concurrent_checkouts(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), size=1, timeout=5)
+    entered = threading.Event()
+
+    def other():
+        with pool.connection():
+            entered.set()
+
+    with pool.connection():
+        t = threading.Thread(target=other)
+        t.start()
+        # The second checkout blocks on the single slot until it is released
+        deadline = time.monotonic() + 5
+        while pool.stats()["waiting"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert pool.stats()["waiting"] == 1 and not entered.is_set()
+    t.join()
+    st = pool.stats()
+    assert entered.is_set() and st["waiting"] == 0
+    assert st["waits"] == 1 and st["created"] == 1
+    pool.close()
+
+
+def test_metrics_exposes_pool_stats(client):
+    client.get("/objects")
+    data = client.get("/metrics").json()
+    assert data["pool"]["checkouts"] >= 1
+    assert set(pool_stats()) >= {"size", "checkouts", "waits"}
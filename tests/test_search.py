@@ -0,0 +1,36 @@
+from api import search
+from db.connection import get_connection
+
+
+def test_search_ranks_and_pages(client):
+    rows = [("zebra crossing", "a road marking"), ("horse", "not a zebra but similar"), ("zebrafish", "small fish")]
+    with get_connection() as conn:
+        ids = [conn.execute("INSERT INTO linguistic_objects (noun, content) VALUES (?, ?)", r).lastrowid for r in rows]
+        conn.commit()
+    page = client.get("/search?q=zebra&limit=1").json()
+    # Name matches outrank content matches
+    assert [i["id"] for i in page["items"]] == [ids[0]] and page["next_cursor"]
+    rest = client.get(f"/search?q=zebra&limit=5&cursor={page['next_cursor']}").json()
+    assert [i["id"] for i in rest["items"]] == [ids[1]] and rest["next_cursor"] is None
+    assert "[zebra]" in rest["items"][0]["snippet"]
+    prefix = client.get("/search?q=zebra*").json()
+    assert {i["id"] for i in prefix["items"]} == set(ids)
+
+
+def test_search_index_follows_updates(client):
+    with get_connection() as conn:
+        oid = conn.execute("INSERT INTO linguistic_objects (noun, content) VALUES ('okapi', 'x')").lastrowid
+        conn.commit()
+    assert [i["id"] for i in client.get("/search?q=okapi").json()["items"]] == [oid]
+    with get_connection() as conn:
+        conn.execute("UPDATE linguistic_objects SET noun='giraffe' WHERE id=?", (oid,))
+        conn.commit()
+    assert client.get("/search?q=okapi").json()["items"] == []
+    assert client.get('/search?q="unbalanced').status_code == 200
+
+
+def test_snippet_spans_chunks():
+    terms = search._terms("zeb* crossing")
+    chunks = ["the quick brown fox jumps over the lazy dog by the ze", "bra crossing and then away"]
+    assert search.snippet(chunks, terms) == "… over the lazy dog by the [zebra] [crossing] and then away"
+    assert search.snippet(["nothing here"], terms) is None
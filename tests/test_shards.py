@@ -0,0 +1,94 @@
+import json
+import sqlite3
+
+from api import main
+from db import shards
+from db.connection import get_connection
+from db.migrations import migrate
+from db.shards import SHARD_ID_BITS, ShardRouter, shard_path, split
+
+
+def test_split_moves_projects_into_shards(tmp_path):
+    source = str(tmp_path / "apios.db")
+    conn = sqlite3.connect(source)
+    migrate(conn)
+    conn.execute("INSERT INTO users (id, username, password_hash) VALUES (1, 'owner', 'x')")
+    conn.executemany("INSERT INTO projects (id, name, owner_id) VALUES (?, ?, 1)", [(1, "odd"), (2, "even")])
+    conn.executemany("INSERT INTO linguistic_objects (id, noun, project_id) VALUES (?, ?, ?)",
+                     [(10, "a", 1), (11, "b", 1), (12, "c", 2), (13, "d", None)])
+    conn.execute("INSERT INTO metadata (object_id, key, value) VALUES (10, 'lang', 'en')")
+    conn.executemany("INSERT INTO relations (subject_id, predicate, object_id) VALUES (?, ?, ?)",
+                     [(10, "next", 11), (10, "sees", 12)])
+    conn.commit()
+    conn.close()
+
+    result = split(source, 2, str(tmp_path / "shards"))
+    assert result["relations_dropped"] == 1
+    assert {k: v["objects"] for k, v in result["shards"].items()} == {"0": 2, "1": 2}
+
+    catalog = sqlite3.connect(source)
+    assert catalog.execute("SELECT COUNT(*) FROM linguistic_objects").fetchone()[0] == 0
+    assert dict(catalog.execute("SELECT project_id, shard FROM project_shards")) == {1: 1, 2: 0}
+    catalog.close()
+    one = sqlite3.connect(shard_path(1, str(tmp_path / "shards")))
+    assert one.execute("SELECT value FROM metadata WHERE object_id=10").fetchone()[0] == "en"
+    assert one.execute("SELECT COUNT(*) FROM relations").fetchone()[0] == 1
+    one.execute("INSERT INTO linguistic_objects (noun) VALUES ('new')")
+    assert one.execute("SELECT MAX(id) FROM linguistic_objects").fetchone()[0] >> SHARD_ID_BITS == 2
+    one.close()
+
+    router = ShardRouter(2, str(tmp_path / "shards"))
+    assert [router.for_object(i) for i in (10, 12, 13, 99)] == [1, 0, 0, None]
+    assert router.for_object((2 << SHARD_ID_BITS) + 5) == 1
+    router.close()
+
+
+def test_api_routes_objects_by_project(client, tmp_path, monkeypatch):
+    router = ShardRouter(2, str(tmp_path))
+    monkeypatch.setattr(shards, "router", router)
+    main._startup()
+    client.post("/users/register", json={"username": "shard-owner", "password": "password8"})
+    tok = client.post("/users/login", json={"username": "shard-owner", "password": "password8"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {tok}"}
+    with get_connection() as conn:
+        owner_id = conn.execute("SELECT id FROM users WHERE username='shard-owner'").fetchone()[0]
+        pids = []
+        for name in ("shard-p1", "shard-p2"):
+            pid = conn.execute("INSERT INTO projects (name, owner_id) VALUES (?, ?)", (name, owner_id)).lastrowid
+            conn.execute("INSERT INTO projects_users (project_id, user_id, role) VALUES (?, ?, 'owner')", (pid, owner_id))
+            pids.append(pid)
+        conn.commit()
+
+    ids = [client.post("/objects", json={"name": f"routed-{pid}", "project_id": pid}, headers=headers).json()["id"]
+           for pid in pids]
+    assert [(i >> SHARD_ID_BITS) - 1 for i in ids] == [pid % 2 for pid in pids]
+    assert client.get(f"/objects/{ids[1]}").json()["name"] == f"routed-{pids[1]}"
+    listed = client.get("/objects", params={"ids": ",".join(map(str, ids))}).json()
+    assert [o["id"] for o in listed["items"]] == sorted(ids)
+
+    # Consecutive project ids land in different shards
+    r = client.post("/relations", json={"subject_id": ids[0], "predicate": "x", "object_id": ids[1]}, headers=headers)
+    assert r.status_code == 422 and r.json()["detail"]["error"]["code"] == "cross_shard_relation"
+    router.close()
+
+
+def test_sharded_export_is_id_ordered_and_resumable(client, tmp_path, monkeypatch):
+    router = ShardRouter(2, str(tmp_path))
+    monkeypatch.setattr(shards, "router", router)
+    main._startup()
+    # Pre-split ids interleave across shards; new ids come from each shard's range
+    for shard, legacy in ((0, (2, 4, 6)), (1, (1, 3, 5))):
+        with get_connection(write=True, shard=shard) as conn:
+            conn.executemany("INSERT INTO linguistic_objects (id, noun) VALUES (?, ?)", [(i, f"legacy-{i}") for i in legacy])
+            conn.execute("INSERT INTO linguistic_objects (noun) VALUES ('fresh')")
+            conn.commit()
+
+    def export(since):
+        r = client.get("/export/objects.ndjson", params={"since_id": since})
+        return [json.loads(line)["id"] for line in r.text.splitlines()]
+
+    ids = export(0)
+    assert ids == sorted(ids) and ids[:6] == [1, 2, 3, 4, 5, 6] and len(ids) == 8
+    assert export(3) == ids[3:]
+    assert export(ids[6]) == ids[7:]
+    router.close()
@@ -0,0 +1,28 @@
+import pytest
+
+from db.connection import get_connection
+from db.writer import WriteQueue
+
+
+def test_group_commit_isolates_failing_unit():
+    wq = WriteQueue(batch_size=8, window_ms=200)
+
+    def insert(noun):
+        return lambda conn: conn.execute("INSERT INTO linguistic_objects (noun) VALUES (?)", (noun,)).lastrowid
+
+    def boom(conn):
+        conn.execute("INSERT INTO linguistic_objects (noun) VALUES ('wq-bad')")
+        raise ValueError("constraint")
+
+    futs = [wq.submit(insert("wq-a")), wq.submit(boom), wq.submit(insert("wq-b"))]
+    ids = [futs[0].result(), futs[2].result()]
+    with pytest.raises(ValueError):
+        futs[1].result()
+    wq.stop()
+
+    with get_connection() as conn:
+        nouns = [r[0] for r in conn.execute("SELECT noun FROM linguistic_objects WHERE noun LIKE 'wq-%' ORDER BY id")]
+    assert nouns == ["wq-a", "wq-b"]
+    assert ids[0] < ids[1]
+    st = wq.stats()
+    assert st["batches"] == 1 and st["units"] == 3 and st["unit_errors"] == 1